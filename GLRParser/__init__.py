@@ -1,3 +1,6 @@
-from .parser import Parser, ParseError, UnifyError
-from .grammar import Grammar, GrammarError, format_feat, Trie, Rule
+from .parser import Parser, ParseError, UnifyError, ParseTracer, ParseSession, ParseResult, CompiledGrammar, ParseLimits, TransCache
+from .grammar import Grammar, GrammarError, format_feat, Trie, CompactTrie, Rule
 from .tree import Tree
+from .cache import GrammarCache
+from .lattice import Lattice
+from .feature import FeatureSpace, FeatureVector
@@ -0,0 +1,140 @@
+""" Cache of Compiled Grammars
+
+(c) 2018 by Mehmet Dolgun, m.dolgun@yahoo.com
+
+A GrammarCache keeps compiled grammars (.grmc) in a directory, so that a grammar is compiled again only if one of its
+source files is changed. An entry is keyed by the content hash of all sources of the grammar, i.e. the root grammar file
+(or text), every file read by %include and %include_form, the defines and the reverse flag. The key also covers the source
+files of the grammar compiler itself, so that entries compiled by another version of the package are not used.
+
+As included files are known only after the grammar is parsed, the cache directory contains two kinds of files:
+
+    <source key>.deps : paths of included files of a grammar, where the source key is the hash of the root grammar file
+                        (its path and contents), defines and reverse flag
+    <key>.grmc : compiled grammar, where the key is the hash of the source key and the contents of all included files
+
+so a lookup reads the .deps file of the root grammar, hashes the included files and checks whether the .grmc file exists.
+Entries are evicted in least recently used order when total size of the cache exceeds max_size, where a hit updates
+the modification time of the entry.
+"""
+import hashlib, os, json, logging
+
+if len(__name__.split("."))>1: # called within a package
+    from . import grmc
+else: # called as a module or script
+    import grmc
+
+class GrammarCache:
+    """ a directory of compiled grammars keyed by content hash of grammar sources, see module docstring """
+    compiler_files = ["grammar.py", "parser.py", "table.py", "grmc.py"] # files of the package producing compiled grammars
+    compiler_hash = None # hash of compiler_files, computed on first use
+
+    def __init__(self,cache_dir,max_size=256*1024*1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def source_key(self,fname=None,text=None,defines=None,reverse=False):
+        """ returns hash of the root grammar (file path and contents, or text), defines and reverse flag """
+        if GrammarCache.compiler_hash is None:
+            compiler_digest = hashlib.sha256()
+            for name in GrammarCache.compiler_files:
+                with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),name),"rb") as fin:
+                    compiler_digest.update(fin.read())
+            GrammarCache.compiler_hash = compiler_digest.digest()
+        digest = hashlib.sha256(GrammarCache.compiler_hash)
+        digest.update(b"GRMC%d\0" % grmc.VERSION)
+        if text is None:
+            digest.update(os.path.abspath(fname).encode("utf-8") + b"\0")
+            with open(fname,"rb") as fin:
+                digest.update(fin.read())
+        else: # included files are relative to the current directory
+            digest.update(os.getcwd().encode("utf-8") + b"\0")
+            digest.update(text.encode("utf-8"))
+        digest.update(b"\0" + "\0".join(sorted(defines or ())).encode("utf-8"))
+        digest.update(b"\0%d" % bool(reverse))
+        return digest.hexdigest()
+
+    def key(self,source_key,sources):
+        """ returns hash of the source key and contents of included files, or None if an included file is missing """
+        digest = hashlib.sha256(source_key.encode("ascii"))
+        for fname in sources:
+            try:
+                with open(fname,"rb") as fin:
+                    data = fin.read()
+            except OSError:
+                return None
+            digest.update(b"\0" + fname.encode("utf-8") + b"\0")
+            digest.update(hashlib.sha256(data).digest())
+        return digest.hexdigest()
+
+    def path(self,key,ext):
+        return os.path.join(self.cache_dir,key+ext)
+
+    def lookup(self,source_key):
+        """ returns file name of the compiled grammar for the source key if it is in the cache and up to date, otherwise None """
+        try:
+            with open(self.path(source_key,".deps"),"r",encoding="utf-8") as fin:
+                sources = json.load(fin)
+        except (OSError,ValueError):
+            return None
+        key = self.key(source_key,sources)
+        if key is None:
+            return None
+        fname = self.path(key,".grmc")
+        try:
+            os.utime(fname) # most recently used
+            os.utime(self.path(source_key,".deps"))
+        except OSError:
+            return None
+        logging.info("grammar cache hit: %s", fname)
+        return fname
+
+    def store(self,source_key,sources,parser):
+        """ saves compiled grammar of the parser for the source key and included files, returns file name of the entry """
+        key = self.key(source_key,sources)
+        if key is None:
+            return None
+        os.makedirs(self.cache_dir,exist_ok=True)
+        fname = self.path(key,".grmc")
+        parser.save_grammar(fname)
+        deps_fname = self.path(source_key,".deps")
+        tmp_fname = "%s.%d.tmp" % (deps_fname,os.getpid())
+        with open(tmp_fname,"w",encoding="utf-8") as fout:
+            json.dump(sources,fout)
+        os.replace(tmp_fname,deps_fname)
+        logging.info("grammar cache store: %s", fname)
+        self.evict(keep={fname,deps_fname})
+        return fname
+
+    def evict(self,keep=()):
+        """ removes least recently used entries until total size of the cache is at most max_size, except files in keep """
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as items:
+            for item in items:
+                if item.name.endswith((".grmc",".deps")) and item.is_file():
+                    stat = item.stat()
+                    entries.append((stat.st_mtime,item.path,stat.st_size))
+                    total += stat.st_size
+        entries.sort()
+        for mtime,fname,size in entries:
+            if total <= self.max_size:
+                break
+            if fname in keep:
+                continue
+            try:
+                os.remove(fname)
+            except OSError:
+                continue
+            logging.info("grammar cache evict: %s", fname)
+            total -= size
+
+    def clear(self):
+        """ removes all entries """
+        max_size, self.max_size = self.max_size, -1
+        try:
+            self.evict()
+        except FileNotFoundError:
+            pass
+        finally:
+            self.max_size = max_size
@@ -0,0 +1,266 @@
+""" A GLR Parser for Natural Language Processing and Translation
+
+(c) 2018 by Mehmet Dolgun, m.dolgun@yahoo.com
+
+This file define classes:
+    FeatureSpace: compiled feature space of a grammar, assigning a bit to each (feature,value) pair
+    FeatureVector: feature structure of a FeatureSpace as a bit set
+
+"""
+import threading
+from collections.abc import Mapping
+
+class FeatureVector(Mapping):
+    """ An immutable feature structure of a FeatureSpace, used as a read-only dict of features
+
+    data:
+        space : FeatureSpace
+        bits : bit set of the (feature,value) pairs of the structure, a single bit for each feature
+        mask : union of the bits of all known values of its features, i.e. the bits which conflict with a different value
+    """
+    __slots__ = ('space', 'bits', 'mask')
+
+    def __init__(self,space,bits,mask):
+        self.space = space
+        self.bits = bits
+        self.mask = mask
+
+    def __getitem__(self,key):
+        bit = self.bits & self.space.domains.get(key,0)
+        if not bit:
+            raise KeyError(key)
+        return self.space.values[bit][1]
+
+    def get(self,key,default=None):
+        bit = self.bits & self.space.domains.get(key,0)
+        return self.space.values[bit][1] if bit else default
+
+    def __contains__(self,key):
+        return bool(self.bits & self.space.domains.get(key,0))
+
+    def items(self):
+        values = self.space.values
+        bits = self.bits
+        items = []
+        while bits:
+            low = bits & -bits
+            items.append(values[low])
+            bits ^= low
+        return items
+
+    def __iter__(self):
+        return iter([key for key,val in self.items()])
+
+    def __len__(self):
+        return bin(self.bits).count("1")
+
+    def __eq__(self,other):
+        if type(other) is FeatureVector and other.space is self.space:
+            return self.bits == other.bits
+        return Mapping.__eq__(self,other)
+
+    __hash__ = None
+
+    def copy(self):
+        """ returns a dict of the features """
+        return dict(self.items())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+class FeatureSpace:
+    """ Compiled feature space, where each (feature,value) pair is assigned a bit, so that a feature structure whose values are atoms
+    is a FeatureVector, and unification and check-lists are bit set operations
+
+    unify_up and unify_down are the fast paths of Parser.unify_up and Parser.unify_down, they return None if the unification
+    is not possible with bit sets (features with references or negated values are kept as dicts) or if it fails, so that it is
+    repeated with dicts, which raises its UnifyError
+    the space only grows: values are added as they are found in rules, compiled filters of parameters and check-lists are
+    recompiled when the space has grown since
+
+    data:
+        bits : maps (feature,value) to its bit
+        values : maps a bit to its (feature,value)
+        domains : maps a feature to the union of the bits of its values
+        version : number of bits, i.e. changes whenever a value is added
+        feats : maps id of a rule feature dict to (dict,FeatureVector or the dict itself if it is not encoded), see rule_feat
+        params : maps id of an FParam to (FParam,version,up filter,down filter), see compile_param
+        checklists : maps id of a check-list to (check-list,version,compiled check-list...), see check
+        empty : the empty FeatureVector
+    """
+    def __init__(self):
+        self.bits = dict()
+        self.values = dict()
+        self.domains = dict()
+        self.version = 0
+        self.feats = dict()
+        self.params = dict()
+        self.checklists = dict()
+        self.empty = FeatureVector(self,0,0)
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def bit(self,key,val):
+        """ returns the bit of a (feature,value) pair, adding it to the space if it is new """
+        bit = self.bits.get((key,val))
+        if bit is None:
+            with self.lock:
+                bit = self.bits.get((key,val))
+                if bit is None:
+                    bit = 1 << self.version
+                    self.values[bit] = (key,val)
+                    self.domains[key] = self.domains.get(key,0) | bit
+                    self.bits[key,val] = bit
+                    self.version += 1
+        return bit
+
+    def encode(self,fdict):
+        """ returns FeatureVector of a feature dict, or the dict itself if it has values which are not atoms (references or negations) """
+        if type(fdict) is FeatureVector:
+            return fdict
+        bits = 0
+        for key,val in fdict.items():
+            if type(val) != str or val.startswith('~'):
+                return fdict
+            bits |= self.bit(key,val)
+        mask = 0
+        for key in fdict:
+            mask |= self.domains[key]
+        return FeatureVector(self,bits,mask)
+
+    def rule_feat(self,fdict):
+        """ returns encoded feature dict of a rule, encoded once for each dict """
+        entry = self.feats.get(id(fdict))
+        if entry is None:
+            entry = self.feats[id(fdict)] = (fdict,self.encode(fdict))
+        return entry[1]
+
+    def compile_param(self,param):
+        """ internal: returns (param,version,up filter,down filter) of an FParam for unify_up and unify_down, None for a filter with negated values
+
+        a filter is (check bits,check mask,pass mask,renames) compiled from FParam.up or FParam.down: check bits are the constant values,
+        check mask their features, pass mask the features passed with the same name, renames a list of (src_key,dst_key)
+        """
+        filters = []
+        for checks,copies,rest in (param.up,param.down):
+            if any(neg is not None for key,val,neg in checks):
+                filters.append(None)
+                continue
+            check_bits = check_mask = pass_mask = 0
+            for key,val,neg in checks:
+                check_bits |= self.bit(key,val)
+            for key,val,neg in checks:
+                check_mask |= self.domains[key]
+            for src_key,dst_key in copies:
+                if src_key == dst_key:
+                    pass_mask |= self.domains.get(src_key,0)
+            if rest:
+                param_mask = 0
+                for key in param:
+                    param_mask |= self.domains.get(key,0)
+                pass_mask |= ~param_mask
+            filters.append((check_bits,check_mask,pass_mask,[(src_key,dst_key) for src_key,dst_key in copies if src_key != dst_key]))
+        entry = self.params[id(param)] = (param,self.version,filters[0],filters[1])
+        return entry
+
+    def check(self,vector,checklist):
+        """ returns True if a FeatureVector passes a check-list of a rule (see Parser.check_feat)
+
+        the check-list is compiled into (eq bits,neq bits,forbid mask,required masks): eq bits are values which should exist (?val),
+        neq bits values which should not exist (!val), forbid mask features which should not exist (!) and required masks the features
+        which should exist (? and !val)
+        """
+        entry = self.checklists.get(id(checklist))
+        if entry is None or entry[1] != self.version:
+            eq_bits = neq_bits = forbid_mask = 0
+            required = []
+            for key,val in checklist.items():
+                if val == "?":
+                    required.append(key)
+                elif val == "!":
+                    forbid_mask |= self.domains.get(key,0)
+                elif val.startswith("?"):
+                    eq_bits |= self.bit(key,val[1:])
+                elif val.startswith("!"):
+                    neq_bits |= self.bit(key,val[1:])
+                    required.append(key)
+            entry = self.checklists[id(checklist)] = (checklist,self.version,eq_bits,neq_bits,forbid_mask,[self.domains.get(key,0) for key in required])
+        checklist, version, eq_bits, neq_bits, forbid_mask, required = entry
+        bits = vector.bits
+        return bits & eq_bits == eq_bits and not bits & (neq_bits | forbid_mask) and all(bits & domain for domain in required)
+
+    def filter(self,src,param,down):
+        """ internal: returns (bits,mask,check bits,check mask) of a source vector filtered by an FParam, None if it cannot be done with bit sets """
+        entry = self.params.get(id(param))
+        if entry is None or entry[1] != self.version:
+            entry = self.compile_param(param)
+        filt = entry[3] if down else entry[2]
+        if filt is None:
+            return None
+        check_bits, check_mask, pass_mask, renames = filt
+        bits = src.bits & pass_mask
+        mask = src.mask & pass_mask
+        for src_key,dst_key in renames:
+            bit = src.bits & self.domains.get(src_key,0)
+            if bit:
+                bits |= self.bit(dst_key,self.values[bit][1])
+                mask |= self.domains[dst_key]
+        return bits, mask, check_bits, check_mask
+
+    def unify_up(self,dst,param,src):
+        """ bit set unification of Parser.unify_up, returns None if it is not possible or fails """
+        if type(src) is not FeatureVector or src.space is not self:
+            return None
+        if param is None:
+            bits = src.bits
+            mask = src.mask
+        else:
+            filtered = self.filter(src,param,False)
+            if filtered is None:
+                return None
+            bits, mask, check_bits, check_mask = filtered
+            if (src.bits ^ check_bits) & check_mask & src.mask: # pre-check fails
+                return None
+        dst_bits = dst.bits
+        if (dst_bits ^ bits) & dst.mask & mask:
+            return None
+        bits |= dst_bits
+        if bits == dst_bits:
+            return dst
+        return FeatureVector(self,bits,dst.mask | mask)
+
+    def unify_down(self,dst,param,src):
+        """ bit set unification of Parser.unify_down (without its check-list, see check), returns None if it is not possible or fails """
+        if type(src) is not FeatureVector:
+            if src:
+                return None
+            src = self.empty
+        elif src.space is not self:
+            return None
+        dst_bits = dst.bits
+        if param is None:
+            bits = src.bits
+            mask = src.mask
+            if (dst_bits ^ bits) & dst.mask & mask:
+                return None
+            bits |= dst_bits
+        else:
+            filtered = self.filter(src,param,True)
+            if filtered is None:
+                return None
+            bits, mask, check_bits, check_mask = filtered
+            if (dst_bits ^ bits) & dst.mask & mask or (dst_bits ^ check_bits) & dst.mask & check_mask:
+                return None
+            bits = dst_bits | bits & ~check_mask | check_bits
+            mask = mask & ~check_mask | check_mask
+        if bits == dst_bits:
+            return dst
+        return FeatureVector(self,bits,dst.mask | mask)
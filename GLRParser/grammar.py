@@ -2,21 +2,54 @@
 
 (c) 2018 by Mehmet Dolgun, m.dolgun@yahoo.com
 
-Source for parsing input grammar, defines classes GrammarError,Rule,Trie and Grammar
+Source for parsing input grammar, defines classes GrammarError,Rule,Trie,CompactTrie and Grammar
 
 """
-import re, pickle, sys
+import re, pickle, sys, os
+from array import array
+
+if len(__name__.split("."))>1: # called within a package
+    from .table import SymbolTable,ParseTable
+else: # called as a module or script
+    from table import SymbolTable,ParseTable
 
 class GrammarError(Exception):
     """ Raised when a grammar cannot be parsed """
     pass
 
 class FParam(dict):
-    pass
+    """ Feature parameters of a symbol in a rule, e.g. NP(+,num=*onum,case=acc,gap)
+
+    param_type is "+" (features other than parameters are also passed), "-" (only features other than parameters are passed) or None
+    up and down are the filters of Parser.unify_up and Parser.unify_down compiled from the parameters by compile:
+    (checks,copies,rest) where checks is a list of (key,val,negated val or None) for constant values, copies is a list of
+    (src_key,dst_key) and rest is True if features of the source other than parameters are passed as well
+    """
+    def filters(param):
+        """ returns (up,down) filters of parameters, param may be a plain dict as well """
+        param_type = getattr(param,"param_type",None)
+        checks = [(key,val,val[1:] if val.startswith('~') else None) for key,val in param.items() if val is not None and not val.startswith('*')]
+        if param_type == '-':
+            return (checks,[],True), (checks,[],True)
+        return (
+            (checks,[(key,key if val is None else val[1:]) for key,val in param.items() if val is None or val.startswith('*')],param_type == '+'),
+            (checks,[(key if val is None else val[1:],key) for key,val in param.items() if val is None or val.startswith('*')],param_type == '+')
+        )
+
+    def compile(self):
+        """ compiles filters of the parameters, called when all parameters are set """
+        self.up, self.down = FParam.filters(self)
+        return self
+
+    def __getattr__(self,name):
+        """ compiles filters of parameters not compiled yet (e.g. loaded from an older pickled grammar) """
+        if name in ("up","down"):
+            return getattr(self.compile(),name)
+        raise AttributeError(name)
 
 empty_list = list()
 empty_dict = dict()
-empty_fparam = FParam()
+empty_fparam = FParam().compile()
 
 class Symbol(str):
     pass
@@ -102,6 +135,58 @@ class Trie:
                 break
         return result
 
+    def matches(self,keyseq):
+        """ returns matches at all positions of keyseq in a single pass, i.e. a list where item pos is equal to search(keyseq[pos:])
+
+        partial matches starting at earlier positions are advanced together by each key, instead of searching again from each position
+        """
+        result = [[] for key in keyseq]
+        active = [] # (start position,node) of partial matches
+        found = []
+        for pos,key in enumerate(keyseq):
+            active = self.advance(active,pos,key,found)
+        for start,length,val in found:
+            result[start].append((length,val))
+        return result
+
+    def advance(self,active,pos,key,found):
+        """ advances partial matches (start position,node) and a new match starting at pos by key at pos
+
+        appends (start position,length,val) of completed matches to found, returns the partial matches which can continue
+        (the list of partial matches is consumed)
+        """
+        active.append((pos,self.root))
+        nactive = []
+        for start,curr_dict in active:
+            curr_dict = curr_dict.get(key)
+            if curr_dict is not None:
+                for val in curr_dict.get(self.leaf,empty_list):
+                    found.append((start,pos+1-start,val))
+                nactive.append((start,curr_dict))
+        return nactive
+
+    def remove(self,keyseq,val):
+        """ removes val from values of keyseq, raises KeyError if keyseq or ValueError if val is not found """
+        curr_dict = self.root
+        for key in keyseq:
+            curr_dict = curr_dict[key]
+        vals = curr_dict[self.leaf]
+        vals.remove(val)
+        if not vals:
+            del curr_dict[self.leaf]
+
+    def items(self):
+        """ yields (keyseq,val) for all values """
+        yield from Trie.items_int(self.root,[])
+
+    def items_int(dic,lst):
+        for key,val in dic.items():
+            if key == Trie.leaf:
+                for item in val:
+                    yield lst,item
+            else:
+                yield from Trie.items_int(val,lst+[key])
+
     def list(self):
         lst = []
         yield from Trie.list_int(self.root,lst)
@@ -115,6 +200,207 @@ class Trie:
                 yield from Trie.list_int(val,lst+[key])
 
 
+class CompactTrie:
+    """ Trie stored as a double-array over word ids, with the same semantics as Trie using much less memory
+
+        words : SymbolTable of words, i.e. words.ids maps a word to its id and words.names maps an id to the word
+        base,check,next : transitions of nodes in comb-vector encoding (as in ParseTable), node 0 is the root,
+            child of a node for word id w is next[base[node]+w] if check[base[node]+w]==node, otherwise there is no child
+        value_start,value_count : values of a node are values[value_start[node]:value_start[node]+value_count[node]]
+        values : side array of values (Rules) of all nodes
+
+    tables of a compiled grammar file are read-only (see grmc.read_grammar), they are copied when the trie is first modified
+    """
+
+    def __init__(self,words=None,base=None,check=None,next=None,value_start=None,value_count=None,values=None):
+        self.words = SymbolTable() if words is None else words
+        self.base = array(ParseTable.typecode,[0]) if base is None else base
+        self.check = array(ParseTable.typecode) if check is None else check
+        self.next = array(ParseTable.typecode) if next is None else next
+        self.value_start = array(ParseTable.typecode,[0]) if value_start is None else value_start
+        self.value_count = array(ParseTable.typecode,[0]) if value_count is None else value_count
+        self.values = [] if values is None else values
+
+    def __getstate__(self):
+        """ tables of a memory-mapped grammar file are memoryviews, which are pickled as arrays """
+        return {key:array(ParseTable.typecode,val) if isinstance(val,memoryview) else val for key,val in self.__dict__.items()}
+
+    def build(trie):
+        """ returns a CompactTrie with the same contents as a Trie, nodes are numbered in breadth-first order """
+        words = SymbolTable()
+        value_start = array(ParseTable.typecode)
+        value_count = array(ParseTable.typecode)
+        values = []
+        rows = [] # rows[node] is the list of (word id,child node)
+        nodes = [trie.root]
+        for node in nodes:
+            vals = node.get(Trie.leaf,())
+            value_start.append(len(values))
+            value_count.append(len(vals))
+            values.extend(vals)
+            row = []
+            for key,child in node.items():
+                if key != Trie.leaf:
+                    row.append((words.intern(key),len(nodes)))
+                    nodes.append(child)
+            rows.append(row)
+        base = array(ParseTable.typecode,[0])*len(nodes)
+        check = array(ParseTable.typecode)
+        next = array(ParseTable.typecode)
+        ParseTable.place(rows,range(len(nodes)),base,check,next,len(words))
+        return CompactTrie(words,base,check,next,value_start,value_count,values)
+
+    def child(self,node,wordid):
+        """ returns child node of node for the word id, -1 if there is none """
+        slot = self.base[node] + wordid
+        if slot < len(self.check) and self.check[slot] == node:
+            return self.next[slot]
+        return -1
+
+    def search(self,keyseq):
+        result = []
+        ids, base, check, next, value_start, value_count, values = self.words.ids, self.base, self.check, self.next, self.value_start, self.value_count, self.values
+        size = len(check)
+        node = 0
+        for idx,key in enumerate(keyseq):
+            wordid = ids.get(key)
+            if wordid is None:
+                break
+            slot = base[node] + wordid
+            if slot >= size or check[slot] != node:
+                break
+            node = next[slot]
+            if value_count[node]:
+                start = value_start[node]
+                for pos in range(start,start+value_count[node]):
+                    result.append((idx+1,values[pos]))
+        return result
+
+    def matches(self,keyseq):
+        """ returns matches at all positions of keyseq in a single pass, i.e. a list where item pos is equal to search(keyseq[pos:]) """
+        result = [[] for key in keyseq]
+        active = [] # (start position,node) of partial matches
+        found = []
+        for pos,key in enumerate(keyseq):
+            active = self.advance(active,pos,key,found)
+        for start,length,val in found:
+            result[start].append((length,val))
+        return result
+
+    def advance(self,active,pos,key,found):
+        """ advances partial matches (start position,node) and a new match starting at pos by key at pos, see Trie.advance """
+        wordid = self.words.ids.get(key)
+        if wordid is None: # no match can continue
+            return []
+        base, check, next, value_count = self.base, self.check, self.next, self.value_count
+        size = len(check)
+        active.append((pos,0))
+        nactive = []
+        for start,node in active:
+            slot = base[node] + wordid
+            if slot < size and check[slot] == node:
+                node = next[slot]
+                if value_count[node]:
+                    vstart = self.value_start[node]
+                    for vpos in range(vstart,vstart+value_count[node]):
+                        found.append((start,pos+1-start,self.values[vpos]))
+                nactive.append((start,node))
+        return nactive
+
+    def get_values(self,node):
+        """ returns list of values of a node """
+        start = self.value_start[node]
+        return [self.values[pos] for pos in range(start,start+self.value_count[node])]
+
+    def modifiable(self):
+        """ internal: copies read-only tables (e.g. memoryviews of a memory-mapped file) into modifiable ones """
+        for name in ("base","check","next","value_start","value_count"):
+            table = getattr(self,name)
+            if type(table) != array:
+                setattr(self,name,array(ParseTable.typecode,table))
+        if type(self.values) != list:
+            self.values = list(self.values)
+
+    def add(self,keyseq,val):
+        self.modifiable()
+        node = 0
+        for key in keyseq:
+            wordid = self.words.intern(key)
+            child = self.child(node,wordid)
+            if child == -1:
+                child = len(self.base)
+                self.base.append(0)
+                self.value_start.append(0)
+                self.value_count.append(0)
+                self.insert(node,wordid,child)
+            node = child
+        vals = self.get_values(node)
+        if self.value_start[node] + len(vals) != len(self.values): # values of the node are moved to the end
+            self.value_start[node] = len(self.values)
+            self.values.extend(vals)
+        self.values.append(val)
+        self.value_count[node] += 1
+
+    def insert(self,node,wordid,child):
+        """ internal: adds a transition from node to child for the word id, moving transitions of node if the slot is occupied """
+        base, check, next = self.base, self.check, self.next
+        slot = base[node] + wordid
+        if slot >= len(check) or check[slot] != -1:
+            row = [(symid,self.child(node,symid)) for symid in range(len(self.words)) if self.child(node,symid) != -1]
+            for symid,nextnode in row:
+                check[base[node]+symid] = -1
+            row.append((wordid,child))
+            ParseTable.place({node:row},[node],base,check,next,len(self.words))
+        else:
+            check[slot] = node
+            next[slot] = child
+
+    def remove(self,keyseq,val):
+        """ removes val from values of keyseq, raises KeyError if keyseq or ValueError if val is not found """
+        node = 0
+        for key in keyseq:
+            wordid = self.words.get(key)
+            node = -1 if wordid == -1 else self.child(node,wordid)
+            if node == -1:
+                raise KeyError(key)
+        if not self.value_count[node]:
+            raise KeyError(Trie.leaf)
+        vals = self.get_values(node)
+        vals.remove(val)
+        self.modifiable()
+        start = self.value_start[node]
+        self.values[start:start+len(vals)+1] = vals + [None] # keeps positions of values of other nodes
+        self.value_count[node] -= 1
+
+    def children(self):
+        """ internal: returns list of [(word,child node)*] for each node """
+        base, check, next, names = self.base, self.check, self.next, self.words.names
+        children = [[] for node in range(len(base))]
+        for slot,node in enumerate(check):
+            if node != -1:
+                children[node].append((names[slot-base[node]],next[slot]))
+        return children
+
+    def items(self):
+        """ yields (keyseq,val) for all values """
+        children = self.children()
+        todo = [(0,[])]
+        while todo:
+            node,keyseq = todo.pop()
+            for val in self.get_values(node):
+                yield keyseq,val
+            todo.extend((child,keyseq+[word]) for word,child in reversed(children[node]))
+
+    def list(self):
+        yield from self.to_trie().list()
+
+    def to_trie(self):
+        """ returns an equivalent Trie """
+        trie = Trie()
+        for keyseq,val in self.items():
+            trie.add(keyseq,val)
+        return trie
+
 class Grammar:
     INTEGER = re.compile('-?[1-9][0-9]*') # 
     re_NONTERM = r"\$?[_A-Z][-_A-Za-z0-9$]*'*"
@@ -147,6 +433,7 @@ class Grammar:
         self.suff_dict = dict()
         self.auto_dict = False
         self.include_stack = []
+        self.sources = [] # absolute paths of files read by %include and %include_form, in the order they are read
         self.parse_rule("S' -> S() : S()")
         #self.suff_dict_names = dict()
         #self.suff_idxs = dict()
@@ -448,7 +735,7 @@ class Grammar:
             name,value = self.parse_fparam()
             fdict[name] = value
         self.get_token(')')
-        return fdict
+        return fdict.compile()
 
     def parse_grammar(fname=None,reverse=False,text=None,defines=None):
         """ loads a grammar file and parse it """
@@ -537,6 +824,7 @@ class Grammar:
         fname = self.get_term()
         self.include_stack.append({"fname":self.fname, "line_no":self.line_no, "auto_dict":self.auto_dict})
         self.fname = fname
+        self.sources.append(os.path.abspath(fname))
         with open(fname,"rt",encoding="utf-8") as f:
             self.parse_grammar_int(f)
         params = self.include_stack.pop()
@@ -551,6 +839,7 @@ class Grammar:
         if macro_name not in self.macros:
             raise GrammarError("Line:%d Macro not defined: %s" % (self.line_no,macro_name))
         cnt = len(self.macros[macro_name])
+        self.sources.append(os.path.abspath(fname))
         with open(fname,"rt",encoding="utf-8") as f:
             for line_no,line in enumerate(f):
                 line = line.strip().lower()
@@ -0,0 +1,455 @@
+""" Binary Format for Compiled Grammars (.grmc)
+
+(c) 2018 by Mehmet Dolgun, m.dolgun@yahoo.com
+
+A compiled grammar file consists of a header, a section directory and sections:
+
+    header : magic(4 bytes "GRMC"), version(uint32), grammar hash(32 bytes, sha256 of all sections), number of sections(uint32)
+    section directory : for each section name(8 bytes), offset(uint64), size(uint64)
+    sections : either a utf-8 string list separated by NUL characters, or a little-endian int32 array, each aligned to 8 bytes
+
+All strings (symbols, words, feature names and values) are stored once in the "strings" section and referenced by their index.
+The first "num_symbols" strings are the symbols of the ParseTable in the order of their ids.
+Rules (grammar rules followed by dictionary rules in the Trie) are stored as column arrays, where variable length parts are
+CSR encoded, i.e. items of the i-th rule are in the range (start[i],start[i+1]) of the corresponding item arrays.
+The trie is stored as a CompactTrie (double-array over word ids), where "tword" maps word ids to string indexes and
+"lfrule" is the rule numbers of its values, so that the trie can be searched without decoding (see read_grammar).
+As integer sections are aligned, they can be used in place from a memory-mapped file (see read_grammar).
+Version 2 files, which store the trie nodes in breadth-first order, are still read (see version_sections).
+
+Integer encoding of values:
+    right items : string index if >= 0, otherwise -(idx+1) for a reference to the idx-th left symbol
+    feature values : string index if >= 0, otherwise -(idx+1) for a reference to the idx-th left symbol
+    parameters : 0 for None(no parameter list), 1 for False(terminal), otherwise k+2 for the k-th FParam in the FParam table
+    FParam values : string index or -1 for None
+    FParam types : string index, -1 for None, -2 if param_type is not set
+"""
+import struct, hashlib, sys, os, mmap
+from array import array
+from collections.abc import Sequence
+
+if len(__name__.split("."))>1: # called within a package
+    from .grammar import Rule,CompactTrie,FParam,GrammarError
+    from .table import ParseTable,SymbolTable
+else: # called as a module or script
+    from grammar import Rule,CompactTrie,FParam,GrammarError
+    from table import ParseTable,SymbolTable
+
+MAGIC = b"GRMC"
+VERSION = 3
+
+header_format = struct.Struct("<4sI32sI")
+section_format = struct.Struct("<8sQQ")
+
+int_type = 'i' if array('i').itemsize == 4 else 'l'
+
+sections = [
+    # name, is_string
+    ("meta", False),
+    ("strings", True),
+    ("base", False), ("check", False), ("next", False),
+    ("rstart", False), ("rrule", False), ("rpos", False),
+    ("erstart", False), ("errule", False), ("erpos", False),
+    ("head", False), ("cost", False), ("cut", False), ("feat", False), ("chklist", False),
+    ("lstart", False), ("lsym", False), ("lparam", False),
+    ("rtstart", False), ("rtitem", False), ("rtparam", False),
+    ("dstart", False), ("dkey", False), ("dval", False),
+    ("pstart", False), ("pkey", False), ("pval", False), ("ptype", False),
+    ("tword", False), ("tbase", False), ("tcheck", False), ("tnext", False), ("tvstart", False), ("tvcount", False),
+    ("lfrule", False),
+    ("suffkey", False), ("suffval", False),
+]
+
+# version 2 stored the trie nodes in breadth-first order, the other sections are the same as in version 3:
+# children of node i are (tword[k],tchild[k]) for k in range(tstart[i],tstart[i+1]) sorted by string index,
+# and its values are the rules lfrule[lfstart[i]:lfstart[i+1]]
+trie_sections = [("tword", False), ("tbase", False), ("tcheck", False), ("tnext", False), ("tvstart", False), ("tvcount", False), ("lfrule", False)]
+trie_sections_v2 = [("tstart", False), ("tword", False), ("tchild", False), ("lfstart", False), ("lfrule", False)]
+version_sections = {
+    2: sections[:sections.index(trie_sections[0])] + trie_sections_v2 + sections[sections.index(trie_sections[-1])+1:],
+    VERSION: sections,
+}
+
+class GrammarFileError(GrammarError):
+    """ Raised when a compiled grammar file is not valid """
+    pass
+
+class GrammarWriter:
+    """ internal: encodes rules, trie, suffix dictionary and parse table into sections """
+
+    def __init__(self,table):
+        self.strings = SymbolTable(table.symbols.names)
+        self.dicts = dict() # maps id(dict) to index in dict table
+        self.params = dict() # maps id(FParam) to index in param table
+        self.arrays = {name:array(int_type) for secs in version_sections.values() for name,is_string in secs if not is_string}
+        for name in ("dstart","pstart","lstart","rtstart"):
+            self.arrays[name].append(0)
+        self.keep = [] # keeps encoded objects alive, so that their ids are not reused
+
+    def string(self,val):
+        return self.strings.intern(val)
+
+    def value(self,val):
+        if type(val) == int:
+            return -(val+1)
+        return self.strings.intern(val)
+
+    def feat(self,fdict):
+        idx = self.dicts.get(id(fdict))
+        if idx is None:
+            idx = len(self.dicts)
+            self.dicts[id(fdict)] = idx
+            self.keep.append(fdict)
+            arrays = self.arrays
+            for key,val in fdict.items():
+                arrays["dkey"].append(self.string(key))
+                arrays["dval"].append(self.value(val))
+            arrays["dstart"].append(len(arrays["dkey"]))
+        return idx
+
+    def param(self,fparam):
+        if fparam is None:
+            return 0
+        if fparam is False:
+            return 1
+        idx = self.params.get(id(fparam))
+        if idx is None:
+            idx = len(self.params)
+            self.params[id(fparam)] = idx
+            self.keep.append(fparam)
+            arrays = self.arrays
+            for key,val in fparam.items():
+                arrays["pkey"].append(self.string(key))
+                arrays["pval"].append(-1 if val is None else self.string(val))
+            arrays["pstart"].append(len(arrays["pkey"]))
+            if not hasattr(fparam,"param_type"):
+                arrays["ptype"].append(-2)
+            elif fparam.param_type is None:
+                arrays["ptype"].append(-1)
+            else:
+                arrays["ptype"].append(self.string(fparam.param_type))
+        return idx+2
+
+    def rule(self,rule):
+        arrays = self.arrays
+        arrays["head"].append(self.string(rule.head))
+        arrays["cost"].append(rule.cost)
+        arrays["cut"].append(1 if rule.cut else 0)
+        arrays["feat"].append(self.feat(rule.feat))
+        arrays["chklist"].append(self.feat(rule.checklist))
+        for symbol,fparam in zip(rule.left,rule.lparam):
+            arrays["lsym"].append(self.string(symbol))
+            arrays["lparam"].append(self.param(fparam))
+        arrays["lstart"].append(len(arrays["lsym"]))
+        for item,fparam in zip(rule.right,rule.rparam):
+            arrays["rtitem"].append(self.value(item))
+            arrays["rtparam"].append(self.param(fparam))
+        arrays["rtstart"].append(len(arrays["rtitem"]))
+
+    def trie(self,trie,ruleno):
+        """ encodes a CompactTrie, dictionary rules are numbered starting from "ruleno" in the order of its values """
+        arrays = self.arrays
+        arrays["tword"].extend(self.string(word) for word in trie.words.names)
+        for name,table in (("tbase",trie.base),("tcheck",trie.check),("tnext",trie.next),("tvstart",trie.value_start),("tvcount",trie.value_count)):
+            arrays[name].extend(table)
+        for rule in trie.values:
+            if rule is None: # removed value
+                arrays["lfrule"].append(-1)
+            else:
+                self.rule(rule)
+                arrays["lfrule"].append(ruleno)
+                ruleno += 1
+
+    def trie_v2(self,trie,ruleno):
+        """ encodes nodes of a CompactTrie in breadth-first order (version 2), dictionary rules are numbered starting from "ruleno" """
+        arrays = self.arrays
+        tstart, tword, tchild, lfstart, lfrule = (arrays[name] for name,is_string in trie_sections_v2)
+        tstart.append(0)
+        lfstart.append(0)
+        children = trie.children()
+        nodes = [0]
+        for node in nodes:
+            for rule in trie.get_values(node):
+                if rule is not None:
+                    self.rule(rule)
+                    lfrule.append(ruleno)
+                    ruleno += 1
+            for wid,child in sorted((self.string(word),child) for word,child in children[node]):
+                tword.append(wid)
+                tchild.append(len(nodes))
+                nodes.append(child)
+            tstart.append(len(tword))
+            lfstart.append(len(lfrule))
+
+def write_grammar(fname,rules,trie,suff_dict,table,version=VERSION):
+    """ writes rules, trie, suffix dictionary and parse table to a compiled grammar file, version 2 is the older trie layout """
+    if version not in version_sections:
+        raise GrammarFileError("Unsupported compiled grammar version: %d" % version)
+    sections = version_sections[version]
+    if not isinstance(trie,CompactTrie):
+        trie = CompactTrie.build(trie)
+    writer = GrammarWriter(table)
+    arrays = writer.arrays
+    for name in ("base","check","next"):
+        arrays[name].extend(getattr(table,name))
+    for name,attr in (("rstart","reduce_start"),("rrule","reduce_rule"),("rpos","reduce_pos"),
+                      ("erstart","ereduce_start"),("errule","ereduce_rule"),("erpos","ereduce_pos")):
+        arrays[name].extend(getattr(table,attr))
+    for rule in rules:
+        writer.rule(rule)
+    if version == 2:
+        writer.trie_v2(trie,len(rules))
+    else:
+        writer.trie(trie,len(rules))
+    for key,val in suff_dict.items():
+        arrays["suffkey"].append(writer.string(key))
+        arrays["suffval"].append(writer.string(val))
+    arrays["meta"].extend([len(rules),table.num_states,len(table.symbols),len(writer.strings)])
+
+    payloads = []
+    for name,is_string in sections:
+        if is_string:
+            payload = "\0".join(writer.strings.names).encode("utf-8")
+        else:
+            data = arrays[name]
+            if sys.byteorder != "little":
+                data = array(int_type,data)
+                data.byteswap()
+            payload = data.tobytes()
+        payloads.append(payload)
+
+    grammar_hash = hashlib.sha256()
+    for payload in payloads:
+        grammar_hash.update(payload)
+
+    offset = header_format.size + section_format.size*len(sections)
+    directory = []
+    for (name,is_string),payload in zip(sections,payloads):
+        offset = (offset+7) & ~7
+        directory.append(section_format.pack(name.encode("ascii"),offset,len(payload)))
+        offset += len(payload)
+
+    # written to a temporary file which replaces fname, as fname may be memory-mapped by running parsers
+    tmp_fname = "%s.%d.tmp" % (fname,os.getpid())
+    with open(tmp_fname,"wb") as fout:
+        fout.write(header_format.pack(MAGIC,version,grammar_hash.digest(),len(sections)))
+        fout.write(b"".join(directory))
+        for payload in payloads:
+            fout.write(bytes(-fout.tell() & 7))
+            fout.write(payload)
+    os.replace(tmp_fname,fname)
+    return grammar_hash.hexdigest()
+
+def is_grammar_file(fname):
+    """ returns True if the file is in compiled grammar format (i.e. not an older pickle stream) """
+    with open(fname,"rb") as fin:
+        return fin.read(len(MAGIC)) == MAGIC
+
+def read_sections(buf):
+    """ parses header and section directory of a compiled grammar in the buffer, returns (grammar hash,{name:(offset,size)}) """
+    if len(buf) < header_format.size:
+        raise GrammarFileError("Compiled grammar file is truncated")
+    magic,version,grammar_hash,count = header_format.unpack_from(buf,0)
+    if magic != MAGIC:
+        raise GrammarFileError("Not a compiled grammar file")
+    if version not in version_sections:
+        raise GrammarFileError("Unsupported compiled grammar version: %d (expected %d), recompile the grammar from its source" % (version,VERSION))
+    if len(buf) < header_format.size + count*section_format.size:
+        raise GrammarFileError("Compiled grammar file is truncated")
+    directory = dict()
+    for idx in range(count):
+        name,offset,size = section_format.unpack_from(buf,header_format.size+idx*section_format.size)
+        if offset+size > len(buf):
+            raise GrammarFileError("Compiled grammar file is truncated")
+        directory[name.rstrip(b"\0").decode("ascii")] = (offset,size)
+    missing = [name for name,is_string in version_sections[version] if name not in directory]
+    if missing:
+        raise GrammarFileError("Compiled grammar file has missing sections: %s" % ",".join(missing))
+    return grammar_hash.hex(),directory
+
+def read_grammar(fname,verify=False,mapped=False):
+    """ reads a compiled grammar file, returns (rules,trie,suff_dict,table,grammar_hash)
+
+    rules and dictionary rules in the trie are decoded on first access, see RuleList and TrieValues
+    if verify is True, grammar hash is checked against the contents
+    if mapped is True, the file is memory-mapped and integer sections are used in place as memoryviews (zero-copy),
+    so that processes loading the same file share its pages through the page cache """
+    with open(fname,"rb") as fin:
+        if mapped and sys.byteorder == "little" and os.fstat(fin.fileno()).st_size > 0:
+            buf = memoryview(mmap.mmap(fin.fileno(),0,access=mmap.ACCESS_READ))
+        else:
+            buf = fin.read()
+            mapped = False
+    grammar_hash,directory = read_sections(buf)
+    sections = version_sections[header_format.unpack_from(buf,0)[1]]
+
+    if verify:
+        digest = hashlib.sha256()
+        for name,is_string in sections:
+            offset,size = directory[name]
+            digest.update(buf[offset:offset+size])
+        if digest.hexdigest() != grammar_hash:
+            raise GrammarFileError("Compiled grammar file is corrupted: hash mismatch")
+
+    arrays = dict()
+    for name,is_string in sections:
+        offset,size = directory[name]
+        if is_string:
+            strings = str(buf[offset:offset+size],"utf-8").split("\0")
+        elif mapped:
+            if offset & 3 or size & 3:
+                raise GrammarFileError("Compiled grammar file has misaligned section: %s" % name)
+            arrays[name] = buf[offset:offset+size].cast(int_type)
+        else:
+            data = array(int_type)
+            data.frombytes(buf[offset:offset+size])
+            if sys.byteorder != "little":
+                data.byteswap()
+            arrays[name] = data
+    return GrammarReader(arrays,strings).grammar(grammar_hash)
+
+class GrammarReader:
+    """ internal: decodes rules, feature dicts and parameters from sections on demand, caching decoded objects
+
+        arrays : maps section name to int array
+        strings : string table
+    """
+
+    def __init__(self,arrays,strings):
+        self.arrays = arrays
+        self.strings = strings
+        num_rules,num_states,num_symbols,num_strings = arrays["meta"]
+        if len(strings) != num_strings:
+            raise GrammarFileError("Compiled grammar file has invalid string table")
+        self.num_rules = num_rules
+        self.rules = [None] * len(arrays["head"]) # grammar rules followed by dictionary rules
+        self.dicts = [None] * (len(arrays["dstart"])-1)
+        self.params = [None,False] + [None] * (len(arrays["pstart"])-1)
+
+    def __getstate__(self):
+        """ sections of a memory-mapped grammar file are memoryviews, which are pickled as arrays """
+        state = self.__dict__.copy()
+        state["arrays"] = {name:array(int_type,val) if isinstance(val,memoryview) else val for name,val in self.arrays.items()}
+        return state
+
+    def grammar(self,grammar_hash):
+        """ returns (rules,trie,suff_dict,table,grammar_hash) """
+        arrays, strings = self.arrays, self.strings
+        num_rules,num_states,num_symbols,num_strings = arrays["meta"]
+        table = ParseTable(
+            SymbolTable(strings[:num_symbols]), num_states,
+            *(arrays[name] for name in ("base","check","next","rstart","rrule","rpos","erstart","errule","erpos"))
+        )
+        suff_dict = {strings[key]:strings[val] for key,val in zip(arrays["suffkey"],arrays["suffval"])}
+        if "tstart" in arrays: # version 2
+            trie = self.trie_v2()
+        else:
+            trie = CompactTrie(
+                SymbolTable(strings[idx] for idx in arrays["tword"]),
+                *(arrays[name] for name in ("tbase","tcheck","tnext","tvstart","tvcount")),
+                TrieValues(self)
+            )
+        return RuleList(self,num_rules),trie,suff_dict,table,grammar_hash
+
+    def trie_v2(self):
+        """ returns CompactTrie of the breadth-first trie nodes of a version 2 file, its tables are built (not used in place) """
+        arrays, strings = self.arrays, self.strings
+        tstart, tword, tchild, lfstart = arrays["tstart"], arrays["tword"], arrays["tchild"], arrays["lfstart"]
+        words = SymbolTable()
+        rows = [
+            [(words.intern(strings[tword[idx]]),tchild[idx]) for idx in range(tstart[node],tstart[node+1])]
+            for node in range(len(tstart)-1)
+        ]
+        base = array(ParseTable.typecode,[0])*len(rows)
+        check = array(ParseTable.typecode)
+        next = array(ParseTable.typecode)
+        ParseTable.place(rows,range(len(rows)),base,check,next,len(words))
+        value_start = array(ParseTable.typecode,lfstart[:-1])
+        value_count = array(ParseTable.typecode,(lfstart[node+1]-lfstart[node] for node in range(len(rows))))
+        return CompactTrie(words,base,check,next,value_start,value_count,TrieValues(self))
+
+    def feat(self,didx):
+        fdict = self.dicts[didx]
+        if fdict is None:
+            strings, dstart, dkey, dval = self.strings, self.arrays["dstart"], self.arrays["dkey"], self.arrays["dval"]
+            fdict = self.dicts[didx] = {
+                strings[dkey[idx]]:(strings[dval[idx]] if dval[idx] >= 0 else -dval[idx]-1) for idx in range(dstart[didx],dstart[didx+1])
+            }
+        return fdict
+
+    def param(self,pidx):
+        if pidx < 2:
+            return self.params[pidx]
+        fparam = self.params[pidx]
+        if fparam is None:
+            strings, pstart, pkey, pval = self.strings, self.arrays["pstart"], self.arrays["pkey"], self.arrays["pval"]
+            fparam = self.params[pidx] = FParam(
+                (strings[pkey[idx]],None if pval[idx] == -1 else strings[pval[idx]]) for idx in range(pstart[pidx-2],pstart[pidx-1])
+            )
+            param_type = self.arrays["ptype"][pidx-2]
+            if param_type != -2:
+                fparam.param_type = None if param_type == -1 else strings[param_type]
+            fparam.compile()
+        return fparam
+
+    def rule(self,ruleno):
+        rule = self.rules[ruleno]
+        if rule is None:
+            arrays, strings, param = self.arrays, self.strings, self.param
+            lstart, rtstart = arrays["lstart"], arrays["rtstart"]
+            lidx = range(lstart[ruleno],lstart[ruleno+1])
+            ridx = range(rtstart[ruleno],rtstart[ruleno+1])
+            lsym, lparam, rtitem, rtparam = arrays["lsym"], arrays["lparam"], arrays["rtitem"], arrays["rtparam"]
+            rule = self.rules[ruleno] = Rule(
+                strings[arrays["head"][ruleno]],
+                [strings[lsym[idx]] for idx in lidx],
+                [strings[rtitem[idx]] if rtitem[idx] >= 0 else -rtitem[idx]-1 for idx in ridx],
+                self.feat(arrays["feat"][ruleno]), self.feat(arrays["chklist"][ruleno]),
+                [param(lparam[idx]) for idx in lidx], [param(rtparam[idx]) for idx in ridx],
+                arrays["cost"][ruleno], True if arrays["cut"][ruleno] else None
+            )
+        return rule
+
+class RuleList(Sequence):
+    """ read-only list of grammar rules of a compiled grammar file, each rule is decoded on first access """
+
+    def __init__(self,reader,count):
+        self.reader = reader
+        self.count = count
+
+    def __getitem__(self,idx):
+        if isinstance(idx,slice):
+            return [self.reader.rule(ruleno) for ruleno in range(*idx.indices(self.count))]
+        if idx < 0:
+            idx += self.count
+        if idx < 0 or idx >= self.count:
+            raise IndexError("rule index out of range")
+        return self.reader.rule(idx)
+
+    def __len__(self):
+        return self.count
+
+    def heads(self):
+        """ returns list of rule heads without decoding rules """
+        strings = self.reader.strings
+        return [strings[idx] for idx in self.reader.arrays["head"][:self.count]]
+
+class TrieValues(Sequence):
+    """ read-only values of the trie of a compiled grammar file, i.e. dictionary rules, each decoded on first access """
+
+    def __init__(self,reader):
+        self.reader = reader
+        self.lfrule = reader.arrays["lfrule"]
+
+    def __getstate__(self):
+        """ lfrule of a memory-mapped grammar file is a memoryview, which is pickled as an array """
+        return {"reader":self.reader,"lfrule":array(int_type,self.lfrule) if isinstance(self.lfrule,memoryview) else self.lfrule}
+
+    def __getitem__(self,idx):
+        if idx < 0 or idx >= len(self.lfrule):
+            raise IndexError("trie value index out of range")
+        ruleno = self.lfrule[idx]
+        return None if ruleno == -1 else self.reader.rule(ruleno)
+
+    def __len__(self):
+        return len(self.lfrule)
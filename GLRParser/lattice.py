@@ -0,0 +1,97 @@
+""" Word Lattice of an Input Sentence
+
+(c) 2018 by Mehmet Dolgun, m.dolgun@yahoo.com
+
+This file define classes:
+    Lattice: words of a sentence with all dictionary matches (arcs) starting at each position, used by Parser.parse
+
+"""
+if len(__name__.split("."))>1: # called within a package
+    from .grammar import Rule
+else: # called as a module or script
+    from grammar import Rule
+
+class Lattice:
+    """ words of a sentence and all dictionary matches, built once per sentence in a single pass over the trie
+
+        orig_words : words as in the input, followed by "$"
+        puncts : punctuation and spaces before each word
+        words : lower case words
+        cases : case of each word, 0:Lower, 1:Title(or Mixed), 2:Upper, 3:Number
+        arcs : arcs[pos] is list of (length,Rule) of dictionary rules matching words[pos:pos+length], followed by a
+            synthetic CardinalNumber rule for a number or U rule for a word which is not all lower case (unknown capitalised word)
+
+    a lattice can be passed to Parser.parse instead of the input string, e.g. to parse the same sentence again
+    a lattice can also be built word by word with append and close, as done by ParseSession.feed and finish
+    """
+
+    def __init__(self,orig_words,puncts,trie):
+        self.orig_words = orig_words
+        self.puncts = puncts
+        self.trie = trie
+        case = Lattice.case
+        self.cases = [case(word) for word in orig_words]
+        self.words = [word.lower() for word in orig_words]
+        self.arcs = trie.matches(self.words)
+        self.partial = [] # partial dictionary matches (start position,trie node) for append
+        for pos,case in enumerate(self.cases[:-1]):
+            if case:
+                self.arcs[pos].append((1,self.synthetic(pos)))
+
+    def case(word):
+        """ returns case of a word, 0:Lower, 1:Title(or Mixed), 2:Upper, 3:Number, an empty word is Lower (i.e. kept as is) """
+        return (0 if not word
+            else 3 if word[0]=='-' or word.isdigit()
+            else 0 if word.islower()
+            else 2 if word.isupper()
+            else 1)
+
+    def synthetic(self,pos):
+        """ returns synthetic rule for the word at pos, i.e. CardinalNumber for a number, U for a word which is not all lower case, otherwise None """
+        token = self.words[pos]
+        if self.cases[pos] == 3: # numeric
+            return Rule('CardinalNumber', left=[token], right=[token], lparam=[False], rparam=[False])
+        elif self.cases[pos] != 0: # not all-lower case
+            return Rule('U', left=[token], right=[token], lparam=[False], rparam=[False], cost=100)
+        return None
+
+    def append(self,orig_word,punct=" "):
+        """ appends a word (with punctuation and spaces before it) to an open lattice, e.g. Lattice([],[],trie), for incremental parsing
+
+        returns arcs ending after the word as (start,length,Rule), i.e. dictionary matches completed by the word and its synthetic rule
+        """
+        pos = len(self.words)
+        self.orig_words.append(orig_word)
+        self.puncts.append(punct)
+        self.cases.append(Lattice.case(orig_word))
+        self.words.append(orig_word.lower())
+        self.arcs.append([])
+        found = []
+        self.partial = self.trie.advance(self.partial,pos,self.words[pos],found)
+        rule = self.synthetic(pos)
+        if rule:
+            found.append((pos,1,rule))
+        for start,length,rule in found:
+            self.arcs[start].append((length,rule))
+        return found
+
+    def close(self,punct=""):
+        """ appends the end marker "$" (with punctuation and spaces before it) to an open lattice """
+        self.orig_words.append("$")
+        self.puncts.append(punct)
+        self.cases.append(Lattice.case("$"))
+        self.words.append("$")
+        self.arcs.append([])
+        self.partial = []
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        """ yields (start,end,Rule) for all arcs """
+        for start,arcs in enumerate(self.arcs):
+            for length,rule in arcs:
+                yield start,start+length,rule
+
+    def __str__(self):
+        return "\n".join("%d-%d %s" % (start,end,rule.format()) for start,end,rule in self)
@@ -31,8 +31,11 @@ USAGE3:  python -m GLRParser.main -s <grammar_file>
 
 OPTIONAL PARAMETERS:
     -g  Loads grammar files from the "grm" directory within the package
+    -c <dir>  Directory of compiled grammar cache (def: __grmcache__), a grammar is compiled only if it or any file it includes is changed
+    -n  Does not use compiled grammar cache
+    -j <jobs>  Translates sentences of the input file by a pool of <jobs> processes (def: 1), output is the same as a single process
 """
-import sys,logging,os
+import sys,logging,os,gc,multiprocessing,contextlib
 import os.path
 from collections import defaultdict
 
@@ -54,9 +57,29 @@ else:
 #logging.basicConfig(level=logging.ERROR,filename="parser.log",filemode="w")
 logging.getLogger().setLevel(logging.CRITICAL)
 
-def trans_file(grm_fname, io_fname, ignore_exp_error=False, defines=set(),reverse=False):
+worker_parser = None # Parser used by worker processes of trans_file
+
+def init_worker(parser):
+    """ initializes a worker process of trans_file with the parser of the grammar, which is inherited (copy-on-write) by forked processes """
+    global worker_parser
+    worker_parser = parser
+    parser.trans_cache.hits = parser.trans_cache.misses = 0 # counters of the worker only
+
+def trans_worker(sent):
+    """ translates a sentence in a worker process of trans_file, returns (translations,pid,time,trans cache hits,trans cache misses)
+
+    hits and misses are the totals of the worker so far
+    """
+    start = timer()
+    trans_list = worker_parser.trans_sent(sent)
+    end = timer()
+    return trans_list, os.getpid(), end-start, worker_parser.trans_cache.hits, worker_parser.trans_cache.misses
+
+def trans_file(grm_fname, io_fname, ignore_exp_error=False, defines=set(),reverse=False,cache=None,jobs=1):
     """ parses all sentences in infile. Each line should be in the form: InputSentence [ "@" ExpectedTranslation ( "|" AlternateTranslation )* ]
     input and corresponding translations are written to output file. The file is appended by statistics (InputCount,TranslatedCount,MatchedCount,ExpectedErrorCount,IgnoredCount)
+    cache is the directory of compiled grammar cache used for .grm files, None for no cache
+    if jobs > 1, sentences are translated by a pool of that many processes sharing the loaded grammar, and written in input order
     """
 
     input_cnt = 0
@@ -65,25 +88,28 @@ def trans_file(grm_fname, io_fname, ignore_exp_error=False, defines=set(),revers
     experr_cnt = 0
     ignore_cnt = 0
 
-    parser = Parser("EN","TR")
+    parser = Parser("EN","TR",cache=cache)
 
     with open(f"{io_fname}.in.txt", 'r', encoding="utf-8") as fin, open(f"{io_fname}.out.txt", 'w', encoding="utf-8") as fout:
         
         if grm_fname.endswith(".grmc"):
             start = timer()
-            parser.load_grammar(grm_fname)
+            parser.load_grammar(grm_fname,mapped=True)
             end = timer()
             print("Grammar load time:",  timer_delta(start,end), "mics")
         else:
             start = timer()
             parser.parse_grammar(grm_fname,defines=defines,reverse=reverse)
             end = timer()
-            print("Grammar parse time:",  timer_delta(start,end), "mics")
+            if parser.cache_hit:
+                print("Grammar load time (cached):",  timer_delta(start,end), "mics")
+            else:
+                print("Grammar parse time:",  timer_delta(start,end), "mics")
 
-            start = end
-            parser.compile()
-            end = timer()
-            print("Compile time:",  timer_delta(start,end), "mics")
+                start = end
+                parser.compile()
+                end = timer()
+                print("Compile time:",  timer_delta(start,end), "mics")
 
         print("Number of rules:", len(parser.rules))
         print("Number of states:", len({nstate for _,nstate in parser.dfa.items()}))
@@ -91,68 +117,111 @@ def trans_file(grm_fname, io_fname, ignore_exp_error=False, defines=set(),revers
         print("Number of NonTerm symbols:", len(parser.ruledict))
         print(file=fout)
 
+        items = []
         for line in fin:
             line = line.strip()
             if not line or line.startswith('#'):
                 continue
-            input_cnt += 1
             parts = line.split('@')
             sent = parts[0]
             if len(parts) == 2: # input file contains the expected translation
                 trans = [tsent.strip().lower() for tsent in parts[1].split('|')]
             else:
                 trans = []
-
-            sent = sent.strip()
-                        
-            print(" @ ".join([sent.strip()," | ".join(trans)]), file=fout)
-                
-            trans_list = parser.trans_sent(sent)
-            if type(trans_list)==str: # an error occured
-                if '*' in trans:
-                    experr_cnt += 1
-                    print("  EXPECTED", file=fout,end=" ")
+            items.append((sent.strip(),trans))
+
+        sents = [sent for sent,trans in items]
+        if jobs > 1 and hasattr(gc,"freeze"): # objects of the grammar are not touched by the garbage collector of workers, so their pages stay shared
+            gc.freeze()
+        worker_stats = defaultdict(lambda: [0,0,0,0]) # maps pid of a worker to [sentence count,total time,trans cache hits,misses]
+        cache_hits, cache_misses = parser.trans_cache.hits, parser.trans_cache.misses
+        try:
+            with (multiprocessing.Pool(jobs,init_worker,(parser,)) if jobs > 1 else contextlib.nullcontext()) as pool:
+                if pool is not None:
+                    results = pool.imap(trans_worker,sents,chunksize=max(1,len(sents)//(jobs*16)))
                 else:
-                    print(" ", file=fout, end=" ")
-                print(trans_list, file=fout)
-            else:
-                for alt,cost in trans_list:
-                    print("  *", alt, " {", cost, "}", sep="", file=fout)
-
-                trans_sent, trans_cost = zip(*trans_list)
-                trans_cnt += 1
-                if trans==[] or trans==['*'] and ignore_exp_error:
-                    print("  IGNORED", file=fout)
-                    ignore_cnt += 1
-                elif any(tsent in trans_sent for tsent in trans):
-                    print("  OK", file=fout)
-                    match_cnt += 1  
-                else:
-                    print("  NOK", file=fout)
+                    results = map(parser.trans_sent,sents)
+                start = timer()
 
-            print(file=fout)
-        print("input={}, translated={}, matched={} exp_err={} ignored={} success=%{}".format(input_cnt,trans_cnt,match_cnt,experr_cnt,ignore_cnt,(match_cnt+experr_cnt+ignore_cnt)*100//input_cnt),file=fout)        
+                for (sent,trans),trans_list in zip(items,results):
+                    input_cnt += 1
+                    if pool is not None:
+                        trans_list,pid,elapsed,hits,misses = trans_list
+                        stats = worker_stats[pid]
+                        stats[0] += 1
+                        stats[1] += elapsed
+                        stats[2:] = hits, misses
+
+                    print(" @ ".join([sent," | ".join(trans)]), file=fout)
+
+                    if type(trans_list)==str: # an error occured
+                        if '*' in trans:
+                            experr_cnt += 1
+                            print("  EXPECTED", file=fout,end=" ")
+                        else:
+                            print(" ", file=fout, end=" ")
+                        print(trans_list, file=fout)
+                    else:
+                        for alt,cost in trans_list:
+                            print("  *", alt, " {", cost, "}", sep="", file=fout)
+
+                        trans_sent, trans_cost = zip(*trans_list)
+                        trans_cnt += 1
+                        if trans==[] or trans==['*'] and ignore_exp_error:
+                            print("  IGNORED", file=fout)
+                            ignore_cnt += 1
+                        elif any(tsent in trans_sent for tsent in trans):
+                            print("  OK", file=fout)
+                            match_cnt += 1  
+                        else:
+                            print("  NOK", file=fout)
+
+                    print(file=fout)
+                print("input={}, translated={}, matched={} exp_err={} ignored={} success=%{}".format(input_cnt,trans_cnt,match_cnt,experr_cnt,ignore_cnt,(match_cnt+experr_cnt+ignore_cnt)*100//input_cnt),file=fout)        
+                end = timer()
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+        finally:
+            if jobs > 1 and hasattr(gc,"unfreeze"):
+                gc.unfreeze()
+
+    if jobs > 1:
+        for pid,(count,elapsed,hits,misses) in sorted(worker_stats.items()):
+            print("Worker {}: {} sentences, {} mics per sentence".format(pid, count, timer_delta(0,elapsed,count)))
+        cache_hits = sum(stats[2] for stats in worker_stats.values())
+        cache_misses = sum(stats[3] for stats in worker_stats.values())
+    else:
+        cache_hits = parser.trans_cache.hits - cache_hits
+        cache_misses = parser.trans_cache.misses - cache_misses
+    if input_cnt:
+        print("Translate time: {} mics per sentence ({} sentences, {} jobs)".format(timer_delta(start,end,input_cnt), input_cnt, jobs))
+    if cache_hits + cache_misses:
+        print("Trans cache: {} hits, {} misses, hit rate %{}".format(cache_hits, cache_misses, cache_hits*100//(cache_hits+cache_misses)))
 
 
-def interact(grm_fname, single_translation=False, defines=set(), reverse=False):
-    parser = Parser("EN","TR")
+def interact(grm_fname, single_translation=False, defines=set(), reverse=False, cache=None):
+    parser = Parser("EN","TR",cache=cache)
     params = {}
 
     if grm_fname.endswith(".grmc"):
         start = timer()
-        parser.load_grammar(grm_fname)
+        parser.load_grammar(grm_fname,mapped=True)
         end = timer()
         print("Grammar load time:",  timer_delta(start,end), "mics")
     else:
         start = timer()
         parser.parse_grammar(grm_fname,defines=defines,reverse=reverse)
         end = timer()    
-        print("Grammar parse time:",  timer_delta(start,end), "mics")
+        if parser.cache_hit:
+            print("Grammar load time (cached):",  timer_delta(start,end), "mics")
+        else:
+            print("Grammar parse time:",  timer_delta(start,end), "mics")
 
-        start = end
-        parser.compile()
-        end = timer()
-        print("Compile time:",  timer_delta(start,end), "mics")
+            start = end
+            parser.compile()
+            end = timer()
+            print("Compile time:",  timer_delta(start,end), "mics")
 
     print("Number of rules:", len(parser.rules))
     print("Number of states:", len({nstate for _,nstate in parser.dfa.items()}))
@@ -195,13 +264,15 @@ def interact(grm_fname, single_translation=False, defines=set(), reverse=False):
                 fout = sys.stdout
             try:
                 #sent = parser.pre_processor(sent)
-                parser.parse(sent)
+                result = parser.parse(sent)
                 start = timer()
-                tree = parser.make_tree()
+                tree = parser.make_tree(result)
                 end = timer()
                 if show_time:
                     print("Parse time:",  timer_delta(start,end), "mics")
-                if format_spec:
+                if format_spec == "d": # input words are shown as tooltips
+                    print(tree.dot_format(result.words),file=fout)
+                elif format_spec:
                     print(format(tree,format_spec),file=fout)
                 start = timer()
                 tree2 = parser.unify_tree(tree)
@@ -229,8 +300,15 @@ def interact(grm_fname, single_translation=False, defines=set(), reverse=False):
                         print("Expression generate time:",  timer_delta(start,end), "mics")
                 start = timer()
                 trans_dict = defaultdict(list)
-                for sent,cost in tree3.enumx():
-                    trans_dict[parser.post_processor(sent)].append(cost)              
+                if show_alternate == 2:
+                    for sent,cost in tree3.enum_forest():
+                        trans_dict[parser.post_processor(sent)].append(cost)
+                else: # only the least cost translations are extracted, cheapest first
+                    for sent,cost in tree3.enum_best():
+                        if trans_dict and (show_alternate == 0 or cost != least_cost):
+                            break
+                        least_cost = cost
+                        trans_dict[parser.post_processor(sent)].append(cost)
                 trans_list = [(sent,min(costs)) for sent,costs in trans_dict.items()]
                 trans_list.sort(key=lambda item:item[1])
                 end = timer()
@@ -293,13 +371,18 @@ def print_usage():
         print("    -r: reverse compile the grammar")
         print("    -D <str1>[,<str2>]*: define <str1>,<str2>...")
         print("    -s <name.grmc>: save compiled grammar as <name.grmc>")
+        print("    -c <dir>: directory of compiled grammar cache (def: __grmcache__)")
+        print("    -n: do not use compiled grammar cache")
+        print("    -j <jobs>: translate input file by <jobs> processes")
 
 def main(argv):
     defines = set()
     reverse = False
+    cache = "__grmcache__"
+    jobs = 1
 
     import getopt
-    optlist,args = getopt.getopt(argv,"gri:s:D:d:")
+    optlist,args = getopt.getopt(argv,"gri:s:D:d:c:nj:")
 
     for opt,arg in optlist:
         if opt == '-g':
@@ -312,7 +395,7 @@ def main(argv):
             if args:
                 print_usage()
             else:
-                interact(arg, defines=defines, reverse=reverse)
+                interact(arg, defines=defines, reverse=reverse, cache=cache)
             return
         elif opt == '-s':
             if args:
@@ -322,13 +405,19 @@ def main(argv):
             return
         elif opt == '-r':
             reverse = True
+        elif opt == '-c':
+            cache = arg
+        elif opt == '-n':
+            cache = None
+        elif opt == '-j':
+            jobs = int(arg)
 
     if len(args) == 0:
         interact(os.path.join(os.path.dirname(__file__), 'grm', 'main.grmc'))
         #os.chdir(os.path.join(os.path.dirname(__file__), 'grm'))
         #interact('main.grm')
     elif len(args) == 2:
-        trans_file(args[0], args[1], defines=defines, reverse=reverse)
+        trans_file(args[0], args[1], defines=defines, reverse=reverse, cache=cache, jobs=jobs)
     else:
         print_usage()
 
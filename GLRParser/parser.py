@@ -7,21 +7,32 @@ This file define classes:
     ParserError,UnifyError: exceptions thrown when parsing or unification fails
       
 """
-import logging, re, copy, pickle, sys
-from collections import defaultdict
+import logging, re, pickle, multiprocessing, time, threading
+from collections import defaultdict, OrderedDict
 
 if __name__ == "__main__":
     from morpher import TurkishPostProcessor,PostProcessError
-    from grammar import Grammar,GrammarError,Rule,format_feat,format_fparam,Trie
+    from grammar import Grammar,GrammarError,Rule,format_feat,format_fparam,Trie,CompactTrie,FParam
+    from feature import FeatureSpace,FeatureVector
+    from table import ParseTable,DFAView,ReduceView,EmptyGotos
+    import grmc
+    from cache import GrammarCache
+    from lattice import Lattice
     from tree import *
 else:
     from .morpher import TurkishPostProcessor,PostProcessError
-    from .grammar import Grammar,GrammarError,Rule,format_feat,format_fparam,Trie
+    from .grammar import Grammar,GrammarError,Rule,format_feat,format_fparam,Trie,CompactTrie,FParam
+    from .feature import FeatureSpace,FeatureVector
+    from .table import ParseTable,DFAView,ReduceView,EmptyGotos
+    from . import grmc
+    from .cache import GrammarCache
+    from .lattice import Lattice
     from .tree import *
 
 empty_dict = dict()
 empty_set = set()
 empty_list = list()
+worker_parser = None # Parser used by worker processes of Parser.expand_parallel
 
 class ParseError(Exception):
     """ Raised when a sentence cannot be parsed with current grammar """
@@ -90,6 +101,572 @@ class DefPostProcessor:
     def __call__(self,sent):
         return sent.replace(" -","")
 
+class ParseTracer:
+    """ Receives parse steps from Parser.parse and logs them (at debug level)
+
+    attach a tracer to a parser by setting parser.tracer, a subclass can override methods to collect parse steps otherwise,
+    Parser.parse calls the tracer only if one is attached (or debug logging is enabled), so that parsing has no logging cost
+    """
+
+    def begin(self,parser,result):
+        """ called before parsing a sentence, result is the ParseResult being built """
+        self.parser = parser
+        self.result = result
+
+    def position(self,pos,active,edges):
+        """ called before reductions at position pos with active states and edges ending at pos """
+        logging.debug("pos=%d act_states=%s act_edges=%s", pos, active, edges)
+
+    def reduce(self,edge,ruleno,rulepos):
+        """ called for a reduction of the item (ruleno,rulepos) after edge """
+        logging.debug("Reducing %s after %s", self.parser.get_item(ruleno,rulepos), edge)
+
+    def ereduce(self,state,head,nstate):
+        """ called for an empty reduction of the NT head in state, where nstate is the next state """
+        logging.debug("EREDUCE %s , %s -> %s", state, head, nstate)
+
+    def goto(self,state,head,nstate):
+        """ called for the goto of a reduction, nstate is -1 if there is no transition """
+        logging.debug("REDUCE %s , %s -> %s", state, head, nstate)
+
+    def add_edge(self,edge,ptree):
+        """ called when an alternative ptree (ruleno followed by sub-edges) is appended to an edge """
+        logging.debug("appending edge %s to %s", Parser.format_edge_item(ptree), self.result.format_edge(edge))
+
+    def shift(self,edge,token):
+        """ called when token (a terminal, or a Rule matched in dictionary) is shifted as edge """
+        logging.debug("shift %s = %s", edge, token)
+
+class ParseLimits:
+    """ Resource limits of translating a sentence, when a limit is hit the stage prunes to its cheapest alternatives (by rule cost) and continues
+
+    limits are checked by Parser.parse (max_edges and deadline), Parser.make_tree and Parser.unify_tree (max_alts and deadline),
+    and Parser.trans_sent (deadline, for enumerating translations), a ParseLimits object is used for a single sentence
+
+    data:
+        max_edges : maximum number of stack edges of the graph structured stack, after which a node of the parse forest
+            gets a new packed alternative only if it is cheaper than its most expensive one (None for no limit)
+        max_alts : maximum number of alternatives of a node of a parse tree and of unification results of a node (None for no limit)
+        deadline : time (of time.perf_counter) after which each stage keeps only the cheapest alternative of a node (None for no limit)
+        hit : names of limits hit ("max_edges", "max_alts" or "deadline"), i.e. the translation is degraded if it is not empty
+    """
+
+    def __init__(self,max_edges=None,max_alts=None,time_limit=None):
+        """ time_limit is in seconds from now """
+        self.max_edges = max_edges
+        self.max_alts = max_alts
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        self.hit = []
+
+    def expired(self):
+        """ returns True if the deadline is passed, recording it as a limit hit """
+        if self.deadline is None or time.perf_counter() < self.deadline:
+            return False
+        self.degrade("deadline")
+        return True
+
+    def degrade(self,limit):
+        """ records a limit as hit """
+        if limit not in self.hit:
+            logging.warning("Limit %s is hit, pruning to cheapest alternatives", limit)
+            self.hit.append(limit)
+
+    def prune(self,alts,cost):
+        """ returns at most max_alts (only one after the deadline) cheapest of alternatives, where cost(alt) is the cost of an alternative """
+        if self.expired():
+            return [min(alts,key=cost)] if len(alts) > 1 else alts
+        if self.max_alts is not None and len(alts) > self.max_alts:
+            self.degrade("max_alts")
+            return sorted(alts,key=cost)[:self.max_alts]
+        return alts
+
+class TransCache:
+    """ Bounded LRU cache of the generation trees of right-only non-terminals, see Parser.make_trans_tree
+
+    an entry is keyed by (symbol, feature key, id of fparam), where the feature key is the immutable contents of the incoming
+    feature dict, and its value is (fparam,list of trees or message of the UnifyError), fparam is kept so that its id is not reused.
+    Feature dicts having references to sub-trees are not cached, as their translations depend on the sentence.
+    The cached trees are shared by all translations using them, which do not modify them.
+    The cache is cleared by Parser.set_table, i.e. whenever the rules change
+
+    data:
+        max_size : maximum number of entries, least recently used entries are evicted
+        entries : OrderedDict of entries in least recently used order
+        hits, misses : number of lookups found and not found in the cache
+    """
+
+    def __init__(self,max_size=4096):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        state["entries"] = OrderedDict()
+        return state
+
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def key(symbol,feat,fparam):
+        """ returns key of make_trans_tree arguments, None if the feature dict has references to sub-trees """
+        if type(feat) is FeatureVector:
+            return symbol, feat.bits, id(fparam)
+        for val in feat.values():
+            if type(val) != str:
+                return None
+        return symbol, frozenset(feat.items()), id(fparam)
+
+    def get(self,key,fparam):
+        """ returns cached trees (or message of the UnifyError) of a key, None if not found """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] is not fparam:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self,key,fparam,result):
+        """ caches trees (or message of the UnifyError) of a key, evicting the least recently used entry if full """
+        with self.lock:
+            self.entries[key] = (fparam,result)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """ removes all entries, keeping the counters """
+        with self.lock:
+            self.entries.clear()
+
+class CompiledGrammar:
+    """ A compiled grammar used for parsing, which is not modified once created, so it can be shared by parses in any number of threads
+
+    Parser.set_table creates a new CompiledGrammar whenever the grammar is (re)compiled or loaded, a parse uses the one current
+    when it starts. Dictionary rules added by Parser.add_rules and removed by Parser.remove_rules update the trie in place,
+    so they should not be called while other threads are parsing
+
+    data:
+        rules : list of rules, see Parser
+        ruledict : maps NT -> list of rulenos in "rules"
+        table : ParseTable
+        trie : dictionary (Trie or CompactTrie)
+        empty_gotos : EmptyGotos of the table
+        epsilon : SPPF of empty derivations, see Parser.make_epsilon
+    """
+    __slots__ = ('rules', 'ruledict', 'table', 'trie', 'empty_gotos', 'epsilon')
+
+    def __init__(self,rules,ruledict,table,trie,empty_gotos,epsilon):
+        self.rules = rules
+        self.ruledict = ruledict
+        self.table = table
+        self.trie = trie
+        self.empty_gotos = empty_gotos
+        self.epsilon = epsilon
+
+class ParseResult:
+    """ The parse of a sentence, returned by Parser.parse (and ParseSession.finish) and passed to Parser.make_tree
+
+    all state of a parse is kept in its ParseResult (and its ParseSession while parsing), not in the Parser,
+    so that a Parser can parse sentences in several threads at the same time
+
+    data:
+        grammar : CompiledGrammar used for parsing
+        limits : ParseLimits of the sentence, or None
+        degraded : names of limits hit while parsing and making the tree, see ParseLimits
+        lattice : Lattice of the input
+        words : words of the input followed by "$"
+        nodes : graph structured stack, maps (pos,state,symbol) -> set of (oldpos,oldstate), i.e. edges from stack node (pos,state) to (oldpos,oldstate)
+        edges : shared packed parse forest (SPPF), maps a node to the list of its packed alternatives, where
+            a symbol node (start,symbol,end) is shared by all stack edges of the symbol over the same span, with alternatives
+                [ruleno,symbol node,intermediate node for rulepos 1] or [ruleno,symbol node,epsilon node*] for a reduction,
+                and [rule,word*] for a dictionary match
+            an intermediate node (start,(ruleno,rulepos),end) stands for the rule body from rulepos over the span, with (binarised) alternatives
+                (symbol node,intermediate node for rulepos+1) or (symbol node,epsilon node*) for the last symbol
+            an epsilon node (-1,nt,-1) stands for all empty derivations of a nullable NT at any position, shared by all parses (see make_epsilon)
+            a terminal (start,word,end) is not in edges
+        top_edge : symbol node of the whole sentence
+    """
+
+    def __init__(self,grammar,lattice,nodes,edges,limits=None):
+        self.grammar = grammar
+        self.limits = limits
+        self.degraded = [] if limits is None else limits.hit
+        self.lattice = lattice
+        self.words = lattice.words
+        self.nodes = nodes
+        self.edges = edges
+        self.top_edge = None # set when the parse is finished
+
+    def format_edge(self,edge):
+        """ internal: format an edge into str (used internally for logging/debugging) """
+        if edge not in self.edges:
+            return Parser.format_node(edge) + " -> None"
+        return Parser.format_node(edge) + " -> " + " | ".join(
+            " ".join(Parser.format_node(alt) for alt in (alts if type(edge[1]) == tuple else alts[1:]))
+            for alts in self.edges[edge])
+
+    def print_parse_tables(self):
+        """ internal: print parse tables after parse """
+        indent = 7
+        space = " "*indent
+        for pos,token in enumerate(self.words):
+            print(str(pos).rjust(2,"-"),token.center(indent-2,"-"),sep="",end="")
+        print()
+        for (epos,estate,symbol),startset in sorted(self.nodes.items()):
+            for spos,sstate in startset:
+                print(space*spos, str(sstate).rjust(2), symbol.center((epos-spos)*indent-2,"="), str(estate).rjust(2,"="), " ", self.format_edge((spos,symbol,epos) if spos != epos else (-1,symbol,-1)), sep="")
+
+    def count_trees(self,node=None,counts=None):
+        """ returns number of derivations of an SPPF node (def: the top edge), without expanding the forest """
+        if node is None:
+            node, counts = self.top_edge, dict()
+        if node not in self.edges:
+            return 1
+        if node not in counts:
+            total = 0
+            for alt in self.edges[node]:
+                product = 1
+                for child in (alt if type(node[1]) == tuple else alt[1:]):
+                    product *= self.count_trees(child,counts)
+                total += product
+            counts[node] = total
+        return counts[node]
+
+    def make_tree_int(self,top,seqs):
+        """ generates a tree (which is a recursive list of lists) from a node of the SPPF, seqs maps intermediate nodes to their child sequences
+
+        each symbol node is made into a single list of alternative Trees, which is shared by all its parents (i.e. the tree is a DAG),
+        nodes are made iteratively in post-order, so that the depth of the tree is not limited by the recursion limit.
+        a derivation on a cycle of nodes (e.g. of A -> B and B -> A over the same span) is infinite, so it is left out
+        if the parse has limits, packed alternatives and alternatives of the tree node are pruned to the cheapest, see ParseLimits
+        """
+        edges = self.edges
+        if top not in edges:
+            return top[1] if type(top)==tuple else top # a terminal (pos1,term,pos2) or a word of a dictionary match
+        rules = self.grammar.rules
+        limits = self.limits
+        trees = dict() # maps symbol node to its alternative Trees
+        expanding = dict() # maps symbol node whose children are being made to its alternatives [(rule,ruleno,child sequences)*]
+        stack = [top]
+        while stack:
+            edge = stack[-1]
+            if edge in trees:
+                stack.pop()
+                continue
+            alts = expanding.get(edge)
+            if alts is None:
+                alt_edges = edges[edge]
+                if limits is not None:
+                    alt_edges = limits.prune(alt_edges,self.alt_cost)
+                alts = expanding[edge] = []
+                for alt_edge in alt_edges:
+                    ruleno = alt_edge[0]
+                    if type(ruleno)==int:
+                        rule = rules[ruleno]
+                    else:
+                        rule = ruleno
+                        ruleno = None
+                    assert type(rule) == Rule
+                    sub_edges = self.child_seqs(alt_edge[1:],seqs)
+                    alts.append((rule,ruleno,sub_edges))
+                    for seq in sub_edges:
+                        for child in seq:
+                            if type(child)==tuple and child in edges and child not in trees and child not in expanding:
+                                stack.append(child)
+                if stack[-1] is not edge:
+                    continue # children are made first
+            alt = []
+            for rule,ruleno,sub_edges in alts:
+                for seq in sub_edges:
+                    if any(child in expanding for child in seq if type(child)==tuple): # a cycle
+                        continue
+                    alt.append( Tree(
+                        head = edge[1],
+                        rule = rule,
+                        ruleno = ruleno,
+                        left = [trees[child] if child in trees else child[1] if type(child)==tuple else child for child in seq],
+                        right = rule.right,#.copy(),
+                        feat = rule.feat,
+                        cost = rule.cost,
+                        start = edge[0],
+                        end = edge[2]
+                    ) )
+            if limits is not None:
+                alt = limits.prune(alt,lambda tree:tree.cost)
+            del expanding[edge]
+            trees[edge] = alt
+            stack.pop()
+        return trees[top]
+
+    def alt_cost(self,alt):
+        """ internal: returns the rule cost of a packed alternative of a symbol node """
+        rule = alt[0]
+        return self.grammar.rules[rule].cost if type(rule) == int else rule.cost
+
+    def seq_cost(self,seq):
+        """ internal: returns estimated cost of a sequence of children, i.e. sum of the cheapest rule costs of its symbol nodes """
+        edges = self.edges
+        return sum(min(self.alt_cost(alt) for alt in edges[child]) for child in seq if child in edges)
+
+    def child_seqs(self,children,seqs):
+        """ internal: returns sequences of sub-edges of a packed alternative, i.e. its children with the trailing intermediate node (if any) expanded """
+        if not children or type(children[-1]) != tuple or type(children[-1][1]) != tuple:
+            return [children]
+        inode = children[-1]
+        if inode not in seqs:
+            seqs[inode] = [seq for alt in self.edges[inode] for seq in self.child_seqs(alt,seqs)]
+            if self.limits is not None:
+                seqs[inode] = self.limits.prune(seqs[inode],self.seq_cost)
+        prefix = tuple(children[:-1])
+        return [prefix+seq for seq in seqs[inode]]
+
+class ParseSession:
+    """ Parses a sentence incrementally, advancing the frontier of the graph structured stack one word at a time
+
+    feed(word) shifts a word and the dictionary matches completed by it, then performs reductions at the new position,
+    so the cost of a word is the work for the new position only; viable() tells whether the words fed so far can still be
+    a prefix of a sentence and expected() the symbols which can come next; finish() accepts the sentence (or raises ParseError)
+    and returns its ParseResult as Parser.parse (which parses a whole Lattice with a ParseSession)
+
+    data:
+        grammar : CompiledGrammar of the parser when the session is started
+        result : ParseResult, returned by finish
+        lattice : Lattice of the words fed so far
+        nodes, edges : graph structured stack and SPPF, see Parser
+        act_states : active set of states for each position
+        act_edges : active set of stack edges ending at each position, i.e. work items for reductions
+        pos : current position, i.e. the number of words fed
+        limits : ParseLimits or None
+    """
+
+    def __init__(self,parser,lattice=None,limits=None):
+        """ starts parsing with a parser, if lattice is given, its words are shifted by step (as in Parser.parse) instead of feed
+
+        limits is a ParseLimits, whose max_edges and deadline are checked before reductions of each position
+        """
+        self.parser = parser
+        grammar = self.grammar = parser.compiled # the tables are not changed by recompiling the parser while parsing
+        self.lattice = Lattice([],[],grammar.trie) if lattice is None else lattice
+        self.nodes = defaultdict(set)
+        self.edges = defaultdict(list,grammar.epsilon)
+        self.result = ParseResult(grammar,self.lattice,self.nodes,self.edges,limits)
+        self.packed = set() # packed alternatives already in edges, as (symbol node,ruleno,alternative) or (intermediate node,alternative)
+        self.act_states = [{0}] # initial state at initial position
+        self.act_edges = [set()]
+        self.pos = 0
+        self.limits = limits
+        self.num_edges = 0 # number of stack edges reduced so far
+        self.pruning = False # True after a limit is hit, see add_pruned
+        table = grammar.table
+        self.tables = (table.symbols.ids, table.base, table.check, table.next, # for local access in shift and reduce
+            table.reduce_start, table.reduce_rule, table.reduce_pos, grammar.rules, grammar.empty_gotos)
+        self.tracer = parser.tracer
+        if self.tracer is None and logging.getLogger().isEnabledFor(logging.DEBUG):
+            self.tracer = ParseTracer()
+        if self.tracer:
+            self.tracer.begin(parser,self.result)
+        self.reduce()
+
+    def feed(self,word,punct=" "):
+        """ parses the next word (with punctuation and spaces before it), returns viable() """
+        arcs = self.lattice.append(word.replace("’","'"),punct)
+        self.step(self.lattice.words[self.pos],arcs)
+        return self.viable()
+
+    def viable(self):
+        """ returns True if the words fed so far can be a prefix of a sentence, i.e. there is an active state at the current position,
+        or a partial dictionary match (which may be completed by next words) starting at a position with a state having a transition on a NT
+        """
+        act_states, table = self.act_states, self.grammar.table
+        return bool(act_states[self.pos]) or any(symbol[0].isupper() for start in {start for start,node in self.lattice.partial}
+            for state in act_states[start] for symbol,nstate in table.transitions(state))
+
+    def expected(self):
+        """ returns set of symbols which can come next, i.e. words (terminals) and NTs having a transition from an active state,
+        where a NT can come next as a dictionary entry, a number (CardinalNumber) or an unknown capitalised word (U) """
+        table = self.grammar.table
+        return {symbol for state in self.act_states[self.pos] for symbol,nstate in table.transitions(state)}
+
+    def finish(self,punct=""):
+        """ ends the sentence (with punctuation and spaces after the last word) and accepts it, raising ParseError if it cannot be parsed
+
+        returns the ParseResult, from which the parse tree can be made by Parser.make_tree
+        """
+        lattice = self.lattice
+        if len(lattice.words) == self.pos:
+            lattice.close(punct)
+        words = lattice.words
+        result = self.result
+        result.words = words
+        result.top_edge = (0,"S",self.pos) if self.pos else (-1,"S",-1)
+        if self.grammar.table.goto_symbol(0,"S") in self.act_states[self.pos]:
+            logging.info("Parse successful")
+            return result
+        pos = self.pos
+        while not self.act_states[pos]:
+            pos -= 1
+        error = "Parse is not possible at position %s: %s [* %s *] %s" % (pos, " ".join(words[0:pos]),words[pos]," ".join(words[pos+1:-1]))
+        logging.error(error)
+        raise ParseError(error)
+
+    def step(self,token,arcs):
+        """ internal: shifts token (a word) from active states of the current position, and arcs (start,length,Rule) i.e. dictionary matches
+        from active states of their start positions, then reduces at the next position """
+        symids, base, check, goto = self.tables[:4]
+        nodes, edges, act_states, act_edges = self.nodes, self.edges, self.act_states, self.act_edges
+        tracer = self.tracer
+        pos = self.pos
+        if len(act_states) == pos+1:
+            act_states.append(set())
+            act_edges.append(set())
+
+        active = act_states[pos]
+        symid = symids.get(token,-1)
+        if symid != -1:
+            for state in active:
+                idx = base[state] + symid
+                if check[idx] == state:
+                    nstate = goto[idx]
+                    nodes[pos+1,nstate,token].add((pos,state))
+                    nedge = (pos,state,token,pos+1,nstate)
+                    act_edges[pos+1].add(nedge)
+                    act_states[pos+1].add(nstate)
+                    if tracer:
+                        tracer.shift(nedge,token)
+
+        for start,input_len,rule in arcs:
+            token = rule.head
+            symid = symids.get(token,-1)
+            if symid == -1:
+                continue
+            nextpos = start + input_len
+            while len(act_states) <= nextpos:
+                act_states.append(set())
+                act_edges.append(set())
+            shifted = False
+            for state in act_states[start]:
+                idx = base[state] + symid
+                if check[idx] == state:
+                    nstate = goto[idx]
+                    nodes[nextpos,nstate,token].add((start,state))
+                    nedge = (start,state,token,nextpos,nstate)
+                    act_edges[nextpos].add(nedge)
+                    act_states[nextpos].add(nstate)
+                    shifted = True
+                    if tracer:
+                        tracer.shift(nedge,rule)
+            if shifted:
+                if self.pruning:
+                    self.add_pruned(edges[start,token,nextpos],[rule]+rule.left)
+                else:
+                    edges[start,token,nextpos].append([rule]+rule.left)
+
+        self.pos = pos+1
+        self.reduce()
+
+    def reduce(self):
+        """ internal: performs reductions and e-reductions at the current position, see Parser.parse """
+        symids, base, check, goto, reduce_start, reduce_rule, reduce_pos, rules, empty_gotos = self.tables
+        nodes, edges, packed = self.nodes, self.edges, self.packed
+        tracer = self.tracer
+        pos = self.pos
+
+        rlist = list(self.act_edges[pos])
+        active = self.act_states[pos]
+        walked = set() # (ruleno,rulepos,pos,state) of stack nodes walked back by reductions at pos
+        limits = self.limits
+        if limits is not None and not self.pruning:
+            if limits.max_edges is not None and self.num_edges > limits.max_edges:
+                limits.degrade("max_edges")
+                self.pruning = True
+            elif limits.expired():
+                self.pruning = True
+        pruning = self.pruning
+
+        if tracer:
+            tracer.position(pos,active,rlist)
+
+        for edge in rlist: # for each work item (start_position, start_state, edge_symbol, end_position, end_state)
+            spos,sstate,esymbol,epos,estate = edge
+            for idx in range(reduce_start[estate],reduce_start[estate+1]): # find reducible items for end_state
+                ruleno = reduce_rule[idx]
+                rulepos = reduce_pos[idx]
+                rule = rules[ruleno]
+                head = rule.head
+                body = rule.left
+                if tracer:
+                    tracer.reduce(edge,ruleno,rulepos)
+                assert esymbol == body[rulepos-1], "edge symbol %s does not match rule symbol %s" % (esymbol,body[rulepos-1])
+                alt = ((spos,esymbol,pos),) + tuple((-1,symbol,-1) for symbol in body[rulepos:]) # the edge and epsilon nodes of right nulled symbols
+                headid = symids.get(head,-1)
+                paths = [(rulepos-1,spos,sstate,alt)] # (rulepos,pos,state,alternative) walked breadth-first
+                for rpos,ppos,pstate,alt in paths:
+                    if rpos:
+                        inode = (ppos,(ruleno,rpos),pos) # intermediate node for body[rpos:] from ppos to pos
+                        if (inode,alt) not in packed:
+                            packed.add((inode,alt))
+                            if not pruning or inode not in edges: # after a limit is hit, an intermediate node keeps its first alternative
+                                edges[inode].append(alt)
+                        if (ruleno,rpos,ppos,pstate) in walked:
+                            continue
+                        walked.add((ruleno,rpos,ppos,pstate))
+                        symbol = body[rpos-1]
+                        for xpos,xstate in nodes[ppos,pstate,symbol]:
+                            child = (xpos,symbol,ppos) if xpos != ppos else (-1,symbol,-1) # an empty edge is an e-reduction
+                            paths.append((rpos-1,xpos,xstate,(child,inode)))
+                        continue
+                    idx = base[pstate] + headid
+                    nstate = goto[idx] if headid != -1 and check[idx] == pstate else -1
+                    if tracer:
+                        tracer.goto(pstate,head,nstate)
+                    if nstate != -1:
+                        active.add(nstate)
+                        prev = nodes[pos,nstate,head]
+                        if (ppos,pstate) not in prev:
+                            prev.add((ppos,pstate))
+                            rlist.append((ppos,pstate,head,pos,nstate))
+                        node = (ppos,head,pos)
+                        if (node,ruleno,alt) not in packed:
+                            packed.add((node,ruleno,alt))
+                            ptree = [ruleno]
+                            ptree.extend(alt)
+                            if pruning:
+                                self.add_pruned(edges[node],ptree)
+                            else:
+                                edges[node].append(ptree)
+                            if tracer:
+                                tracer.add_edge(node,ptree)
+
+        self.num_edges += len(rlist)
+        actlist = list(active)
+
+        for state in actlist: # e-reductions add stack edges only, their subtrees are the shared epsilon nodes
+            for head,nstate in empty_gotos[state]:
+                if tracer:
+                    tracer.ereduce(state,head,nstate)
+                if nstate not in active:
+                    active.add(nstate)
+                    actlist.append(nstate)
+                nodes[pos,nstate,head].add((pos,state))
+
+    def add_pruned(self,alts,ptree):
+        """ internal: adds a packed alternative to alternatives of a symbol node after a limit is hit,
+        i.e. replaces its most expensive alternative if the new one is cheaper, or adds it if there are no alternatives """
+        if not alts:
+            alts.append(ptree)
+            return
+        cost = self.result.alt_cost
+        idx = max(range(len(alts)),key=lambda idx:cost(alts[idx]))
+        if cost(ptree) < cost(alts[idx]):
+            alts[idx] = ptree
+
 class Parser:
     """ A GLR Parser for Natural Language Processing and Translation
 
@@ -99,18 +676,38 @@ class Parser:
             rules : list of rules as named tuple Rule(head,left,right,feat,lparam,rparam,lcost,rcost) 
             ruledict : maps NT -> list of rulenos in "rules"
             nullable : set of nullable NTs, an NT is nullable if it can produce directly or indirectly an empty string
-            dfa : Deterministic Finite Automaton for state transitions, where dfa[state,symbol] -> nextstate
-            reduce : maps a state to a list of reductions  reduce[state] -> [(ruleno,rulepos)*]
-            ereduce : maps a state to a list of empty reductions  ereduce[state] -> [(ruleno,rulepos)*]
+            table : ParseTable, integer-encoded symbols with array-backed dfa, reduce and ereduce tables used by parse
+            dfa : Deterministic Finite Automaton for state transitions, where dfa[state,symbol] -> nextstate (a read-only view of table)
+            reduce : maps a state to a list of reductions  reduce[state] -> [(ruleno,rulepos)*] (a read-only view of table)
+            ereduce : maps a state to a list of empty reductions  ereduce[state] -> [(ruleno,rulepos)*] (a read-only view of table)
+            compiled : CompiledGrammar of the current tables, shared by parses
+            epsilon : SPPF of empty derivations, see make_epsilon
+            features : FeatureSpace encoding feature dicts of rules whose values are atoms into FeatureVectors, or None
+            trans_cache : TransCache of generation trees of right-only non-terminals, see make_trans_tree
+
+        the parse of a sentence is a ParseResult (see parse), no parse state is kept in the parser, so parse, make_tree,
+        unify_tree and trans_tree can be called by several threads at the same time
     """
     pre_processors  = { None: DummyPreProcessor, "": DefPreProcessor,  "EN": EnglishPreProcessor,  "TR": TurkishPreProcessor }
     post_processors = { None: DummyPreProcessor, "": DefPostProcessor, "EN": EnglishPostProcessor, "TR": TurkishPostProcessor }
+    min_parallel_batch = 256 # smaller batches of states are expanded in the compiling process, see expand_parallel
+    trans_cache_size = 4096 # maximum number of cached generation trees of right-only non-terminals, see TransCache
+
+    def __init__(self,pre_process="",post_process="",reverse=False,cache=None,feature_space=False):
+        """ initializes parser with pre_processor and post_processor, which should be callable, reverse reverses(i.e. swaps) the input/output grammars
 
-    def __init__(self,pre_process="",post_process="",reverse=False):
-        """ initializes parser with pre_processor and post_processor, which should be callable, reverse reverses(i.e. swaps) the input/output grammars """
+        cache is a GrammarCache (or its directory), where parse_grammar looks up compiled grammars and compile saves them
+        if feature_space is True, feature structures are unified as bit sets of a FeatureSpace (see features)
+        """
         self.pre_processor  = self.pre_processors[pre_process]()
         self.post_processor = self.post_processors[post_process]()
         self.reverse = reverse
+        self.cache = GrammarCache(cache) if type(cache) == str else cache
+        self.cache_key = None # source key of the parsed grammar, to be stored in the cache when compiled
+        self.cache_hit = False # True if tables of the parsed grammar are loaded from the cache, i.e. compile is not needed
+        self.tracer = None # ParseTracer receiving parse steps, see parse
+        self.features = FeatureSpace() if feature_space else None
+        self.trans_cache = TransCache(self.trans_cache_size)
         self.re_word_split = re.compile(r"(-?\d+(?:[.,]\d+)*|(?<=\w)['’]\w+|\w+(?:['’]t)?)")
 
         
@@ -120,29 +717,25 @@ class Parser:
         self.rules: [ rule(head,body[symbol*],trans) ]
         self.ruledict: { nt:{ruleno*} }
         """
-
-        todo = list(stateset)
-        # we use both list for iteration and set for membership check
-        # for iteration we use set as FIFO, for membership check we use set for O(1) complexity
-        for ruleno,rulepos in todo:
-            try:
-                symbol = self.rules[ruleno].left[rulepos]
-                for nextno in self.ruledict.get(symbol,set()):
-                    nextstate = (nextno,0)
-                    if nextstate not in stateset: 
-                        stateset.add(nextstate)
-                        todo.append(nextstate)
-                """                            
-                while symbol in self.nullable:
-                    rulepos += 1
-                    nextstate = (ruleno,rulepos)
-                    if nextstate not in stateset: 
-                        stateset.add(nextstate)
-                        todo.append(nextstate)              
-                    symbol = self.rules[ruleno].left[rulepos]
-                """
-            except IndexError: # there is no more symbols in the rule (i.e. A->x.)
-                pass
+        for ntid in Parser.iter_bits(self.predict(stateset)):
+            stateset.update((ruleno,0) for ruleno in self.ruledict[self.nt_names[ntid]])
+
+    def predict(self,kernel):
+        """ returns bit set of ids of NTs whose rules are added to the kernel by closure, i.e. union of precomputed closures of NTs after the dots """
+        rules, reach = self.rules, self.reach
+        predicted = 0
+        for ruleno,rulepos in kernel:
+            body = rules[ruleno].left
+            if rulepos < len(body):
+                predicted |= reach.get(body[rulepos],0)
+        return predicted
+
+    def iter_bits(bits):
+        """ yields indexes of set bits of an integer in increasing order """
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
 
     def format_rules(self):
         """ return string repr of all rules """
@@ -160,100 +753,482 @@ class Parser:
         """ get string repr of a single state item """
         return "{} -> {} . {}".format(self.rules[ruleno].head, " ".join(self.rules[ruleno].left[0:rulepos]), " ".join(self.rules[ruleno].left[rulepos:]))    
 
-    def compile(self):
+    def compile(self,workers=None):
         """ compile rule list "rules" to a DFA
 
-        produces dfa, reduce and ereduce tables(dictionaries) from rules
+        produces dfa, reduce and ereduce tables from rules, which are packed into an array-backed ParseTable
+        a dfa state is kept as its kernel and the bit set of NTs predicted by the kernel (i.e. its closure), for incremental compilation, see update_rules
+        if workers > 1, states are expanded by a pool of that many processes, producing the same tables as a serial compile
+        if the grammar is loaded from the cache by parse_grammar, nothing is done; otherwise the compiled grammar is saved to the cache
         """
+        if self.cache_hit:
+            self.cache_hit = False
+            return
+        self.ruledict = Parser.make_ruledict(rule.head for rule in self.rules)
+        self.nullable = Parser.find_nullable(self.rules)
+        self.nt_ids = dict() # maps NT to its id, used as bit index in predicted NT sets
+        self.nt_names = []
+        self.prepare()
+        self.kernels = [] # list of kernels of states, i.e. items which are not added by closure
+        self.predicted = [] # list of bit sets of NTs predicted by kernels of states
+        self.statedict = dict() # maps kernel of a state to the dfa state
+        self.gotos = [] # maps state to {symbol:nextstate}
+        todo = [self.add_state(frozenset([(0,0)]))]
+        if workers and workers > 1:
+            self.expand_parallel(todo,workers)
+        else:
+            self.expand(todo)
+        self.build_table()
+        if self.cache_key is not None and self.grammar is not None:
+            self.cache.store(self.cache_key,self.grammar.sources,self)
+        self.cache_key = None
 
-        rules = self.rules
-        ruledict = defaultdict(list)
-        dfa = dict()
-        reduce = defaultdict(set)
-        ereduce = defaultdict(set)
-        
-        self.ruledict = ruledict
-        self.dfa = dfa
-        self.reduce = reduce
-        self.ereduce = ereduce
-        
-        for ruleno,rule in enumerate(rules):
-            ruledict[rule.head].append(ruleno)
+    def find_nullable(rules):
+        """ returns set of nullable NTs
 
-        # todo: more efficient algorithm for large grammars
+        a rule is pending until all symbols in its body are known to be nullable, when a NT becomes nullable it is propagated to the rules using it
+        """
+        pending = [len(rule.left) for rule in rules] # number of symbols in rule body which are not known to be nullable
+        users = defaultdict(list) # maps symbol to rulenos of rules using it, once for each occurrence
+        for ruleno,rule in enumerate(rules):
+            for symbol in rule.left:
+                users[symbol].append(ruleno)
         nullable = {rule.head for rule in rules if len(rule.left)==0}  # empty productions
-        flag = bool(nullable)
-        while flag:
-            flag = False
-            for rule in rules:
-                if all(map(lambda x:x in nullable,rule.left)): # all of symbols in RHS is nullable
-                    if rule.head not in nullable:
-                        nullable.add(rule.head)
-                        flag = True
-            
+        todo = list(nullable)
+        for symbol in todo:
+            for ruleno in users.get(symbol,()):
+                pending[ruleno] -= 1
+                if pending[ruleno] == 0 and rules[ruleno].head not in nullable:
+                    nullable.add(rules[ruleno].head)
+                    todo.append(rules[ruleno].head)
         logging.info("nullable=%s", nullable)
-        self.nullable = nullable
-        
-        statedict = dict() # maps set of nfa states to a single dfa state
-        stateset = {(0,0)}
+        return nullable
+
+    def prepare(self):
+        """ internal: precomputes for each NT, closure as a bit set of reachable NTs, shift items and empty reductions of its rules
+
+            reach : maps NT to bit set of NTs predicted by a dot before it, i.e. itself and NTs reachable by first symbols of rules
+            shifts : maps NT id to {symbol:[(ruleno,1)*]} for its rules
+            ereductions : maps NT id to [(ruleno,0)*] for its nullable rules
+            nullable_from : maps ruleno to the smallest rulepos after which all symbols are nullable
+        """
+        rules, ruledict, nullable = self.rules, self.ruledict, self.nullable
+        for head in ruledict:
+            if head not in self.nt_ids:
+                self.nt_ids[head] = len(self.nt_names)
+                self.nt_names.append(head)
+        nt_ids = self.nt_ids
+        self.shifts = [dict() for ntid in self.nt_names]
+        self.ereductions = [[] for ntid in self.nt_names]
+        self.nullable_from = nullable_from = []
+        firsts = defaultdict(set) # maps NT to NTs which are first symbols of its rules
+        for ruleno,rule in enumerate(rules):
+            body = rule.left
+            rulepos = len(body)
+            while rulepos > 0 and body[rulepos-1] in nullable:
+                rulepos -= 1
+            nullable_from.append(rulepos)
+            ntid = nt_ids[rule.head]
+            if rulepos == 0:
+                self.ereductions[ntid].append((ruleno,0))
+            if body:
+                self.shifts[ntid].setdefault(body[0],[]).append((ruleno,1))
+                if body[0] in ruledict:
+                    firsts[rule.head].add(body[0])
+
+        self.reach = reach = dict()
+        for head in ruledict:
+            bits = 1 << nt_ids[head]
+            todo = [head]
+            for symbol in todo:
+                for first in firsts[symbol]:
+                    if not bits & (1 << nt_ids[first]):
+                        bits |= 1 << nt_ids[first]
+                        todo.append(first)
+            reach[head] = bits
+
+    def add_state(self,kernel):
+        """ internal: adds a new dfa state for the kernel, returns state number """
+        stateno = len(self.kernels)
+        self.statedict[kernel] = stateno
+        self.kernels.append(kernel)
+        self.predicted.append(0) # set when the state is expanded
+        self.gotos.append(dict())
+        return stateno
+
+    def get_state(self,stateno):
+        """ returns item set (closure) of a state """
+        stateset = set(self.kernels[stateno])
         self.closure(stateset)
-        statedict[frozenset(stateset)] = 0
-        states = [stateset] # list of nfa state set, also used to map dfa state to nfa state set
+        return stateset
+
+    def expand_kernel(self,kernel):
+        """ internal: returns bit set of NTs predicted by the kernel and transitions of its state as [(symbol,[(ruleno,rulepos)*])*]
+
+        the result depends only on the items of the kernel (not on the iteration order of the set), so that states are numbered the same
+        whether they are expanded by this process or by a worker process, see expand_parallel
+        """
+        rules, shifts = self.rules, self.shifts
+        predicted = self.predict(kernel)
+        tempdict = defaultdict(list) # maps symbol to list of next states
+        for ruleno,rulepos in sorted(kernel):
+            body = rules[ruleno].left
+            if rulepos < len(body): # get next symbol after dot (i.e. A->x.By)
+                tempdict[body[rulepos]].append((ruleno,rulepos+1))
+        for ntid in Parser.iter_bits(predicted):
+            for symbol,items in shifts[ntid].items():
+                tempdict[symbol].extend(items)
+        return predicted, list(tempdict.items())
+
+    def add_transitions(self,stateno,predicted,transitions,todo):
+        """ internal: sets transitions of a state as returned by expand_kernel, adding any new states to todo """
+        statedict = self.statedict
+        self.predicted[stateno] = predicted
+        gotos = self.gotos[stateno] = dict()
+        for symbol,items in transitions:
+            kernel = frozenset(items)
+            nextstateno = statedict.get(kernel,-1)
+            if nextstateno == -1:
+                nextstateno = self.add_state(kernel)
+                todo.append(nextstateno)
+            gotos[symbol] = nextstateno
+
+    def expand(self,todo):
+        """ internal: computes transitions of states in todo, adding any new states to todo """
+        for stateno in todo:
+            self.add_transitions(stateno,*self.expand_kernel(self.kernels[stateno]),todo)
+
+    def expand_parallel(self,todo,workers):
+        """ internal: same as expand, but transitions of states are computed by a pool of worker processes
+
+        states are expanded in batches, where a batch is all states in todo which are not expanded yet (i.e. the frontier).
+        results of a batch are merged in todo order, so that states are numbered exactly as in expand.
+        small batches are expanded in this process, as it is cheaper than sending them to workers
+        """
+        worker_parser = Parser.__new__(Parser) # only the tables used by expand_kernel are sent to workers
+        worker_parser.rules, worker_parser.reach, worker_parser.shifts = self.rules, self.reach, self.shifts
+        with multiprocessing.Pool(workers,Parser.init_worker,(worker_parser,)) as pool:
+            pos = 0
+            while pos < len(todo):
+                batch = todo[pos:]
+                pos = len(todo)
+                kernels = [self.kernels[stateno] for stateno in batch]
+                if len(batch) < self.min_parallel_batch:
+                    results = map(self.expand_kernel,kernels)
+                else:
+                    results = pool.map(Parser.expand_worker,kernels,chunksize=len(batch)//(workers*4)+1)
+                for stateno,(predicted,transitions) in zip(batch,results):
+                    self.add_transitions(stateno,predicted,transitions,todo)
+
+    def init_worker(parser):
+        """ internal: initializes a worker process of expand_parallel """
+        global worker_parser
+        worker_parser = parser
+
+    def expand_worker(kernel):
+        """ internal: expand_kernel run in a worker process of expand_parallel """
+        return worker_parser.expand_kernel(kernel)
+
+    def find_reductions(self,stateno):
+        """ internal: returns (reduce,ereduce) sets of a state """
+        nullable_from = self.nullable_from
+        reduce = set()
+        ereduce = set()
+        for ruleno,rulepos in self.kernels[stateno]:
+            if rulepos >= nullable_from[ruleno]: # if all remaining items are nullable
+                if rulepos == 0: # empty or nullable rule
+                    ereduce.add((ruleno,rulepos))                   
+                else:
+                    reduce.add((ruleno,rulepos))
+        for ntid in Parser.iter_bits(self.predicted[stateno]):
+            ereduce.update(self.ereductions[ntid])
+        return reduce,ereduce
+
+    def build_table(self,changed=None,old_gotos=None):
+        """ internal: computes reduce and ereduce tables from states and packs them with the dfa into a ParseTable
+
+        if changed is given, only reductions of changed states are recomputed and only their transitions are re-packed into the current table,
+        where old_gotos maps each changed state which is already in the table to its transitions in the table
+        """
+        num_states = len(self.kernels)
+        if changed is None:
+            self.state_reductions = [self.find_reductions(stateno) for stateno in range(num_states)]
+        else:
+            self.state_reductions.extend([None]*(num_states-len(self.state_reductions)))
+            for stateno in changed:
+                self.state_reductions[stateno] = self.find_reductions(stateno)
+        reduce = {stateno:items[0] for stateno,items in enumerate(self.state_reductions) if items[0]}
+        ereduce = {stateno:items[1] for stateno,items in enumerate(self.state_reductions) if items[1]}
+        if changed is None:
+            dfa = {(stateno,symbol):nextstateno for stateno,gotos in enumerate(self.gotos) for symbol,nextstateno in gotos.items()}
+            self.set_table(ParseTable.build(num_states,dfa,reduce,ereduce))
+        else:
+            self.set_table(self.table.update(num_states,{stateno:self.gotos[stateno] for stateno in changed},old_gotos,reduce,ereduce))
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            for stateno in range(num_states):
+                logging.debug("%s : %s REDUCE: %s EREDUCE: %s", stateno, self.get_items(self.get_state(stateno)), self.get_items(reduce.get(stateno,set())), self.get_items(ereduce.get(stateno,set())))
+
+    def update_rules(self,added=(),removed=()):
+        """ adds and removes grammar rules (i.e. rules which are not in the trie), recompiling only affected dfa states
+
+        a state is affected if its kernel contains an item of a removed rule or a dot before the head of an added or removed rule,
+        or it predicts a NT which is such a head or has a rule starting with such a head.
+        only affected states (and new states reached from them) are recomputed, other states keep their kernels and transitions.
+        if the grammar is not compiled in this session (e.g. loaded by load_grammar), it is fully compiled
+        """
+        rules = self.rules
+        if type(rules) != list: # read-only rules of a compiled grammar file
+            rules = self.rules = list(rules)
+        removed_nos = set()
+        for rule in removed:
+            ruleno = next((ruleno for ruleno,item in enumerate(rules) if ruleno not in removed_nos and item == rule),-1)
+            if ruleno < 0:
+                raise GrammarError("Rule to be removed not found: %s" % rule)
+            if ruleno == 0:
+                raise GrammarError("Start rule can not be removed: %s" % rule)
+            removed_nos.add(ruleno)
+        heads = {rule.head for rule in added} | {rule.head for rule in removed}
+        remap = [] # maps old ruleno to new ruleno (-1 for removed rules)
+        ruleno = 0
+        for idx in range(len(rules)):
+            if idx in removed_nos:
+                remap.append(-1)
+            else:
+                remap.append(ruleno)
+                ruleno += 1
+        rules[:] = [rule for idx,rule in enumerate(rules) if idx not in removed_nos] # in place, as rules may be shared with the grammar
+        rules.extend(added)
+
+        if getattr(self,"kernels",None) is None:
+            self.cache_hit = False # rules are changed
+            self.compile()
+            return
+        self.ruledict = Parser.make_ruledict(rule.head for rule in rules)
+        nullable = self.nullable
+        self.nullable = Parser.find_nullable(rules)
+        self.prepare()
+
+        # NTs whose predictions change: heads and NTs with a rule starting with a head
+        changed_nts = 0
+        for rule in rules:
+            if rule.head in heads or rule.left and rule.left[0] in heads:
+                changed_nts |= 1 << self.nt_ids[rule.head]
+        for head in heads:
+            if head in self.nt_ids:
+                changed_nts |= 1 << self.nt_ids[head]
+
+        # renumber items of all kernels, dropping items of removed rules
+        affected = []
+        kernels = self.kernels
+        self.statedict = statedict = dict()
+        for stateno,kernel in enumerate(kernels):
+            is_affected = bool(self.predicted[stateno] & changed_nts)
+            if removed_nos:
+                newkernel = frozenset((remap[ruleno],rulepos) for ruleno,rulepos in kernel if remap[ruleno] != -1)
+                is_affected = is_affected or len(newkernel) != len(kernel)
+                kernel = kernels[stateno] = newkernel
+                self.state_reductions[stateno] = tuple({(remap[ruleno],rulepos) for ruleno,rulepos in items if remap[ruleno] != -1} for items in self.state_reductions[stateno])
+            if not is_affected:
+                for ruleno,rulepos in kernel:
+                    body = rules[ruleno].left
+                    if rulepos < len(body) and body[rulepos] in heads:
+                        is_affected = True
+                        break
+            if is_affected:
+                affected.append(stateno)
+            statedict.setdefault(kernel,stateno)
+        logging.info("update_rules: %d of %d states affected", len(affected), len(kernels))
+
+        old_gotos = {stateno:self.gotos[stateno] for stateno in affected}
+        self.expand(affected) # also appends new states to affected
+        if self.remove_unreachable() or self.nullable != nullable:
+            self.build_table()
+        else:
+            self.build_table(affected,old_gotos)
+
+    def remove_unreachable(self):
+        """ internal: removes states which are not reachable from the initial state, renumbering remaining states
+
+        unreachable states are kept (as they are harmless for parsing) unless they are more than a quarter of all states,
+        so that state numbers of the current table remain valid. returns True if states are renumbered
+        """
+        num_states = len(self.kernels)
+        reachable = [False] * num_states
+        reachable[0] = True
         todo = [0]
         for stateno in todo:
-            tempdict = defaultdict(set) # maps symbol to set of next states
-            for ruleno,rulepos in states[stateno]:          
-                try:
-                    symbol = rules[ruleno].left[rulepos] # get next symbol after dot (i.e. A->x.By)
-                    tempdict[symbol].add((ruleno,rulepos+1))
-                except IndexError: # there is no more symbols in the rule (i.e. A->x.)
-                    pass
-            for symbol,nextstateset in tempdict.items():
-                self.closure(nextstateset)
-                f = frozenset(nextstateset)
-                nextstateno = statedict.get(f,-1)
-                if nextstateno == -1:
-                    nextstateno = len(states)
-                    statedict[f] = nextstateno
-                    states.append(nextstateset)
+            for nextstateno in self.gotos[stateno].values():
+                if not reachable[nextstateno]:
+                    reachable[nextstateno] = True
                     todo.append(nextstateno)
-                dfa[stateno,symbol] = nextstateno
-        for idx,stateset in enumerate(states):
-            for ruleno,rulepos in stateset:
-                body = rules[ruleno].left
-                if all(map(lambda x:x in nullable,body[rulepos:])): # if all remaining items are nullable
-                    if rulepos == 0: # empty or nullable rule
-                        ereduce[idx].add((ruleno,rulepos))                   
-                    else:
-                        reduce[idx].add((ruleno,rulepos))
-        if logging.getLogger().isEnabledFor(logging.DEBUG):
-            for stateno,stateset in enumerate(states):
-                logging.debug("%s : %s REDUCE: %s EREDUCE: %s", stateno, self.get_items(stateset), self.get_items(reduce.get(stateno,set())), self.get_items(ereduce.get(stateno,set())))
-
-    def save_grammar(self,fname):
-        with open(fname,"wb") as fout:
-            pickle.dump(self.rules, fout)
-            pickle.dump(self.trie, fout)
-            pickle.dump(self.post_processor.suff_dict, fout)
-            pickle.dump(self.dfa, fout)
-            pickle.dump(self.reduce, fout)
-            pickle.dump(self.ereduce, fout)
-            pickle.dump(self.ruledict, fout)
-
-    def load_grammar(self,fname):
+        if len(todo) >= num_states - num_states//4:
+            return False
+        keep = [stateno for stateno in range(num_states) if reachable[stateno]]
+        renumber = [-1] * num_states
+        for newno,stateno in enumerate(keep):
+            renumber[stateno] = newno
+        self.kernels = [self.kernels[stateno] for stateno in keep]
+        self.predicted = [self.predicted[stateno] for stateno in keep]
+        self.gotos = [{symbol:renumber[nextstateno] for symbol,nextstateno in self.gotos[stateno].items()} for stateno in keep]
+        self.statedict = {kernel:stateno for stateno,kernel in enumerate(self.kernels)}
+        return True
+
+    def parse_rules(self,text):
+        """ internal: parses rules in text within the context (macros, forms, auto_dict etc.) of the parsed grammar, returns (rules,trie) """
+        grammar = getattr(self,"grammar",None)
+        if grammar is None:
+            grammar = self.grammar = Grammar(self.reverse)
+            grammar.fname = ""
+            grammar.suff_dict = self.post_processor.suff_dict
+        rules,trie = grammar.rules,grammar.trie
+        grammar.rules,grammar.trie = [],Trie()
+        try:
+            grammar.parse_grammar_int(text.split('\n'))
+            return grammar.rules,grammar.trie
+        finally:
+            grammar.rules,grammar.trie = rules,trie
+
+    def add_rules(self,text):
+        """ adds rules in grammar format, dictionary rules are added to the trie without any recompilation """
+        rules,trie = self.parse_rules(text)
+        for keyseq,rule in trie.items():
+            self.trie.add(keyseq,rule)
+        if rules:
+            self.update_rules(added=rules)
+
+    def remove_rules(self,text):
+        """ removes rules in grammar format, dictionary rules are removed from the trie without any recompilation """
+        rules,trie = self.parse_rules(text)
+        for keyseq,rule in trie.items():
+            try:
+                self.trie.remove(keyseq,rule)
+            except (KeyError,ValueError):
+                raise GrammarError("Rule to be removed not found: %s" % rule)
+        if rules:
+            self.update_rules(removed=rules)
+
+    def make_ruledict(heads):
+        """ returns ruledict which maps each NT to the list of its rulenos, given the heads of rules in order """
+        ruledict = defaultdict(list)
+        for ruleno,head in enumerate(heads):
+            ruledict[head].append(ruleno)
+        return ruledict
+
+    def set_table(self,table):
+        """ sets the ParseTable used for parsing, dfa, reduce and ereduce are set as read-only views of the table
+
+        empty_gotos and epsilon (the SPPF of empty derivations) are derived from e-reductions of the table, see parse
+        the tables are shared by parses as a new CompiledGrammar, with a copy of rules (which are modified in place by update_rules),
+        empty_gotos and epsilon use the same copy, so that parses started before update_rules keep their rule numbers
+        """
+        self.table = table
+        self.dfa = DFAView(table)
+        self.reduce = ReduceView(table)
+        self.ereduce = ReduceView(table,empty=True)
+        rules = tuple(self.rules) if type(self.rules) == list else self.rules
+        self.empty_gotos = EmptyGotos(table,rules)
+        self.epsilon = self.make_epsilon(rules)
+        self.compiled = CompiledGrammar(rules,self.ruledict,table,self.trie,self.empty_gotos,self.epsilon)
+        self.trans_cache.clear()
+
+    def make_epsilon(self,rules):
+        """ internal: returns the SPPF of empty derivations of rules, which maps the epsilon node (-1,nt,-1) of each nullable NT to its packed alternatives
+
+        an alternative is [ruleno,epsilon node*] for a rule whose body is all nullable, i.e. a rule of an e-reduction
+        NTs are ranked in the order they are found to be nullable, and an alternative on a cycle (e.g. of Adv -> Adv Adv) is kept only
+        if symbols of its body which can derive its head have lower ranks than its head, so that each empty subtree is finite
+        """
+        rulenos = sorted(set(self.table.ereduce_rule))
+        rank = dict()
+        changed = True
+        while changed:
+            changed = False
+            for ruleno in rulenos:
+                rule = rules[ruleno]
+                if rule.head not in rank and all(symbol in rank for symbol in rule.left):
+                    rank[rule.head] = len(rank)
+                    changed = True
+        children = defaultdict(set)
+        for ruleno in rulenos:
+            children[rules[ruleno].head].update(rules[ruleno].left)
+        reach = dict() # maps nullable NT to NTs in its empty derivations
+        for head in rank:
+            todo = list(children[head])
+            reached = set(todo)
+            for symbol in todo:
+                for child in children[symbol]:
+                    if child not in reached:
+                        reached.add(child)
+                        todo.append(child)
+            reach[head] = reached
+        epsilon = dict()
+        for ruleno in rulenos:
+            rule = rules[ruleno]
+            if all(rank[symbol] < rank[rule.head] or rule.head not in reach[symbol] for symbol in rule.left):
+                epsilon.setdefault((-1,rule.head,-1),[]).append([ruleno]+[(-1,symbol,-1) for symbol in rule.left])
+        return epsilon
+
+    def save_grammar(self,fname,version=grmc.VERSION):
+        """ saves compiled grammar to a file, version 1 is the older pickle stream format, version 2 the older binary trie layout """
+        if version == 1:
+            trie = self.trie.to_trie() if isinstance(self.trie,CompactTrie) else self.trie
+            with open(fname,"wb") as fout:
+                pickle.dump(list(self.rules), fout)
+                pickle.dump(trie, fout)
+                pickle.dump(self.post_processor.suff_dict, fout)
+                pickle.dump(self.table, fout)
+                pickle.dump(self.ruledict, fout)
+        else:
+            self.grammar_hash = grmc.write_grammar(fname,self.rules,self.trie,self.post_processor.suff_dict,self.table,version)
+
+    def load_grammar(self,fname,verify=False,mapped=False):
+        """ loads a compiled grammar saved by save_grammar, either in binary format or in older pickle stream format
+
+        if verify is True, contents of a binary file are checked against its grammar hash
+        if mapped is True, a binary file is memory-mapped and parse tables are read in place, sharing memory among processes
+        """
+        self.grammar = self.kernels = None
+        self.cache_key = None
+        self.cache_hit = False
+        if grmc.is_grammar_file(fname):
+            self.rules,self.trie,self.post_processor.suff_dict,table,self.grammar_hash = grmc.read_grammar(fname,verify,mapped)
+            self.ruledict = Parser.make_ruledict(self.rules.heads())
+            self.set_table(table)
+            return
         with open(fname,"rb") as fin:
             self.rules = pickle.load(fin)
             self.trie = pickle.load(fin)
             self.post_processor.suff_dict = pickle.load(fin)
-            self.dfa = pickle.load(fin)
-            self.reduce = pickle.load(fin)
-            self.ereduce = pickle.load(fin)
+            table = pickle.load(fin)
+            if type(table) != ParseTable: # older format: dfa, reduce and ereduce dicts
+                dfa = table
+                reduce = pickle.load(fin)
+                ereduce = pickle.load(fin)
+                num_states = max(max(dfa.values(),default=0),max(reduce,default=0),max(ereduce,default=0)) + 1
+                table = ParseTable.build(num_states,dfa,reduce,ereduce)
             self.ruledict = pickle.load(fin)
+            self.set_table(table)
+            self.grammar_hash = None
    
     def parse_grammar(self,fname=None,reverse=False,text=None,defines=None):
-        """ loads a grammar file and parse it """
+        """ loads a grammar file and parse it
+
+        if the parser has a cache and the grammar with the same sources is compiled before, the compiled grammar is loaded instead
+        """
+        self.cache_key = None
+        self.cache_hit = False
+        if self.cache is not None:
+            cache_key = self.cache.source_key(fname,text,defines,reverse)
+            cached = self.cache.lookup(cache_key)
+            if cached is not None:
+                self.load_grammar(cached,mapped=True)
+                self.cache_hit = True
+                return
+            self.cache_key = cache_key
         grammar = Grammar.parse_grammar(fname,reverse,text,defines)
+        self.grammar = grammar # kept for add_rules and remove_rules
         self.rules,self.trie = grammar.rules,grammar.trie
+        self.kernels = None
         #self.post_processor.suff_idxs,self.post_processor.suff_dict_list =  grammar.suff_idxs,grammar.suff_dict_list
         self.post_processor.suff_dict = grammar.suff_dict
         
@@ -271,34 +1246,36 @@ class Parser:
         """ unification of "src" features into "dst" features, using filtering of "param", if unification fails raises UnifyError
 
         if param is None, src is directly unified into dst
-        otherwise param contains a pre-condition dict and a filter set,
+        otherwise param contains a pre-condition dict and a filter set (compiled into param.up, see FParam),
         src is checked against pre-condition dict and then filtered with filter set and unified into dst
+        if dst is a FeatureVector, the unification is done with bit sets if possible (see FeatureSpace)
 
         """
-        if hasattr(param,'param_type'):
-            param_type = param.param_type
-        else:
-            param_type = None
-
+        if type(dst) is FeatureVector:
+            result = dst.space.unify_up(dst,param,src)
+            if result is not None:
+                return result
         if param is None:
-            check_keys = []
-            copy_keys = [(key,key) for key in src.keys()]
+            checks, copies, rest = empty_list, empty_list, True
+            param = empty_dict
         else:
-            check_keys = [(key,val) for key,val in param.items() if val is not None and not val.startswith('*') and key in src]
-            if param_type == '-':
-                copy_keys = [(key,key) for key in src.keys() if key not in param]
-            else:
-                copy_keys = [(key,key if val is None else val[1:]) for key,val in param.items() if (val is None or val.startswith('*')) and key in src]
-                if param_type == '+':
-                    copy_keys.extend((key,key) for key in src.keys() if key not in param)
-            
-        for key,val in check_keys:
-            src_val = src[key]
-            if src_val != val and not (src_val.startswith('~') and src_val[1:] != val) and not (val.startswith('~') and val[1:] != src_val):
-                raise UnifyError("UnifyU precheck error feat=%s src=%s param=%s" % (key, src_val, val))
-
+            try:
+                checks, copies, rest = param.up
+            except AttributeError: # parameters given as a plain dict
+                checks, copies, rest = FParam.filters(param)[0]
+
+        for key,val,neg in checks:
+            if key in src:
+                src_val = src[key]
+                if src_val != val and not (src_val.startswith('~') and src_val[1:] != val) and not (neg is not None and neg != src_val):
+                    raise UnifyError("UnifyU precheck error feat=%s src=%s param=%s" % (key, src_val, val))
+
+        if rest:
+            copies = copies + [(key,key) for key in src if key not in param]
         new_items = {}
-        for src_key,dst_key in copy_keys:
+        for src_key,dst_key in copies:
+            if src_key not in src:
+                continue
             src_val = src[src_key]
             dst_val = dst.get(dst_key)
             if dst_val is None or type(dst_val)==str and dst_val.startswith('~') and dst_val[1:] != src_val:
@@ -318,29 +1295,30 @@ class Parser:
         """ unification of "src" features into "dst" features, using filtering of "param", if unification fails raises UnifyError
 
         if param is None, src is directly unified into dst
-        otherwise param contains a pre-condition dict and a filter set,
+        otherwise param contains a pre-condition dict and a filter set (compiled into param.down, see FParam),
         src is checked against pre-condition dict and then filtered with filter set and unified into dst
+        if dst is a FeatureVector, the unification is done with bit sets if possible (see FeatureSpace)
 
         """
-        if hasattr(param,'param_type'):
-            param_type = param.param_type
-        else:
-            param_type = None
-
+        if type(dst) is FeatureVector:
+            result = dst.space.unify_down(dst,param,src)
+            if result is not None:
+                if checklist and not dst.space.check(result,checklist):
+                    Parser.check_feat(result,checklist)
+                return result
         if param is None:
-            check_keys = []
-            copy_keys = [(key,key) for key in src.keys()]
+            checks, copies, rest = empty_list, empty_list, True
+            param = empty_dict
         else:
-            check_keys =  [(key,val) for key,val in param.items() if val is not None and not val.startswith('*')]
-            if param_type == '-':
-                copy_keys = [(key,key) for key in src.keys() if key not in param]
-            else:
-                copy_keys = [(key if val is None else val[1:],key) for key,val in param.items() if val is None or val.startswith('*')]
-                if param_type == '+':
-                    copy_keys.extend((key,key) for key in src.keys() if key not in param)
-            
+            try:
+                checks, copies, rest = param.down
+            except AttributeError: # parameters given as a plain dict
+                checks, copies, rest = FParam.filters(param)[1]
+
+        if rest:
+            copies = copies + [(key,key) for key in src if key not in param]
         new_items = {}
-        for src_key,dst_key in copy_keys:
+        for src_key,dst_key in copies:
             src_val = src.get(src_key)
             if src_val is None:
                 continue
@@ -352,11 +1330,11 @@ class Parser:
             elif src_val != dst_val:
                 raise UnifyError("UnifyU error feat=%s src=%s dst=%s" % (dst_key, src_val, dst_val))
 
-        for dst_key,src_val in check_keys:
+        for dst_key,src_val,neg in checks:
             dst_val = dst.get(dst_key)
             if dst_val is None or dst_val.startswith('~') and dst_val[1:] != src_val:
                 new_items[dst_key] = src_val
-            elif  src_val.startswith('~') and src_val[1:] != dst_val:
+            elif neg is not None and neg != dst_val:
                 pass
             elif src_val != dst_val:
                 raise UnifyError("UnifyU error feat=%s src=%s dst=%s" % (dst_key, src_val, dst_val))
@@ -365,6 +1343,11 @@ class Parser:
             dst = dst.copy()
             dst.update(new_items)
 
+        Parser.check_feat(dst,checklist)
+        return dst
+
+    def check_feat(dst,checklist):
+        """ checks features against a check-list of a rule, raises UnifyError if a check fails """
         for key,val in checklist.items():
             if val == "?":
                 if key not in dst:
@@ -378,14 +1361,28 @@ class Parser:
             elif val.startswith("!"):
                 if key not in dst or val[1:] == dst[key]:
                     raise UnifyError("UnifyD check error feat matches %s" % key)
-        return dst
 
-    def unify_tree(self,tree):
-        """ bottom-up unifies a tree and returns a new tree """
+    def unify_tree(self,tree,limits=None):
+        """ bottom-up unifies a tree and returns a new tree
 
+        if limits (a ParseLimits) is given, alternative sub-trees and unification results of a node are pruned to the cheapest
+        """
+        return self.unify_tree_int(tree,limits,dict(),dict(),dict())
+
+    def unify_tree_int(self,tree,limits,memo,feats,unified):
+        """ internal: bottom-up unifies a tree, returns list of unified alternatives of the tree (or the tree itself for the top node)
+
+        sub-trees shared in the parse forest (see make_tree) are unified once: memo maps id of a sub-tree to its list of unified
+        alternatives or to the message of its UnifyError
+        feature dicts are hash-consed: feats maps the contents of a feature dict to its single interned instance, which is never
+        modified, so that equal feature dicts are the same object, unified maps ids of (fdict,fparam,sub-tree feat) to the
+        interned result of unify_up (or its UnifyError), and alternatives with the same feature dict are grouped by a dict lookup
+        with a FeatureSpace, feature dicts which can be encoded are interned as FeatureVectors
+        """
         rule = tree.rule
-        checklist = rule.checklist
-        fdict = rule.feat
+        space = self.features
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG) # feature dicts are formatted only for debug logging
+        fdict = Parser.intern_feat(feats,self.rule_feat(rule.feat))
 
         stack = [(fdict,[])]
         for item,fparam in zip(tree.left,rule.lparam):
@@ -393,48 +1390,83 @@ class Parser:
                 for fdict,seq in stack:
                     seq.append(item)
             else:
-                nstack = []
-                for fdict,seq in stack:
-                    nkeys = []
-                    nvals = []
-                    for alt in item:
+                if limits is not None:
+                    item = limits.prune(item,lambda alt:alt.cost)
+                subtrees = []
+                for alt in item:
+                    result = memo.get(id(alt))
+                    if result is None:
                         try:
-                            subtrees = self.unify_tree(alt)
+                            result = self.unify_tree_int(alt,limits,memo,feats,unified)
                         except UnifyError as ue:
-                            last_error = ue.args[0]
-                            continue
-                        for subtree in subtrees:
-                            logging.debug("Unify feat=%s fparam=%s subfeat=%s ", format_feat(fdict), format_fparam(fparam), format_feat(subtree.feat))
+                            result = ue.args[0]
+                        memo[id(alt)] = result
+                    if type(result) == str:
+                        last_error = result
+                    else:
+                        subtrees.extend(result)
+                nstack = []
+                for fdict,seq in stack:
+                    groups = dict() # maps id of an interned feature dict to (fdict,subtrees)
+                    for subtree in subtrees:
+                        key = (id(fdict),id(fparam),id(subtree.feat))
+                        _fdict = unified.get(key)
+                        if _fdict is None:
+                            if debug:
+                                logging.debug("Unify feat=%s fparam=%s subfeat=%s ", format_feat(fdict), format_fparam(fparam), format_feat(subtree.feat))
                             try:
                                 _fdict = Parser.unify_up(fdict,fparam,subtree.feat)
-                                logging.debug("Unify Success=%s", format_feat(_fdict))
-                                try:
-                                    idx = nkeys.index(_fdict)
-                                    nvals[idx].append(subtree) 
-                                except ValueError:
-                                    nkeys.append(_fdict)
-                                    nvals.append([subtree])
-                                #print("nkeys=%s nvals=%s" % (nkeys,nvals))
+                                if space is not None and type(_fdict) is not FeatureVector:
+                                    _fdict = space.encode(_fdict)
+                                _fdict = Parser.intern_feat(feats,_fdict)
+                                if debug:
+                                    logging.debug("Unify Success=%s", format_feat(_fdict))
                             except UnifyError as ue:
-                                logging.debug("Unify Failure dst=%s fparam=%s src=%s ", format_feat(fdict), format_fparam(fparam), format_feat(subtree.feat))
-                                last_error = "%s super=%s#%s sub=%s#%s" % (ue.args[0], tree.head, tree.ruleno, subtree.head, subtree.ruleno)
-                    for key,val in zip(nkeys,nvals):
+                                if debug:
+                                    logging.debug("Unify Failure dst=%s fparam=%s src=%s ", format_feat(fdict), format_fparam(fparam), format_feat(subtree.feat))
+                                _fdict = ue
+                            unified[key] = _fdict
+                        if type(_fdict) == UnifyError:
+                            last_error = "%s super=%s#%s sub=%s#%s" % (_fdict.args[0], tree.head, tree.ruleno, subtree.head, subtree.ruleno)
+                        else:
+                            group = groups.get(id(_fdict))
+                            if group is None:
+                                groups[id(_fdict)] = (_fdict,[subtree])
+                            else:
+                                group[1].append(subtree)
+                    for key,val in groups.values():
                         nstack.append((key,seq+[val]))
+                if limits is not None:
+                    nstack = limits.prune(nstack,Parser.stack_cost)
                 stack = nstack
                 if not stack: # if unification of all alternative sub-trees fails, re-raises the last error
                     logging.debug("Re-raising UnifyError %s" % last_error)
                     raise UnifyError(last_error)
         ntree = []
         for fdict,seq in stack:
-            for key,val in fdict.items():
-                if type(val) == int:
-                    fdict[key] = tree.left[val]
+            if type(fdict) is not FeatureVector and any(type(val) == int for val in fdict.values()): # references to sub-trees, interned feature dicts are not modified
+                fdict = Parser.intern_feat(feats,{key:tree.left[val] if type(val) == int else val for key,val in fdict.items()})
             ntree.append(Tree(tree.head,tree.rule,tree.ruleno,seq,tree.right,fdict,tree.cost))
         if tree.head=="S'":
             assert len(ntree)==1
             return ntree[0]
         return ntree
 
+    def intern_feat(feats,fdict):
+        """ internal: returns the interned instance of a feature dict in feats (see unify_tree_int), interning fdict if it is new """
+        if type(fdict) is FeatureVector:
+            return feats.setdefault(fdict.bits,fdict)
+        key = frozenset((key,id(val) if type(val) == list else val) for key,val in fdict.items())
+        return feats.setdefault(key,fdict)
+
+    def rule_feat(self,fdict):
+        """ internal: returns a feature dict of a rule, encoded if the parser has a FeatureSpace """
+        return fdict if self.features is None else self.features.rule_feat(fdict)
+
+    def stack_cost(entry):
+        """ internal: returns cost of a partial unification result (fdict,seq) of unify_tree, i.e. sum of the cheapest costs of its sub-trees """
+        return sum(min(subtree.cost for subtree in val) for val in entry[1] if type(val) == list)
+
     #def prune(alts):
     #    cost = min(subtree.cost for subtree in alts)
     #    if cost<0:
@@ -443,15 +1475,37 @@ class Parser:
     #            subtree.cost = 0
     #    return alts
 
-    def make_trans_tree(self,symbol,feat,fparam):
-        """ generate a tree for dst-only non-terminal tree """
+    def make_trans_tree(self,symbol,feat,fparam,memo=None):
+        """ generate a tree for dst-only non-terminal tree
+
+        trees are cached in trans_cache (see TransCache), as the same symbol is generated with the same features many times
+        trees of features with references to sub-trees are not cached, their sub-trees are translated with memo (see trans_tree)
+        """
+        key = TransCache.key(symbol,feat,fparam)
+        if key is None:
+            return self.make_trans_tree_int(symbol,feat,fparam,memo)
+        result = self.trans_cache.get(key,fparam)
+        if result is None:
+            try:
+                result = self.make_trans_tree_int(symbol,feat,fparam)
+            except UnifyError as ue:
+                result = ue.args[0]
+            self.trans_cache.put(key,fparam,result)
+        if type(result) == str:
+            raise UnifyError(result)
+        return result
+
+    def make_trans_tree_int(self,symbol,feat,fparam,memo=None):
+        """ internal: generate a tree for dst-only non-terminal tree, see make_trans_tree """
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
         ntree = []
         for ruleno in self.ruledict[symbol]:
             rule = self.rules[ruleno]
             try:
                 #logging.debug("make_trans_tree1: %s unifyd(%s,%s,%s)", symbol, format_feat(feat), format_feat(fparam,'()'), format_feat(rule.feat))
-                fdict = Parser.unify_down(rule.feat,fparam,feat,rule.checklist)
-                logging.debug("make_trans_tree: %s unifyd(%s,%s,%s)->%s", symbol, format_feat(feat), format_fparam(fparam), format_feat(rule.feat), format_feat(fdict))
+                fdict = Parser.unify_down(self.rule_feat(rule.feat),fparam,feat,rule.checklist)
+                if debug:
+                    logging.debug("make_trans_tree: %s unifyd(%s,%s,%s)->%s", symbol, format_feat(feat), format_fparam(fparam), format_feat(rule.feat), format_feat(fdict))
                 trans = []
                 for item,param in zip(rule.right,rule.rparam):
                     assert type(item) == str, "%s#%d(%s) %s:%s" % (symbol,ruleno,fparam,item,param)
@@ -463,35 +1517,41 @@ class Parser:
                             raise UnifyError("Translate Ref to feature %s not found in %s" % (key,rule))
                         if type(val)==str:
                             if val[0].isupper():
-                                trans.append( self.make_trans_tree(val,fdict,param) )
+                                trans.append( self.make_trans_tree(val,fdict,param,memo) )
                             else:
                                 trans.append(val)
                         else:
                             assert param is not False
-                            trans.append( self.trans_alts(val,fdict,param) )
+                            if memo is not None: # feature dicts of keys of memo are interned, see trans_tree_int
+                                fdict = Parser.intern_feat(memo,fdict)
+                            trans.append( self.trans_alts(val,fdict,param,memo) )
                     elif param is False: # Terminal
                         trans.append(item)
                     else: # NonTerminal
-                        trans.append( self.make_trans_tree(item,fdict,param) )
+                        trans.append( self.make_trans_tree(item,fdict,param,memo) )
 
                 ntree.append(Tree(symbol,rule,ruleno,[],trans,fdict,rule.cost))
                 if rule.cut:
                     break
             except UnifyError as ue:
                 last_error = "%s %s#%d" % (ue.args[0], symbol, ruleno)
-                logging.debug("make_trans_tree: %s unifyd(%s,%s,%s)->Error", symbol, format_feat(feat), format_fparam(fparam), format_feat(rule.feat))
+                if debug:
+                    logging.debug("make_trans_tree: %s unifyd(%s,%s,%s)->Error", symbol, format_feat(feat), format_fparam(fparam), format_feat(rule.feat))
         if not ntree:
             if not self.ruledict[symbol]:
                 raise ParseError("No production rule defined for symbol: %s" % symbol)
             raise UnifyError(last_error)
         return ntree
 
-    def trans_alts(self,subtrees,fdict,param):
+    def trans_alts(self,subtrees,fdict,param,memo=None):
+        """ internal: translates a list of alternative sub-trees with memo (see trans_tree_int), returns the list of translated alternatives """
         assert type(subtrees) == list, f"Expected list but found {subtrees}"
+        if memo is None:
+            memo = dict()
         alts = []
         for alt in subtrees:
             try:
-                alts.append( self.trans_tree(alt,fdict,param) )
+                alts.append( self.trans_tree_int(alt,fdict,param,memo) )
                 if alt.rule.cut:
                     break
             except UnifyError as ue:
@@ -502,21 +1562,49 @@ class Parser:
 
     def trans_tree(self,tree,feat=empty_dict,fparam=None):
         """ translates and unifies translation(right) part of a parse tree
-        returns a modified version of the node "tree" """
+        returns a translated version of the node "tree", whose right part is the translation """
+        return self.trans_tree_int(tree,feat,fparam,dict())
+
+    def trans_tree_int(self,tree,feat,fparam,memo):
+        """ internal: translates a node of a parse tree, see trans_tree
 
+        the source tree is not copied or modified: results are kept in memo, a side table which maps (node, id of incoming feature
+        dict, id of parameters) to the translated node (or the message of its UnifyError), so that a node shared in the forest is
+        translated once for the same features. Feature dicts unified while translating are interned in memo (see intern_feat),
+        so that equal feature dicts of different parents are the same object, which is kept alive while its id is used in a key.
+        A translated node is a new Tree sharing everything but its right part with the source node
+        """
         assert type(tree)==Tree
-        tree = copy.copy(tree) # MD 12.04.2018
+        key = (tree,id(feat),id(fparam))
+        result = memo.get(key)
+        if result is None:
+            try:
+                result = self.trans_node(tree,feat,fparam,memo)
+            except UnifyError as ue:
+                result = ue.args[0]
+            memo[key] = result
+        if type(result) == str:
+            raise UnifyError(result)
+        return result
+
+    def trans_node(self,tree,feat,fparam,memo):
+        """ internal: translates a node of a parse tree, returns the translated node, see trans_tree_int """
         rule = tree.rule
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
 
-        logging.debug("trans_tree: %s unify(%s,%s,%s)->", tree.head, format_feat(tree.feat), format_fparam(fparam), format_feat(feat)) 
+        if debug:
+            logging.debug("trans_tree: %s unify(%s,%s,%s)->", tree.head, format_feat(tree.feat), format_fparam(fparam), format_feat(feat))
         fdict = Parser.unify_down(tree.feat, fparam,feat, rule.checklist)
-        logging.debug("trans_tree: ->%s", format_feat(fdict)) 
+        if fdict is not tree.feat:
+            fdict = Parser.intern_feat(memo,fdict)
+        if debug:
+            logging.debug("trans_tree: ->%s", format_feat(fdict))
         
         trans = []
         for item,param in zip(rule.right,rule.rparam):
             if type(item)==int: # Matched (Left&Right) NT
                 assert param is not False
-                trans.append( self.trans_alts(tree.left[item],fdict,param) )
+                trans.append( self.trans_alts(tree.left[item],fdict,param,memo) )
             elif item[0]=='*': # Reference
                 assert param is not False
                 key = item[1:]
@@ -526,87 +1614,41 @@ class Parser:
                     raise UnifyError("Translate Ref to feature %s not found in %s" % (key,rule))
                 if type(val)==str:
                     if val[0].isupper():
-                        trans.append( self.make_trans_tree(val,fdict,param) )
+                        trans.append( self.make_trans_tree(val,fdict,param,memo) )
                     else:
                         trans.append(val)
                 else:
-                    trans.append( self.trans_alts(val,fdict,param) )
+                    trans.append( self.trans_alts(val,fdict,param,memo) )
             elif param is False: # Terminal
                 trans.append(item)
             else: # Unmatched (Right-Only) NT
                 assert item[0].isupper()
-                trans.append( self.make_trans_tree(item,fdict,param) ) 
+                trans.append( self.make_trans_tree(item,fdict,param,memo) ) 
         
-        tree.right = trans
-        return tree
+        return Tree(tree.head,rule,tree.ruleno,tree.left,trans,tree.feat,tree.cost,tree.start,tree.end)
+
+    def format_node(node):
+        """ internal: format an SPPF node or a terminal to str (used internally for logging/debugging) """
+        if type(node) != tuple:
+            return node
+        if node[0] == -1: # epsilon node
+            return node[1] + "()"
+        if type(node[1]) == tuple: # intermediate node
+            return "{1[0]}.{1[1]}({0},{2})".format(*node)
+        return "{1}({0},{2})".format(*node)
 
     def format_edge_item(alts):
         """ internal: format an edge item to str (used internally for logging/debugging) """
-        return " ".join(["{2}({0},{1};{3},{4})".format(*alt) if type(alt)==tuple else " ".join(alt)
-                         for alt in alts[1:]])
+        return " ".join(Parser.format_node(alt) for alt in alts[1:])
       
-    def format_edge(self,edge):
-        """ internal: format an edge into str (used internally for logging/debugging) """
-        if edge not in self.edges:
-            if type(edge)==tuple:
-                return "{2}({0},{1};{3},{4}) -> None".format(*edge)
-            else:
-                return " ".join(edge)
-        return  "{2}({0},{1};{3},{4}) -> ".format(*edge) + " | ".join( [ " ".join(
-            ["{2}({0},{1};{3},{4})".format(*alt) if type(alt)==tuple else alt
-             for alt in alts[1:]]) for alts in self.edges[edge]] )
-    
-    def print_parse_tables(self):
-        """ internal: print parse tables after parse """
-        indent = 7
-        space = " "*indent
-        for pos,token in enumerate(self.words):
-            print(str(pos).rjust(2,"-"),token.center(indent-2,"-"),sep="",end="")
-        print()
-        for (epos,estate,symbol),startset in sorted(self.nodes.items()):
-            for spos,sstate in startset:
-                print(space*spos, str(sstate).rjust(2), symbol.center((epos-spos)*indent-2,"="), str(estate).rjust(2,"="), " ", self.format_edge((spos,sstate,symbol,epos,estate)), sep="")
-
-    def make_tree(self):
-        self.tree = Tree(
+    def make_tree(self,result):
+        """ returns the parse forest of a ParseResult as a Tree """
+        return Tree(
             head = "S'",
-            rule = self.rules[0],
+            rule = result.grammar.rules[0],
             ruleno = 0,
-            left = [self.make_tree_int(self.top_edge)]
+            left = [result.make_tree_int(result.top_edge,{})]
         )
-        return self.tree
-
-    def make_tree_int(self,edge):
-        """ generates a tree (which is a recursive list of lists) from edges """
-        if edge not in self.edges:
-            if type(edge)==tuple: #(state1,pos1,term,state2,pos2)
-                return edge[2]
-            else: # list of non-terminals
-                return edge;
-        alt = []
-        for alt_edge in self.edges[edge]: 
-            ruleno = alt_edge[0]
-            if type(ruleno)==int:
-                rule = self.rules[ruleno]
-            else:
-                rule = ruleno
-                ruleno = None
-
-            assert type(ruleno)==int or ruleno is None, "ruleno=%s" % ruleno
-            assert type(rule) == Rule
-
-            alt.append( Tree(
-                head = edge[2],
-                rule = rule,
-                ruleno = ruleno, 
-                left = [self.make_tree_int(sub_edge) for sub_edge in alt_edge[1:]],
-                right = rule.right,#.copy(),
-                feat = rule.feat,
-                cost = rule.cost,
-                start = edge[0],
-                end = edge[3]
-            ) )
-        return alt
 
     def print_dfa(self):
         """ internal: prints dfa, reduce and e-reduce in a tabular format after compile """
@@ -624,179 +1666,67 @@ class Parser:
                 print(str(self.dfa.get((state,symbol),"")).rjust(width),",",end="")
             print(self.reduce.get(state,""),self.ereduce.get(state,""))
 
-    def parse(self,instr):
-        """ parses input string using current grammar, throwing ParseError if parsing fails, the parse tree can be later retrieved from "edges" """
-        
-        dfa = self.dfa
-        reduce = self.reduce
-        ereduce = self.ereduce
-        logging.info("input=%s", instr)
-
+    def make_lattice(self,instr):
+        """ splits input string into words and returns its Lattice, i.e. words and all dictionary matches """
         tokens = self.re_word_split.split(instr)
         tokens.append('$')
         puncts = [tokens[i] for i in range(0,len(tokens),2)]
         orig_words = [tokens[i].replace("’","'") for i in range(1,len(tokens),2)]
 
         logging.info("words=%s, puncts=%s","|".join(orig_words),"|".join(puncts))
-
-        #0:Lower, 1:Title(or Mixed), 2:Upper, 3:Number
-        cases = [
-            3 if word[0]=='-' or word.isdigit()
-            else 0 if word.islower()
-            else 2 if word.isupper()
-            else 1
-            for word in orig_words]
-        words = [words.lower() for words in orig_words]
-
-        inlen = len(words)
-        nodes = defaultdict(set) # maps (pos,state,symbol) to set of (oldpos,oldstate) (i.e adds an arc from (pos,state) to (oldpos,oldstate) labeled with symbol)
-        edges = defaultdict(list) # maps an edge to sub-edges of a production e.g. (p0,s0,S,p2,s2') -> [ (p0,s0,NP,p1,s1), (p1,s1,VP,p2,s2) ] where s0,S->s2'
-        fstate = dfa[0,"S"]
-        
-        self.nodes = nodes
-        self.edges = edges
-        self.words = words
-        self.top_edge = (0,0,"S",inlen-1,fstate)
-        Tree.words = words
-
-        act_states = [set() for i in range(inlen)] # active set of states for each position
-        act_edges  = [set() for i in range(inlen)] # active set of edges for each position
-
-        act_states[0].add(0); # add initial state to initial position
-
-        
-        for pos in range(inlen):
-            token = words[pos]
-             
-            rlist = list(act_edges[pos])
-            active = act_states[pos]
-
-            logging.debug("act_states=%s act_edges=%s", active, rlist)
-
-            for edge in rlist: # for each work item (start_position, start_state, edge_symbol, end_position, end_state)
-                spos,sstate,esymbol,epos,estate = edge
-                logging.debug("Checking Work Item: %s  All: %s", edge, rlist)
-                for ruleno,rulepos in reduce.get(estate,set()): # find reducible items for end_state
-                    head = self.rules[ruleno].head
-                    body = self.rules[ruleno].left
-                    logging.debug("Reducing %s ", self.get_item(ruleno,rulepos))
-                    ptree = [edge]
-                        
-                    state = estate
-                    for symbol in body[rulepos:]: # iterate and append all right nulled symbols to ptree
-                        nstate = dfa.get((state,symbol),-1)
-                        ptree.append((epos,state,symbol,epos,nstate))
-                        state = nstate
-                        
-                    stack = [(spos,sstate,ptree)]
-                    if esymbol != body[rulepos-1]:
-                        logging.warning("***MISMATCH*** esymbol=",esymbol,"lsymbol=",body[rulepos-1])
-                    if rulepos >=2:
-                        for symbol in body[rulepos-2::-1]:
-                            nstack = []
-                            for ppos,pstate,ptree in stack: 
-                                for xpos,xstate in nodes[ppos,pstate,symbol]:
-                                    nstack.append((xpos,xstate,[(xpos,xstate,symbol,ppos,pstate)]+ptree))
-                                    
-                            stack = nstack
-                    for ppos,pstate,ptree in stack:
-                        nstate = self.dfa.get((pstate,head),-1)
-                        logging.debug("REDUCE %s , %s -> %s", pstate, head, nstate)
-                        if nstate != -1:
-                            active.add(nstate)
-                            nodes[pos,nstate,head].add((ppos,pstate))
-                            nedge = (ppos,pstate,head,pos,nstate) 
-                            if nedge not in edges:
-                                rlist.append(nedge)
-                            ptree = [ruleno] + ptree
-                            logging.debug("appending edge %s to %s", Parser.format_edge_item(ptree), self.format_edge(nedge))
-                            edges[nedge].append(ptree)
-
-            actlist = list(active)
-
-            for state in actlist:
-                for ruleno,rulepos in ereduce.get(state,set()):
-                    logging.debug("e-Reducing %s", self.get_item(ruleno,rulepos))
-                    head = self.rules[ruleno].head
-                    body = self.rules[ruleno].left
-                    ptree = [ruleno]
-                    estate = state
-                    for symbol in body[rulepos:]:
-                        nstate = dfa.get((estate,symbol),-1)
-                        ptree.append((pos,state,symbol,pos,nstate))
-                        estate = nstate
-                    nstate = dfa.get((state,head),-1)
-                    logging.debug("EREDUCE %s , %s -> %s", state, head, nstate)
-                    if nstate!= -1:
-                        if nstate not in active:
-                            active.add(nstate)
-                            actlist.append(nstate)
-                        nodes[pos,nstate,head].add((pos,state))
-                        nedge = (pos,state,head,pos,nstate)
-                        logging.debug("appending edge %s to %s", Parser.format_edge_item(ptree), self.format_edge(nedge))
-                        edges[nedge].append(ptree)
-      
-            logging.debug("active=%s input= %s", active, token)
-            if token == "$":
-                if fstate in active:
-                    logging.info("Parse successful")
-                else:
-                    while not act_states[pos]:
-                        pos -= 1
-                    error = "Parse is not possible at position %s: %s [* %s *] %s" % (pos, " ".join(words[0:pos]),words[pos]," ".join(words[pos+1:-1]))
-                    logging.error(error)
-                    raise ParseError(error)
-            else:
-                if not active:
-                    continue
-                    #logging.error("not active, %s",active)
-                    #raise ParseError("Cannot shift %s<< %s" % (" ".join(words[0:pos])," ".join(words[pos:])))
-
-                for state in active:
-                    nstate = dfa.get((state,token),-1)
-                    #print(state,",",token,"->",nstate)
-                    if nstate != -1:                       
-                        logging.debug("add nodes[%s] = %s",(pos+1,nstate,token),(pos,state)) 
-                        nodes[pos+1,nstate,token].add((pos,state))
-                        logging.debug("shift %s = %s", (pos+1,nstate,token,pos,state),token)
-
-                        act_edges[pos+1].add((pos,state,token,pos+1,nstate))
-                        act_states[pos+1].add(nstate)
-
-                items = self.trie.search(words[pos:])
-                logging.debug("Shift pos: %d items: %s", pos, items)
-                if cases[pos] == 3: # numeric
-                    items.append((1,Rule('CardinalNumber', left=[token], right=[token], lparam=[False], rparam=[False])))
-                elif cases[pos] != 0: # not all-lower case
-                    items.append((1,Rule('U', left=[token], right=[token], lparam=[False], rparam=[False], cost=100)))
-                for input_len,rule in items:
-                    token = rule.head
-                    nextpos = pos + input_len
-                    for state in active:
-                        nstate = dfa.get((state,token),-1)
-                        if nstate != -1:                           
-                            logging.debug("add nodes[%s] = %s",(nextpos,nstate,token),(pos,state)) 
-                            nodes[nextpos,nstate,token].add((pos,state))
-                            nedge = (pos,state,token,nextpos,nstate)
-                            logging.debug("shift %s = %s", nedge, token)
-                    
-                            act_edges[nextpos].add(nedge)
-                            act_states[nextpos].add(nstate)
-
-                            edges[nedge].append([rule]+rule.left)
-                            #logging.debug("appending edge %s to %s", Parser.format_edge_item(ptree), self.format_edge(nedge))
-
-    def trans_sent(self,sent):
-        """ translates a sentence, returns a list of possible translations or an error """
+        return Lattice(orig_words,puncts,self.trie)
+
+    def parse(self,instr,limits=None):
+        """ parses input string (or its Lattice) using current grammar, returns its ParseResult or throws ParseError if parsing fails
+
+        the graph structured stack is kept in "nodes" and the shared packed parse forest (SPPF) in "edges" of the ParseResult
+        reductions are binarised: a reduction walks back the stack one symbol at a time through intermediate nodes, and a walk
+        reaching a stack node which is already walked with the same rule and position only adds an alternative to the shared
+        intermediate node of the rest of the body, so that the cost of parsing is polynomial in sentence length independent of rule lengths
+        as in RNGLR, an item whose remaining symbols are all nullable is reduced with those symbols as epsilon nodes (right nulled reduction),
+        so an empty reduction only adds a stack edge, its subtree being the epsilon node of the NT precomputed by set_table
+        parse steps are reported to "tracer" if it is set, or to a ParseTracer logging them if debug logging is enabled
+        the words are parsed by a ParseSession, which can also be used to parse a sentence word by word
+        limits is a ParseLimits, after its max_edges or deadline is hit, a node of the SPPF keeps only its cheapest alternatives
+        and the result is degraded (see ParseResult)
+        """
+        logging.info("input=%s", instr)
+        lattice = instr if isinstance(instr,Lattice) else self.make_lattice(instr)
+        session = ParseSession(self,lattice,limits)
+        words, arcs = lattice.words, lattice.arcs
+        for pos in range(len(words)-1):
+            session.step(words[pos],[(pos,input_len,rule) for input_len,rule in arcs[pos]])
+        return session.finish()
+
+    def session(self,limits=None):
+        """ returns a ParseSession to parse a sentence word by word """
+        return ParseSession(self,None,limits)
+
+    def trans_sent(self,sent,max_trees=None,limits=None,k=None):
+        """ translates a sentence, returns a list of possible translations or an error
+
+        if max_trees is given, a sentence having more parse trees is not translated (AmbiguityError)
+        if limits (a ParseLimits) is given, each stage prunes to its cheapest alternatives when a limit is hit, and enumerating
+        translations stops after the deadline, the translations are degraded if limits.hit is not empty
+        if k is given, only the k cheapest translations are extracted (see Tree.kbest), i.e. the first k of all translations
+        """
         try:
             #sent = self.pre_processor(sent)
-            self.parse(sent)
-            tree = self.make_tree()
-            tree2 = self.unify_tree(tree)
+            result = self.parse(sent,limits)
+            if max_trees is not None:
+                num_trees = result.count_trees()
+                if num_trees > max_trees:
+                    return "AmbiguityError: %d parse trees exceed the limit %d" % (num_trees,max_trees)
+            tree = self.make_tree(result)
+            tree2 = self.unify_tree(tree,limits)
             tree3 = self.trans_tree(tree2)
-            result = [(self.post_processor(trans),cost) for trans,cost in tree3.enumx()]
-            result.sort(key=lambda item:item[1])
-            return result
+            translations = []
+            for trans,cost in (tree3.enumx() if k is None else tree3.enum_best()):
+                translations.append((self.post_processor(trans),cost))
+                if len(translations) == k or limits is not None and limits.expired():
+                    break
+            translations.sort(key=lambda item:item[1])
+            return translations
             #return list(tree3.enumx())
         except ParseError as pe:
             return "ParseError: "+str(pe)
@@ -0,0 +1,273 @@
+""" A GLR Parser for Natural Language Processing and Translation
+
+This file defines an asyncio HTTP server translating sentences by a pool of processes, using only the standard library
+
+Command Line Usage:
+
+    python -m GLRParser.server [-g] [-p <port>] [-j <jobs>] <grammar_file>
+    e.g. python -m GLRParser.server -g main.grm
+        * Loads and compiles the grammar file "main.grm" (or loads a compiled grammar file .grmc)
+        * Starts <jobs> worker processes sharing the loaded grammar, i.e. forked processes inheriting it copy-on-write
+          (where fork is not available, e.g. on Windows, the grammar is pickled into each worker instead)
+        * Serves translation requests on the port, until interrupted
+
+    A request is a POST to /translate with a JSON body {"sent": <sentence>, "timeout": <seconds>, "max_trees": <count>},
+    where timeout and max_trees are optional (and limited by the server defaults). The response is a JSON object
+    {"sent": <sentence>, "translations": [[<translation>,<cost>]*]} or {"sent": <sentence>, "error": <error message>}
+    a translation close to its timeout is degraded (see ParseLimits) rather than timed out, the response has then
+    "degraded": [<limit>*] with the limits hit
+
+    Incoming sentences are queued and sent to the workers in batches, a batch is all sentences waiting (up to batch_size)
+    when a worker is free, or arriving within batch_wait seconds of the first one, so that a busy server sends larger batches
+
+OPTIONAL PARAMETERS:
+    -g  Loads grammar files from the "grm" directory within the package
+    -p <port>  Port of the server (def: 8080)
+    -j <jobs>  Number of worker processes (def: number of cpus)
+    -t <seconds>  Default (and maximum) timeout of a request (def: 10)
+    -m <count>  Default (and maximum) number of parse trees of a sentence, i.e. ambiguity budget (def: no limit)
+    -c <dir>  Directory of compiled grammar cache (def: __grmcache__)
+    -b <bytes>  Maximum size of a request body (def: 1048576)
+"""
+import sys,logging,os,gc,json,asyncio,time,multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+if os.path.dirname(__file__) == os.getcwd(): # file is run directly from the source directory
+    sys.path.append(os.path.join(os.path.dirname(__file__),".."))
+
+from GLRParser.parser import Parser,ParseLimits
+
+worker_parser = None # Parser used by worker processes of TranslationServer
+
+def init_worker(parser):
+    """ initializes a worker process with the parser of the grammar, which is inherited (copy-on-write) by forked processes """
+    global worker_parser
+    worker_parser = parser
+
+def translate_batch(batch):
+    """ translates a batch of (sentence,max_trees,time_limit) in a worker process, where time_limit is from the start of the batch
+
+    returns list of (translations,limits hit), where translations is [(translation,cost)*] or an error string
+    """
+    start = time.perf_counter()
+    results = []
+    for sent,max_trees,time_limit in batch:
+        limits = ParseLimits(time_limit=time_limit-(time.perf_counter()-start))
+        results.append((worker_parser.trans_sent(sent,max_trees,limits),limits.hit))
+    return results
+
+class TranslationServer:
+    """ Serves translations of a parser over HTTP, batching sentences to a pool of worker processes
+
+    data:
+        parser : Parser with a compiled grammar, shared by workers
+        jobs : number of worker processes
+        batch_size : maximum number of sentences in a batch
+        batch_wait : time (seconds) to wait for more sentences after the first sentence of a batch, if a worker is free
+        timeout : default and maximum time (seconds) of a request
+        max_trees : default and maximum number of parse trees of a sentence, None for no limit
+        max_body : maximum size (bytes) of a request body, larger requests are rejected with 413
+        queue : queue of (sentence,max_trees,deadline,future) waiting to be sent to workers
+    """
+    degrade_ratio = 0.8 # a translation is degraded after this ratio of the time remaining to its deadline when it is sent to a worker
+
+    def __init__(self,parser,jobs=None,batch_size=16,batch_wait=0.002,timeout=10.0,max_trees=None,max_body=1<<20):
+        self.parser = parser
+        self.jobs = jobs or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.max_trees = max_trees
+        self.max_body = max_body
+        self.queue = None
+        self.pool = None
+
+    async def translate(self,sent,timeout=None,max_trees=None):
+        """ translates a sentence by a worker, returns (translations,limits hit), translations is a list of [translation,cost] or an error string
+
+        timeout and max_trees are limited by the server defaults, raises asyncio.TimeoutError if the translation takes longer
+        """
+        timeout = self.timeout if timeout is None else min(timeout,self.timeout)
+        if self.max_trees is not None:
+            max_trees = self.max_trees if max_trees is None else min(max_trees,self.max_trees)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self.queue.put((sent,max_trees,loop.time()+timeout,future))
+        return await asyncio.wait_for(future,timeout)
+
+    async def run_batches(self):
+        """ internal: gets batches of sentences from the queue and sends them to workers, at most 2 batches for each worker at a time """
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.jobs*2)
+        while True:
+            batch = [await self.queue.get()]
+            await slots.acquire()
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                wait = deadline - loop.time()
+                if wait <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(),wait))
+                except asyncio.TimeoutError:
+                    break
+            batch = [item for item in batch if not item[3].done()] # requests timed out while waiting are dropped
+            if batch:
+                asyncio.ensure_future(self.run_batch(batch,slots))
+            else:
+                slots.release()
+
+    async def run_batch(self,batch,slots):
+        """ internal: translates a batch by a worker and sets the results of its requests """
+        loop = asyncio.get_running_loop()
+        try:
+            now = loop.time()
+            results = await loop.run_in_executor(self.pool,translate_batch,
+                [(sent,max_trees,(deadline-now)*self.degrade_ratio) for sent,max_trees,deadline,future in batch])
+        except Exception as ex:
+            for sent,max_trees,deadline,future in batch:
+                if not future.done():
+                    future.set_exception(ex)
+        else:
+            for (sent,max_trees,deadline,future),result in zip(batch,results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            slots.release()
+
+    async def handle(self,reader,writer):
+        """ internal: serves HTTP requests of a connection, which is kept alive unless the client closes it """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                content_length = headers.get("content-length","")
+                if not content_length.isdigit():
+                    await self.write_response(writer,"400 Bad Request",{"error": "Expected a Content-Length header with the size of the body"})
+                    break # the body can not be skipped, so the connection is closed
+                if int(content_length) > self.max_body:
+                    await self.write_response(writer,"413 Payload Too Large",{"error": "Request body larger than %d bytes" % self.max_body})
+                    break
+                body = await reader.readexactly(int(content_length))
+                status, response = await self.respond(method,path,body)
+                await self.write_response(writer,status,response)
+                if headers.get("connection","").lower() == "close" or version == "HTTP/1.0":
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def write_response(self,writer,status,response):
+        """ internal: writes a JSON response with the status """
+        data = json.dumps(response,ensure_ascii=False).encode("utf-8")
+        writer.write(("HTTP/1.1 %s\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: %d\r\n\r\n" % (status,len(data))).encode("latin-1") + data)
+        await writer.drain()
+
+    async def respond(self,method,path,body):
+        """ internal: returns (status,response) of a request """
+        if path != "/translate":
+            return "404 Not Found", {"error": "Not found: %s" % path}
+        if method != "POST":
+            return "405 Method Not Allowed", {"error": "Method not allowed: %s" % method}
+        try:
+            request = json.loads(body.decode("utf-8"))
+            sent = request["sent"]
+        except (ValueError, KeyError, TypeError):
+            return "400 Bad Request", {"error": "Expected a JSON object with a sentence: {\"sent\": ...}"}
+        try:
+            result, degraded = await self.translate(sent,request.get("timeout"),request.get("max_trees"))
+        except asyncio.TimeoutError:
+            return "504 Gateway Timeout", {"sent": sent, "error": "Timeout"}
+        except Exception as ex:
+            logging.exception("Translation failed: %s", sent)
+            return "500 Internal Server Error", {"sent": sent, "error": "%s: %s" % (type(ex).__name__, ex)}
+        response = {"sent": sent, "error": result} if type(result) == str else {"sent": sent, "translations": result}
+        if degraded:
+            response["degraded"] = degraded
+        return "200 OK", response
+
+    async def start(self,host="127.0.0.1",port=8080):
+        """ starts worker processes and the server, returns the asyncio server """
+        if hasattr(gc,"freeze"): # objects of the grammar are not touched by the garbage collector of workers, so their pages stay shared
+            gc.freeze()
+        # workers are forked (whatever the default start method of the platform is) so that they share the grammar
+        mp_context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        self.pool = ProcessPoolExecutor(self.jobs,mp_context=mp_context,initializer=init_worker,initargs=(self.parser,))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool,translate_batch,[]) for idx in range(self.jobs))) # all workers are forked before any socket is opened, not to inherit them
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.ensure_future(self.run_batches())
+        return await asyncio.start_server(self.handle,host,port)
+
+    async def stop(self,server):
+        """ stops the server started by start and its worker processes """
+        server.close()
+        await server.wait_closed()
+        self.batcher.cancel()
+        self.pool.shutdown()
+
+def load_parser(grm_fname,cache="__grmcache__"):
+    """ returns a Parser with a loaded (or compiled) grammar """
+    parser = Parser("EN","TR",cache=cache)
+    if grm_fname.endswith(".grmc"):
+        parser.load_grammar(grm_fname,mapped=True)
+    else:
+        parser.parse_grammar(grm_fname)
+        parser.compile()
+    return parser
+
+async def serve(translation_server,port):
+    """ serves translations on the port until cancelled """
+    server = await translation_server.start("127.0.0.1",port)
+    print("Serving on port", port, "with", translation_server.jobs, "workers")
+    try:
+        await server.serve_forever()
+    finally:
+        await translation_server.stop(server)
+
+def print_usage():
+    print("USAGE: python -m GLRParser.server [-g] [-p <port>] [-j <jobs>] [-t <seconds>] [-m <count>] [-c <dir>] [-b <bytes>] <grammar_file>")
+
+def main(argv):
+    import getopt
+    optlist,args = getopt.getopt(argv,"gp:j:t:m:c:b:")
+    port, jobs, timeout, max_trees, cache, max_body = 8080, None, 10.0, None, "__grmcache__", 1<<20
+    for opt,arg in optlist:
+        if opt == '-g':
+            os.chdir(os.path.join(os.path.dirname(__file__), 'grm'))
+        elif opt == '-p':
+            port = int(arg)
+        elif opt == '-j':
+            jobs = int(arg)
+        elif opt == '-t':
+            timeout = float(arg)
+        elif opt == '-m':
+            max_trees = int(arg)
+        elif opt == '-c':
+            cache = arg
+        elif opt == '-b':
+            max_body = int(arg)
+    if len(args) != 1:
+        print_usage()
+        return
+    translation_server = TranslationServer(load_parser(args[0],cache),jobs,timeout=timeout,max_trees=max_trees,max_body=max_body)
+    try:
+        asyncio.run(serve(translation_server,port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,266 @@
+""" Compact Parse Tables for the GLR Parser
+
+(c) 2018 by Mehmet Dolgun, m.dolgun@yahoo.com
+
+This file define classes:
+    SymbolTable: interns terminal and non-terminal symbols to dense integer ids
+    ParseTable: array-backed dfa (comb-vector) and reduce/e-reduce tables (CSR) produced by Parser.compile
+    DFAView,ReduceView: read-only dict views of a ParseTable, e.g. for debugging tools like Parser.print_dfa
+    EmptyGotos: transitions of states on NTs of their e-reductions, computed on first access
+
+"""
+from array import array
+from collections.abc import Mapping
+
+class SymbolTable:
+    """ maps each symbol (terminal or non-terminal) to a dense integer id, starting from 0 """
+
+    def __init__(self,names=()):
+        self.names = list(names)
+        self.ids = {name:idx for idx,name in enumerate(self.names)}
+
+    def intern(self,name):
+        """ returns id of the symbol "name", assigning a new id if it is not seen before """
+        idx = self.ids.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self.ids[name] = idx
+            self.names.append(name)
+        return idx
+
+    def get(self,name,default=-1):
+        return self.ids.get(name,default)
+
+    def __len__(self):
+        return len(self.names)
+
+class ParseTable:
+    """ array-backed parse tables
+
+        symbols : SymbolTable of all symbols which have a transition in the dfa
+        base,check,next : comb-vector (row displacement) encoding of the dfa,
+            dfa[state,symid] is next[base[state]+symid] if check[base[state]+symid]==state, otherwise there is no transition
+        reduce_start,reduce_rule,reduce_pos : CSR encoding of reductions,
+            reduce[state] is [(reduce_rule[i],reduce_pos[i]) for i in range(reduce_start[state],reduce_start[state+1])]
+        ereduce_start,ereduce_rule,ereduce_pos : CSR encoding of e-reductions, similar to reduce
+    """
+    typecode = 'i'
+
+    def __init__(self,symbols,num_states,base,check,next,reduce_start,reduce_rule,reduce_pos,ereduce_start,ereduce_rule,ereduce_pos):
+        self.symbols = symbols
+        self.num_states = num_states
+        self.base = base
+        self.check = check
+        self.next = next
+        self.reduce_start = reduce_start
+        self.reduce_rule = reduce_rule
+        self.reduce_pos = reduce_pos
+        self.ereduce_start = ereduce_start
+        self.ereduce_rule = ereduce_rule
+        self.ereduce_pos = ereduce_pos
+
+    def __getstate__(self):
+        """ tables of a memory-mapped grammar file are memoryviews, which are pickled as arrays """
+        return {key:array(ParseTable.typecode,val) if isinstance(val,memoryview) else val for key,val in self.__dict__.items()}
+
+    def build(num_states,dfa,reduce,ereduce):
+        """ builds a ParseTable from dict tables, where dfa[state,symbol] -> nextstate, reduce[state] -> {(ruleno,rulepos)*} and ereduce[state] -> {(ruleno,rulepos)*} """
+        symbols = SymbolTable()
+        rows = [[] for state in range(num_states)]
+        for (state,symbol),nstate in dfa.items():
+            rows[state].append((symbols.intern(symbol),nstate))
+
+        base = array(ParseTable.typecode,[0])*num_states
+        check = array(ParseTable.typecode)
+        next = array(ParseTable.typecode)
+        ParseTable.place(rows,range(num_states),base,check,next,len(symbols))
+        return ParseTable(
+            symbols, num_states, base, check, next,
+            *ParseTable.build_csr(num_states,reduce), *ParseTable.build_csr(num_states,ereduce)
+        )
+
+    def update(self,num_states,gotos,old_gotos,reduce,ereduce):
+        """ returns a new ParseTable where transitions of some states are replaced, and other states are kept in place
+
+            gotos : maps state to its new transitions {symbol:nextstate}, for changed and new states
+            old_gotos : maps state to its transitions {symbol:nextstate} in this table, for changed states
+            reduce,ereduce : reduce and ereduce tables of all states, as in build
+        """
+        symbols = SymbolTable(self.symbols.names)
+        base = array(ParseTable.typecode,self.base)
+        base.extend(array(ParseTable.typecode,[0])*(num_states-len(base)))
+        check = array(ParseTable.typecode,self.check)
+        next = array(ParseTable.typecode,self.next)
+        for state,row in old_gotos.items():
+            for symbol in row:
+                check[base[state]+symbols.ids[symbol]] = -1
+        rows = [[] for state in range(num_states)]
+        for state,row in gotos.items():
+            rows[state] = [(symbols.intern(symbol),nstate) for symbol,nstate in row.items()]
+        ParseTable.place(rows,sorted(gotos),base,check,next,len(symbols))
+        return ParseTable(
+            symbols, num_states, base, check, next,
+            *ParseTable.build_csr(num_states,reduce), *ParseTable.build_csr(num_states,ereduce)
+        )
+
+    def place(rows,states,base,check,next,num_symbols):
+        """ internal: places rows [(symid,nextstate)*] of states into free slots of check and next, setting base of each state
+
+        check and next are extended as needed, so that base[state]+symid is always a valid index
+        """
+        # occupied[i] is "1" if slot i is occupied, otherwise "0", so that a window of slots can be converted to a bit set by int(...,2)
+        occupied = bytearray(48 if state == -1 else 49 for state in check)
+        first_free = occupied.find(b"0") # all slots before first_free are occupied
+        if first_free == -1:
+            first_free = len(occupied)
+        # place dense rows first, as sparse rows fit easily into the gaps left
+        for state in sorted(states,key=lambda state:-len(rows[state])):
+            row = rows[state]
+            if not row:
+                base[state] = 0
+                continue
+            symids = [symid for symid,nstate in row]
+            lo = min(symids)
+            span = max(symids) - lo
+            window = max(2048,span) # number of offsets tried at once
+            start = max(first_free-lo,0)
+            while True:
+                end = start + lo + window + span
+                if len(occupied) < end:
+                    occupied.extend(b"0" * (end-len(occupied)))
+                # bit k of "free" is set if slot start+lo+k is not occupied
+                free = ~int(occupied[start+lo:end][::-1],2) & ((1 << (window+span)) - 1)
+                fits = (1 << window) - 1 # bit k is set if row fits at offset start+k
+                for symid in symids:
+                    fits &= free >> (symid-lo)
+                    if not fits:
+                        break
+                if fits:
+                    offset = start + (fits & -fits).bit_length() - 1
+                    break
+                start += window
+            for symid in symids:
+                occupied[offset+symid] = 49
+            base[state] = offset
+            first_free = occupied.find(b"0",first_free)
+            if first_free == -1:
+                first_free = len(occupied)
+
+        # pad so that base[state]+symid is always a valid index
+        size = max(len(occupied.rstrip(b"0")),max(base,default=0)+num_symbols)
+        check.extend(array(ParseTable.typecode,[-1])*(size-len(check)))
+        next.extend(array(ParseTable.typecode,[-1])*(size-len(next)))
+        for state in states:
+            offset = base[state]
+            for symid,nstate in rows[state]:
+                check[offset+symid] = state
+                next[offset+symid] = nstate
+
+    def build_csr(num_states,reductions):
+        """ internal: encodes a dict state -> {(ruleno,rulepos)*} as arrays (start,rule,pos) """
+        start = array(ParseTable.typecode,[0])*(num_states+1)
+        rule = array(ParseTable.typecode)
+        pos = array(ParseTable.typecode)
+        for state in range(num_states):
+            for ruleno,rulepos in reductions.get(state,()):
+                rule.append(ruleno)
+                pos.append(rulepos)
+            start[state+1] = len(rule)
+        return start,rule,pos
+
+    def goto(self,state,symid):
+        """ returns next state for (state,symid) or -1 if there is no transition """
+        idx = self.base[state] + symid
+        if self.check[idx] == state:
+            return self.next[idx]
+        return -1
+
+    def goto_symbol(self,state,symbol):
+        """ returns next state for (state,symbol) or -1 if there is no transition """
+        symid = self.symbols.ids.get(symbol,-1)
+        if symid == -1 or state < 0 or state >= self.num_states:
+            return -1
+        return self.goto(state,symid)
+
+    def transitions(self,state):
+        """ returns list of (symbol,nextstate) for transitions of a state """
+        if state < 0 or state >= self.num_states:
+            return []
+        base, check, next, names = self.base[state], self.check, self.next, self.symbols.names
+        return [(names[idx-base],next[idx]) for idx in range(max(base,0),min(base+len(names),len(check))) if check[idx] == state]
+
+    def reductions(self,state):
+        """ returns list of (ruleno,rulepos) for reductions of a state """
+        if state < 0 or state >= self.num_states:
+            return []
+        return [(self.reduce_rule[idx],self.reduce_pos[idx]) for idx in range(self.reduce_start[state],self.reduce_start[state+1])]
+
+    def ereductions(self,state):
+        """ returns list of (ruleno,rulepos) for e-reductions of a state """
+        if state < 0 or state >= self.num_states:
+            return []
+        return [(self.ereduce_rule[idx],self.ereduce_pos[idx]) for idx in range(self.ereduce_start[state],self.ereduce_start[state+1])]
+
+class DFAView(Mapping):
+    """ read-only dict view of the dfa of a ParseTable, where dfa[state,symbol] -> nextstate """
+
+    def __init__(self,table):
+        self.table = table
+
+    def __getitem__(self,key):
+        state,symbol = key
+        nstate = self.table.goto_symbol(state,symbol)
+        if nstate == -1:
+            raise KeyError(key)
+        return nstate
+
+    def __iter__(self):
+        base, names = self.table.base, self.table.symbols.names
+        for idx,state in enumerate(self.table.check):
+            if state != -1:
+                yield state,names[idx-base[state]]
+
+    def __len__(self):
+        return sum(1 for state in self.table.check if state != -1)
+
+class ReduceView(Mapping):
+    """ read-only dict view of reduce or ereduce tables of a ParseTable, where reduce[state] -> {(ruleno,rulepos)*} """
+
+    def __init__(self,table,empty=False):
+        self.table = table
+        self.empty = empty
+
+    def __getitem__(self,state):
+        items = self.table.ereductions(state) if self.empty else self.table.reductions(state)
+        if not items:
+            raise KeyError(state)
+        return set(items)
+
+    def __iter__(self):
+        start = self.table.ereduce_start if self.empty else self.table.reduce_start
+        for state in range(self.table.num_states):
+            if start[state] != start[state+1]:
+                yield state
+
+    def __len__(self):
+        return sum(1 for state in self)
+
+class EmptyGotos(dict):
+    """ maps state to [(nt,nextstate)*] for distinct heads of e-reductions of the state having a transition, computed on first access """
+
+    def __init__(self,table,rules):
+        self.table = table
+        self.rules = rules
+
+    def __missing__(self,state):
+        gotos = []
+        heads = set()
+        for ruleno,rulepos in self.table.ereductions(state):
+            head = self.rules[ruleno].head
+            if head not in heads:
+                heads.add(head)
+                nstate = self.table.goto_symbol(state,head)
+                if nstate != -1:
+                    gotos.append((head,nstate))
+        self[state] = gotos
+        return gotos
@@ -0,0 +1,52 @@
+import sys, unittest, textwrap, os, tempfile, contextlib, io, re
+sys.path.append("../..")
+from GLRParser.main import trans_file
+
+class TestBatch(unittest.TestCase):
+    grammar = """
+        S -> NP VP : NP VP
+        NP -> i : ben
+        NP -> the man : adam
+        NP -> NP-1 in NP-2 : NP-2 -deki NP-1
+        VP -> saw NP : NP -ı gördüm
+        VP -> slept : uyudum
+    """
+    sents = ["i saw the man @ ben adamı gördüm", "the man slept", "i slept @ ben uyudum", "i saw the man in the man @ ben adamdeki adamı gördüm", "the man saw @ *"]
+
+    def test_jobs(self):
+        """ translations of a pool of processes are written as a single process writes them """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            grm_fname = os.path.join(tmpdir, "test.grm")
+            with open(grm_fname, "w", encoding="utf-8") as fout:
+                fout.write(textwrap.dedent(self.grammar))
+            with open(os.path.join(tmpdir, "test.in.txt"), "w", encoding="utf-8") as fout:
+                fout.write("\n".join(self.sents*10))
+            outputs = []
+            for jobs in (1,2):
+                with contextlib.redirect_stdout(io.StringIO()) as log:
+                    trans_file(grm_fname, os.path.join(tmpdir, "test"), jobs=jobs)
+                with open(os.path.join(tmpdir, "test.out.txt"), "r", encoding="utf-8") as fin:
+                    outputs.append(fin.read())
+            self.assertIn("input=50, translated=40, matched=30 exp_err=10 ignored=10", outputs[0])
+            self.assertEqual(outputs[1], outputs[0])
+            self.assertEqual(log.getvalue().count("Worker"), 2)
+
+    def test_trans_cache_stats(self):
+        """ hits and misses of the generation tree cache are reported, summed over workers """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            grm_fname = os.path.join(tmpdir, "test.grm")
+            with open(grm_fname, "w", encoding="utf-8") as fout:
+                fout.write(textwrap.dedent(self.grammar).replace("VP -> slept : uyudum", "VP -> slept : V\nV -> : uyudum"))
+            with open(os.path.join(tmpdir, "test.in.txt"), "w", encoding="utf-8") as fout:
+                fout.write("\n".join(["i slept", "the man slept"]*10))
+            stats = []
+            for jobs in (1,2):
+                with contextlib.redirect_stdout(io.StringIO()) as log:
+                    trans_file(grm_fname, os.path.join(tmpdir, "test"), jobs=jobs)
+                match = re.search(r"Trans cache: (\d+) hits, (\d+) misses", log.getvalue())
+                stats.append((int(match.group(1)), int(match.group(2))))
+            self.assertEqual(stats[0], (19,1))
+            self.assertEqual(sum(stats[1]), 20)
+
+if __name__ == '__main__':
+    unittest.main()
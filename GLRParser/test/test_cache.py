@@ -0,0 +1,117 @@
+import sys, unittest, tempfile, os, time
+sys.path.append("../..")
+from GLRParser import Parser
+from GLRParser.cache import GrammarCache
+
+class TestGrammarCache(unittest.TestCase):
+    """ compiled grammars are loaded from cache unless the grammar, an included file, defines or reverse flag is changed """
+    grammar = """
+        %include np.grm
+        S -> NP VP : NP VP
+        VP -> saw NP : NP -ı gördüm
+        %ifdef SLEEP
+        VP -> slept : uyudum
+        %endif
+    """
+    included = """
+        NP -> i :
+        NP -> the man : adam
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir.name) # included files are relative to the current directory
+        self.write("main.grm", self.grammar)
+        self.write("np.grm", self.included)
+        self.cache = GrammarCache(os.path.join(self.tmpdir.name, "cache"))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def write(self, fname, text):
+        with open(fname, "w", encoding="utf-8") as fout:
+            fout.write(text)
+
+    def parser(self, defines=None, reverse=False, fname="main.grm"):
+        """ returns a parser for the grammar, which is compiled (and stored in the cache) unless it is loaded from the cache """
+        parser = Parser(cache=self.cache)
+        parser.parse_grammar(fname, reverse=reverse, defines=defines)
+        if not parser.cache_hit:
+            parser.compile()
+        return parser
+
+    def test_hit(self):
+        parser = self.parser()
+        self.assertFalse(parser.cache_hit)
+        cached = Parser(cache=self.cache.cache_dir)
+        cached.parse_grammar("main.grm")
+        self.assertTrue(cached.cache_hit)
+        cached.compile() # does nothing
+        self.assertFalse(cached.cache_hit)
+        self.assertEqual(dict(cached.dfa), dict(parser.dfa))
+        self.assertEqual(cached.trans_sent("i saw the man"), parser.trans_sent("i saw the man"))
+
+    def test_miss(self):
+        """ each change of sources is a miss, going back to an earlier version is a hit """
+        self.parser()
+        cases = [
+            ("defines", lambda: self.parser(defines={"SLEEP"})),
+            ("reverse", lambda: self.parser(reverse=True)),
+            ("include", lambda: self.write("np.grm", self.included + "NP -> the house : ev\n") or self.parser()),
+            ("root", lambda: self.write("main.grm", self.grammar + "VP -> slept : uyudum\n") or self.parser()),
+        ]
+        for name,func in cases:
+            with self.subTest(change=name):
+                self.assertFalse(func().cache_hit)
+        self.write("np.grm", self.included)
+        self.write("main.grm", self.grammar)
+        self.assertTrue(self.parser().cache_hit)
+        self.assertTrue(self.parser(defines={"SLEEP"}).cache_hit)
+
+    def test_text(self):
+        with open("main.grm", "r", encoding="utf-8") as fin:
+            text = fin.read()
+        parser = Parser(cache=self.cache)
+        parser.parse_grammar(text=text)
+        parser.compile()
+        cached = Parser(cache=self.cache)
+        cached.parse_grammar(text=text)
+        self.assertTrue(cached.cache_hit)
+        self.assertEqual(cached.trans_sent("i saw the man"), parser.trans_sent("i saw the man"))
+
+    def test_update_after_hit(self):
+        """ rules can be added to a grammar loaded from cache """
+        exp_parser = self.parser(defines={"SLEEP"})
+        self.parser()
+        parser = Parser(cache=self.cache)
+        parser.parse_grammar("main.grm")
+        self.assertTrue(parser.cache_hit)
+        parser.add_rules("VP -> slept : uyudum")
+        self.assertEqual(parser.trans_sent("i slept"), exp_parser.trans_sent("i slept"))
+        self.assertNotIsInstance(parser.trans_sent("i slept"), str)
+
+    def test_lru_eviction(self):
+        grammars = ["g%d.grm" % idx for idx in range(3)]
+        for idx,fname in enumerate(grammars):
+            self.write(fname, self.grammar + "NP -> word%d :\n" % idx)
+            self.parser(fname=fname)
+            time.sleep(0.01) # distinct modification times
+        self.assertTrue(self.parser(fname=grammars[0]).cache_hit) # g0 is most recently used
+        time.sleep(0.01)
+        entry_size = os.path.getsize(self.cache.lookup(self.cache.source_key(grammars[0])))
+        self.cache.max_size = entry_size * 7 // 2 # room for three entries with their .deps files
+        self.write("g3.grm", self.grammar + "NP -> word3 :\n")
+        self.parser(fname="g3.grm")
+        cached = [self.cache.lookup(self.cache.source_key(fname)) is not None for fname in grammars + ["g3.grm"]]
+        self.assertEqual(cached, [True, False, True, True]) # g1 is least recently used
+
+    def test_clear(self):
+        self.parser()
+        self.cache.clear()
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+        self.assertFalse(self.parser().cache_hit)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import sys, unittest, tempfile, os
+sys.path.append("../..")
+from GLRParser import Parser, Trie, CompactTrie
+
+class TestCompactTrie(unittest.TestCase):
+    """ CompactTrie has the same search, add, remove and items semantics as Trie """
+    keys = [
+        "united", "united states", "united states of america", "united kingdom", "state", "states",
+        "of", "of course", "course", "the", "the man", "the man who", "man", "who",
+    ]
+
+    def setUp(self):
+        self.trie = Trie()
+        for idx,key in enumerate(self.keys):
+            self.trie.add(key.split(), "val%d" % idx)
+        self.trie.add(["united"], "united2") # two values for the same key
+
+    def assertSameTrie(self, trie, exp_trie):
+        for key in self.keys + ["united states of", "unknown", "the woman", "kingdom"]:
+            words = key.split() + ["$"]
+            for pos in range(len(words)):
+                with self.subTest(words=words[pos:]):
+                    self.assertEqual(trie.search(words[pos:]), exp_trie.search(words[pos:]))
+        self.assertEqual(sorted((" ".join(keyseq),val) for keyseq,val in trie.items()), sorted((" ".join(keyseq),val) for keyseq,val in exp_trie.items()))
+
+    def test_build(self):
+        trie = CompactTrie.build(self.trie)
+        self.assertSameTrie(trie, self.trie)
+        self.assertEqual(trie.search(["united", "states", "of", "america"]), [(1,"val0"), (1,"united2"), (2,"val1"), (4,"val2")])
+        self.assertEqual(trie.to_trie().root, self.trie.root)
+        self.assertEqual(len(trie.base), 16) # nodes
+
+    def test_add(self):
+        """ transitions of a node are moved when the slot for a new word is occupied """
+        trie = CompactTrie()
+        for idx,key in enumerate(self.keys):
+            trie.add(key.split(), "val%d" % idx)
+        trie.add(["united"], "united2")
+        self.assertSameTrie(trie, self.trie)
+        compact = CompactTrie.build(self.trie)
+        for trie in (compact, self.trie):
+            trie.add(["the", "woman"], "new")
+            trie.add(["kingdom"], "new")
+        self.assertSameTrie(compact, self.trie)
+
+    def test_remove(self):
+        trie = CompactTrie.build(self.trie)
+        for item in (trie, self.trie):
+            item.remove(["united", "states"], "val1")
+            item.remove(["united"], "united2")
+        self.assertSameTrie(trie, self.trie)
+        self.assertEqual(trie.search(["united", "states"]), [(1,"val0")])
+        with self.assertRaises(KeyError):
+            trie.remove(["united", "states"], "val1")
+        with self.assertRaises(KeyError):
+            trie.remove(["unknown"], "val1")
+        with self.assertRaises(ValueError):
+            trie.remove(["united"], "val1")
+
+    def test_compiled_grammar(self):
+        """ trie of a memory-mapped compiled grammar is modifiable """
+        grammar = "%auto_dict true\nS -> NP VP : NP VP\nNP -> the man : adam\nNP -> the telescope : teleskop\nVP -> slept : uyudu\n"
+        parser = Parser()
+        parser.parse_grammar(text=grammar)
+        parser.compile()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "test.grmc")
+            parser.save_grammar(fname)
+            loaded = Parser()
+            loaded.load_grammar(fname, mapped=True)
+            self.assertIsInstance(loaded.trie, CompactTrie)
+            self.assertIsInstance(loaded.trie.check, memoryview)
+            self.assertEqual(sorted(loaded.trie.list()), sorted(parser.trie.list()))
+            loaded.add_rules("%auto_dict true\nNP -> the woman : kadın") # parsing context of a loaded grammar is not known
+            loaded.remove_rules("%auto_dict true\nNP -> the telescope : teleskop")
+            self.assertEqual([sent for sent,cost in loaded.trans_sent("the woman slept")], ["kadın uyudu"])
+            self.assertIsInstance(loaded.trans_sent("the telescope slept"), str)
+            self.assertEqual(loaded.trans_sent("the man slept"), parser.trans_sent("the man slept"))
+
+if __name__ == '__main__':
+    unittest.main()
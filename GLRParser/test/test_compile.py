@@ -0,0 +1,42 @@
+import sys, unittest, os
+sys.path.append("../..")
+from GLRParser import Parser
+
+class TestParallelCompile(unittest.TestCase):
+    """ compile(workers=N) produces the same tables as a serial compile """
+    grm_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grm")
+
+    def compiled(self, fname, workers=None):
+        parser = Parser()
+        parser.min_parallel_batch = 1 # send every batch to the workers
+        parser.parse_grammar(os.path.join(self.grm_dir, fname))
+        parser.compile(workers=workers)
+        return parser
+
+    def assertSameTables(self, parser, exp_parser):
+        table, exp_table = parser.table, exp_parser.table
+        self.assertEqual(table.symbols.names, exp_table.symbols.names)
+        self.assertEqual(table.num_states, exp_table.num_states)
+        for name in ("base", "check", "next", "reduce_start", "reduce_rule", "reduce_pos", "ereduce_start", "ereduce_rule", "ereduce_pos"):
+            with self.subTest(table=name):
+                self.assertEqual(getattr(table, name), getattr(exp_table, name))
+        self.assertEqual(parser.kernels, exp_parser.kernels)
+
+    def test_parallel(self):
+        for fname in ("tenses.grm", "german.grm"):
+            serial = self.compiled(fname)
+            for workers in (2, 3):
+                with self.subTest(fname=fname, workers=workers):
+                    self.assertSameTables(self.compiled(fname, workers), serial)
+
+    def test_parallel_update(self):
+        """ a grammar compiled in parallel can be updated incrementally """
+        parser = self.compiled("tenses.grm", 2)
+        serial = self.compiled("tenses.grm")
+        for item in (parser, serial):
+            item.add_rules("NP -> the telescope : teleskop")
+        self.assertSameTables(parser, serial)
+        self.assertEqual(parser.trans_sent("i am going"), serial.trans_sent("i am going"))
+
+if __name__ == '__main__':
+    unittest.main()
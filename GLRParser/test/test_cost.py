@@ -14,12 +14,35 @@ class TestCost:
     def test_enumx(self):
         for idx,sent in enumerate(self.sents):
             with self.subTest(idx=idx,sent=sent):
-                self.parser.parse(sent)
-                tree = self.parser.make_tree()
+                result = self.parser.parse(sent)
+                tree = self.parser.make_tree(result)
                 utree = self.parser.unify_tree(tree)
                 ttree = self.parser.trans_tree(utree)
                 self.assertEqual(list(sorted(ttree.enumx())), self.enumx[idx])
 
+    def test_kbest(self):
+        for idx,sent in enumerate(self.sents):
+            with self.subTest(idx=idx,sent=sent):
+                result = self.parser.parse(sent)
+                tree = self.parser.make_tree(result)
+                utree = self.parser.unify_tree(tree)
+                ttree = self.parser.trans_tree(utree)
+                exp_trans = sorted(ttree.enumx(),key=lambda item:item[1])
+                self.assertEqual(list(ttree.enum_best()), exp_trans)
+                self.assertEqual(ttree.kbest(1), exp_trans[:1])
+                self.assertEqual(ttree.kbest(2), exp_trans[:2])
+                trans = self.parser.trans_sent(sent)
+                self.assertEqual(self.parser.trans_sent(sent,k=1), trans[:1])
+
+    def test_enum_forest(self):
+        for idx,sent in enumerate(self.sents):
+            with self.subTest(idx=idx,sent=sent):
+                result = self.parser.parse(sent)
+                tree = self.parser.make_tree(result)
+                utree = self.parser.unify_tree(tree)
+                ttree = self.parser.trans_tree(utree)
+                self.assertEqual(ttree.enum_forest(), list(dict.fromkeys(ttree.enumx())))
+
 class TestCost1A(TestCost,unittest.TestCase):
     reverse = False
     grammar = """
@@ -150,8 +173,8 @@ def genTestCost(cls):
     parser.parse_grammar(text=cls.grammar,reverse=cls.reverse)
     parser.compile()
     for sent in cls.sents:
-        parser.parse(sent)
-        tree = parser.make_tree()
+        result = parser.parse(sent)
+        tree = parser.make_tree(result)
         utree = parser.unify_tree(tree)
         ttree = parser.trans_tree(utree)
         print(list(sorted(ttree.enumx())))
@@ -0,0 +1,81 @@
+import sys, unittest, textwrap, pickle
+sys.path.append("../..")
+from GLRParser import Parser, ParseError, UnifyError
+from GLRParser.feature import FeatureSpace, FeatureVector
+from GLRParser.test import test_unify
+
+class TestFeature(unittest.TestCase):
+
+    def test_vector(self):
+        """ a FeatureVector is a read-only dict of its features """
+        space = FeatureSpace()
+        vector = space.encode({"numb":"sing","pers":"3"})
+        self.assertEqual(type(vector), FeatureVector)
+        self.assertEqual(vector, {"numb":"sing","pers":"3"})
+        self.assertEqual((vector["pers"],vector.get("case"),"numb" in vector,len(vector)), ("3",None,True,2))
+        self.assertIs(space.encode({"numb":"sing","pers":"3"}).bits, vector.bits)
+        self.assertNotEqual(space.encode({"numb":"plur","pers":"3"}), vector)
+        self.assertEqual(type(space.encode({"conn":"~if"})), dict) # negations and references are kept as dicts
+        self.assertEqual(type(space.encode({"head":1})), dict)
+        self.assertEqual(pickle.loads(pickle.dumps(vector)), vector)
+
+    def test_unify(self):
+        """ bit set unification gives the same results and errors as dict unification, also for values added later """
+        space = FeatureSpace()
+        cases = [ # dst,src
+            ({"numb":"sing"},{"numb":"sing","pers":"3"}),
+            ({"numb":"sing"},{"numb":"plur"}),
+            ({"numb":"sing"},{"numb":"dual"}), # a value added after numb=sing is encoded
+            ({},{"pers":"1"}),
+        ]
+        for dst,src in cases:
+            with self.subTest(dst=dst,src=src):
+                results = []
+                for _dst,_src in ((dst,src),(space.encode(dst),space.encode(src))):
+                    try:
+                        results.append((Parser.unify_up(_dst,None,_src),Parser.unify_down(_dst,None,_src,{"numb":"?"})))
+                    except UnifyError as ue:
+                        results.append(str(ue))
+                self.assertEqual(results[1], results[0])
+
+    def test_grammar(self):
+        """ unified trees and errors of the unification tests are the same with a feature space """
+        for test in (test_unify.TestUnifyBinary, test_unify.TestUnify):
+            parsers = []
+            for feature_space in (False,True):
+                parser = Parser(feature_space=feature_space)
+                parser.parse_grammar(text=test.grammar)
+                parser.compile()
+                parsers.append(parser)
+            for sent,out in test.cases:
+                with self.subTest(sent=sent):
+                    outs = []
+                    for parser in parsers:
+                        try:
+                            tree = parser.unify_tree(parser.make_tree(parser.parse(sent)))
+                            outs.append(tree.pformat_ext() + parser.trans_tree(tree).pformatr_ext())
+                        except ParseError as pe:
+                            outs.append(str(pe))
+                    self.assertEqual(outs[1], outs[0])
+
+    def test_trans(self):
+        grammar = """
+            S -> NP(numb,pers) VP : NP VP(numb,pers)
+            NP -> i : ben [numb=sing,pers=1]
+            NP -> we : biz [numb=plur,pers=1]
+            NP -> he : o [numb=sing,pers=3]
+            VP -> sleep : V [pers=!3]
+            VP -> sleeps : V [numb=sing,pers=3]
+            V -> : uyurum [numb=sing,pers=1]
+            V -> : uyuruz [numb=plur,pers=1]
+            V -> : uyur [pers=3]
+        """
+        parser = Parser(feature_space=True)
+        parser.parse_grammar(text=textwrap.dedent(grammar))
+        parser.compile()
+        for sent,trans in (("i sleep","ben uyurum"),("we sleep","biz uyuruz"),("he sleeps","o uyur")):
+            self.assertEqual([item[0] for item in parser.trans_sent(sent)], [trans])
+        self.assertEqual(parser.trans_sent("he sleep"), "ParseError: UnifyD check error feat matches pers VP -> \"sleep\" : V {0}  [pers=!3] S -> NP(numb,pers) VP : 0 1(numb,pers) {0}  []")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import sys, unittest, tempfile, os, struct, pickle
+sys.path.append("../..")
+from GLRParser import Parser
+from GLRParser.grmc import GrammarFileError, read_grammar, read_sections, header_format
+
+class TestGrammarFile(unittest.TestCase):
+    """ compiled grammar file (.grmc) round-trip and validation, using tenses.grm with terminal-only rules in the trie """
+    grm_fname = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grm", "tenses.grm")
+    sents = [
+        "i am going",
+        "you are going",
+        "he has been going",
+        "i want you to go",
+        "the man who is going",
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        with open(cls.grm_fname, "r", encoding="utf-8") as fin:
+            text = "%auto_dict true\n" + fin.read()
+        parser = Parser()
+        parser.parse_grammar(text=text)
+        parser.compile()
+        cls.parser = parser
+        cls.trans = [parser.trans_sent(sent) for sent in cls.sents]
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmpdir.name, "tenses.grmc")
+        self.parser.save_grammar(self.fname)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def load(self, fname, verify=False, mapped=False):
+        parser = Parser()
+        parser.load_grammar(fname, verify, mapped)
+        return parser
+
+    def test_round_trip(self):
+        parser = self.load(self.fname, verify=True)
+        self.assertEqual(parser.grammar_hash, self.parser.grammar_hash)
+        self.assertEqual(len(parser.rules), len(self.parser.rules))
+        for rule,exp_rule in zip(parser.rules, self.parser.rules):
+            with self.subTest(rule=exp_rule):
+                self.assertEqual(rule, exp_rule)
+                for fparam,exp_fparam in zip(rule.lparam+rule.rparam, exp_rule.lparam+exp_rule.rparam):
+                    self.assertEqual(getattr(fparam,"param_type","unset"), getattr(exp_fparam,"param_type","unset"))
+        self.assertEqual(sorted(parser.trie.list()), sorted(self.parser.trie.list()))
+        self.assertEqual(parser.trie.to_trie().root, self.parser.trie.root)
+        self.assertEqual(parser.post_processor.suff_dict, self.parser.post_processor.suff_dict)
+        self.assertEqual(dict(parser.dfa), dict(self.parser.dfa))
+        self.assertEqual(dict(parser.reduce), dict(self.parser.reduce))
+        self.assertEqual(dict(parser.ereduce), dict(self.parser.ereduce))
+        self.assertEqual(parser.ruledict, self.parser.ruledict)
+        for sent,trans in zip(self.sents, self.trans):
+            with self.subTest(sent=sent):
+                self.assertEqual(parser.trans_sent(sent), trans)
+
+    def test_trie_search(self):
+        parser = self.load(self.fname)
+        for words in (["am", "going", "$"], ["are", "$"], ["'s", "$"], ["unknown", "$"]):
+            with self.subTest(words=words):
+                self.assertEqual(parser.trie.search(words), self.parser.trie.search(words))
+        self.assertTrue(parser.trie.search(["are", "$"]))
+
+    def test_resave(self):
+        """ a loaded grammar can be saved again """
+        parser = self.load(self.fname)
+        fname = os.path.join(self.tmpdir.name, "resaved.grmc")
+        parser.save_grammar(fname)
+        self.assertEqual(parser.grammar_hash, self.parser.grammar_hash)
+        parser = self.load(fname)
+        for sent,trans in zip(self.sents, self.trans):
+            with self.subTest(sent=sent):
+                self.assertEqual(parser.trans_sent(sent), trans)
+
+    def test_load_pickle(self):
+        """ grammars saved in older pickle stream format are still loaded """
+        fname = os.path.join(self.tmpdir.name, "tenses.pkl")
+        self.parser.save_grammar(fname, version=1)
+        parser = self.load(fname)
+        self.assertIsNone(parser.grammar_hash)
+        self.assertEqual(parser.rules, self.parser.rules)
+        self.assertEqual(dict(parser.dfa), dict(self.parser.dfa))
+        for sent,trans in zip(self.sents, self.trans):
+            with self.subTest(sent=sent):
+                self.assertEqual(parser.trans_sent(sent), trans)
+
+    def test_mapped(self):
+        """ memory-mapped grammar uses parse tables in place """
+        parser = self.load(self.fname, verify=True, mapped=True)
+        self.assertIsInstance(parser.table.base, memoryview)
+        self.assertEqual(parser.table.base.tolist(), self.parser.table.base.tolist())
+        self.assertEqual(dict(parser.dfa), dict(self.parser.dfa))
+        self.assertEqual(dict(parser.reduce), dict(self.parser.reduce))
+        self.assertEqual(list(parser.rules), self.parser.rules)
+        for sent,trans in zip(self.sents, self.trans):
+            with self.subTest(sent=sent):
+                self.assertEqual(parser.trans_sent(sent), trans)
+
+    def test_mapped_pickle(self):
+        """ a parser with a memory-mapped grammar can be pickled (e.g. for spawned worker processes), its tables are pickled as arrays """
+        parser = self.load(self.fname, mapped=True)
+        loaded = pickle.loads(pickle.dumps(parser))
+        self.assertNotIsInstance(loaded.table.base, memoryview)
+        self.assertNotIsInstance(loaded.trie.base, memoryview)
+        for sent,trans in zip(self.sents, self.trans):
+            with self.subTest(sent=sent):
+                self.assertEqual(loaded.trans_sent(sent), trans)
+
+    def test_version2(self):
+        """ files of version 2 (breadth-first trie layout) are still loaded """
+        fname = os.path.join(self.tmpdir.name, "tenses_v2.grmc")
+        self.parser.save_grammar(fname, version=2)
+        with open(fname, "rb") as fin:
+            self.assertEqual(header_format.unpack_from(fin.read(header_format.size))[1], 2)
+        for mapped in (False,True):
+            parser = self.load(fname, verify=True, mapped=mapped)
+            self.assertEqual(sorted(map(str,parser.trie.list())), sorted(map(str,self.parser.trie.list())))
+            for sent,trans in zip(self.sents, self.trans):
+                with self.subTest(mapped=mapped, sent=sent):
+                    self.assertEqual(parser.trans_sent(sent), trans)
+
+    def test_mapped_resave(self):
+        """ a memory-mapped grammar can be saved over its own file and in older pickle stream format """
+        parser = self.load(self.fname, mapped=True)
+        parser.save_grammar(self.fname)
+        fname = os.path.join(self.tmpdir.name, "tenses.pkl")
+        parser.save_grammar(fname, version=1)
+        for fname in (self.fname, fname):
+            loaded = self.load(fname)
+            for sent,trans in zip(self.sents, self.trans):
+                with self.subTest(fname=fname, sent=sent):
+                    self.assertEqual(loaded.trans_sent(sent), trans)
+        self.assertEqual(parser.trans_sent(self.sents[0]), self.trans[0])
+
+    def corrupt(self, offset, data=None, size=None):
+        """ overwrites the file at offset with data, or truncates it to size """
+        with open(self.fname, "r+b") as fout:
+            if data is not None:
+                fout.seek(offset)
+                fout.write(data)
+            if size is not None:
+                fout.truncate(size)
+
+    def test_wrong_magic(self):
+        self.corrupt(0, b"GRMX")
+        with self.assertRaises(GrammarFileError):
+            read_grammar(self.fname)
+
+    def test_unsupported_version(self):
+        self.corrupt(4, struct.pack("<I", 99))
+        with self.assertRaisesRegex(GrammarFileError, "version"):
+            self.load(self.fname)
+
+    def test_truncated(self):
+        size = os.path.getsize(self.fname)
+        for size in (size-1, size//2, header_format.size+10, header_format.size-1):
+            with self.subTest(size=size):
+                self.corrupt(0, size=size)
+                with self.assertRaisesRegex(GrammarFileError, "truncated"):
+                    read_grammar(self.fname)
+                with self.assertRaisesRegex(GrammarFileError, "truncated"):
+                    read_grammar(self.fname, mapped=True)
+
+    def test_hash_mismatch(self):
+        with open(self.fname, "rb") as fin:
+            grammar_hash,directory = read_sections(fin.read())
+        offset,size = directory["cost"]
+        self.corrupt(offset, struct.pack("<i", 99))
+        read_grammar(self.fname) # not checked unless verify is True
+        with self.assertRaisesRegex(GrammarFileError, "hash mismatch"):
+            read_grammar(self.fname, verify=True)
+        with self.assertRaises(GrammarFileError):
+            self.load(self.fname, verify=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import sys, unittest, textwrap, tempfile, os
+sys.path.append("../..")
+from GLRParser import Parser, GrammarError
+
+def automaton(parser):
+    """ returns canonical form of the dfa, i.e. kernel, reductions and transitions of states in breadth-first order """
+    gotos = [dict() for state in range(parser.table.num_states)]
+    for (state,symbol),nstate in parser.dfa.items():
+        gotos[state][symbol] = nstate
+    order = {0:0}
+    todo = [0]
+    result = []
+    for state in todo:
+        for symbol in sorted(gotos[state]):
+            nstate = gotos[state][symbol]
+            if nstate not in order:
+                order[nstate] = len(todo)
+                todo.append(nstate)
+        result.append((
+            sorted(parser.kernels[state]),
+            sorted(parser.reduce.get(state,())),
+            sorted(parser.ereduce.get(state,())),
+            [(symbol,order[gotos[state][symbol]]) for symbol in sorted(gotos[state])],
+        ))
+    return result
+
+class TestIncremental(unittest.TestCase):
+    grammar = """
+        S -> NP VP : NP VP
+        S -> S in NP : NP -de S
+        NP -> i :
+        NP -> the man : adam
+        NP -> the house : ev
+        NP -> NP-1 in NP-2 : NP-2 -deki NP-1
+        VP -> saw NP : NP -ı gördüm
+        VP -> slept : uyudum
+    """
+    added = """
+        S -> S with NP : NP -la S
+        NP -> NP-1 with NP-2 : NP-2 -lu NP-1
+        NP -> the telescope : teleskop
+        Adv -> :
+        Adv -> quickly : hızlıca
+        VP -> Adv slept : Adv uyudum
+    """
+    sents = [
+        "i saw the man in the house with the telescope",
+        "the man slept in the house",
+        "i quickly slept",
+        "i slept with the man",
+    ]
+
+    def compiled(self, text):
+        parser = Parser()
+        parser.parse_grammar(text=textwrap.dedent(text))
+        parser.compile()
+        return parser
+
+    def trans(self, parser):
+        return [sorted(result) if type(result) == list else result for result in map(parser.trans_sent, self.sents)]
+
+    def assertSameParser(self, parser, exp_parser):
+        self.assertEqual(parser.rules, exp_parser.rules)
+        self.assertEqual(parser.ruledict, exp_parser.ruledict)
+        self.assertEqual(parser.nullable, exp_parser.nullable)
+        self.assertEqual(automaton(parser), automaton(exp_parser))
+        self.assertEqual(self.trans(parser), self.trans(exp_parser))
+
+    def test_add_rules(self):
+        parser = self.compiled(self.grammar)
+        parser.add_rules(textwrap.dedent(self.added))
+        self.assertSameParser(parser, self.compiled(self.grammar + self.added))
+
+    def test_add_rules_step_by_step(self):
+        parser = self.compiled(self.grammar)
+        for line in self.added.strip().split("\n"):
+            parser.add_rules(line)
+        self.assertSameParser(parser, self.compiled(self.grammar + self.added))
+
+    def test_remove_rules(self):
+        parser = self.compiled(self.grammar + self.added)
+        parser.remove_rules(textwrap.dedent(self.added))
+        self.assertSameParser(parser, self.compiled(self.grammar))
+
+    def test_remove_middle_rules(self):
+        """ rules are renumbered after removal """
+        lines = textwrap.dedent(self.grammar + self.added).strip().split("\n")
+        removed = [lines[1], lines[5], lines[11]]
+        parser = self.compiled("\n".join(lines))
+        parser.remove_rules("\n".join(removed))
+        self.assertSameParser(parser, self.compiled("\n".join(line for line in lines if line not in removed)))
+
+    def test_remove_unknown_rule(self):
+        parser = self.compiled(self.grammar)
+        with self.assertRaises(GrammarError):
+            parser.remove_rules("NP -> the dog : köpek")
+
+    def test_remove_start_rule(self):
+        parser = self.compiled(self.grammar)
+        with self.assertRaisesRegex(GrammarError, "Start rule"):
+            parser.update_rules(removed=parser.rules[:1])
+
+    def test_dict_rules(self):
+        """ rules going into the trie does not change the dfa """
+        parser = self.compiled("%auto_dict true\n" + textwrap.dedent(self.grammar))
+        table, kernels = parser.table, parser.kernels
+        parser.add_rules("NP -> the telescope : teleskop")
+        self.assertIs(parser.table, table)
+        self.assertIs(parser.kernels, kernels)
+        exp_parser = self.compiled("%auto_dict true\n" + textwrap.dedent(self.grammar) + "NP -> the telescope : teleskop")
+        self.assertEqual(parser.trans_sent("i saw the telescope"), exp_parser.trans_sent("i saw the telescope"))
+        self.assertNotIsInstance(parser.trans_sent("i saw the telescope"), str)
+        parser.remove_rules("NP -> the telescope : teleskop")
+        self.assertIs(parser.table, table)
+        self.assertIsInstance(parser.trans_sent("i saw the telescope"), str)
+
+    def test_loaded_grammar(self):
+        """ a grammar loaded from a compiled file is fully compiled on the first update """
+        parser = self.compiled(self.grammar)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "test.grmc")
+            parser.save_grammar(fname)
+            parser = Parser()
+            parser.load_grammar(fname, mapped=True)
+            parser.add_rules(textwrap.dedent(self.added))
+        self.assertSameParser(parser, self.compiled(self.grammar + self.added))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import sys, unittest, textwrap
+sys.path.append("../..")
+from GLRParser import Parser, CompactTrie, Lattice
+
+class TestLattice(unittest.TestCase):
+    grammar = """
+        %auto_dict true
+        S -> NP VP : NP VP
+        NP -> Num N : Num N
+        NP -> U : U
+        NP -> the man : adam
+        NP -> the man who : kişi
+        NP -> man : insan
+        N -> cars : arabalar
+        Num -> CardinalNumber : CardinalNumber
+        VP -> saw NP : NP -ı gördü
+        VP -> saw the man : adamı gördü
+    """
+
+    def setUp(self):
+        self.parser = Parser()
+        self.parser.parse_grammar(text=textwrap.dedent(self.grammar))
+        self.parser.compile()
+
+    def test_matches(self):
+        """ single pass matches are equal to searching at each position """
+        trie = self.parser.trie
+        words = "the man saw the man who saw 3 cars unknown $".split()
+        for item in (trie, CompactTrie.build(trie)):
+            with self.subTest(trie=type(item).__name__):
+                self.assertEqual(item.matches(words), [item.search(words[pos:]) for pos in range(len(words))])
+
+    def test_arcs(self):
+        lattice = self.parser.make_lattice("John saw the man 3")
+        self.assertEqual(lattice.words, ["john", "saw", "the", "man", "3", "$"])
+        arcs = [(start, end, rule.head) for start,end,rule in lattice]
+        self.assertEqual(arcs, [(0, 1, "U"), (1, 4, "VP"), (2, 4, "NP"), (3, 4, "NP"), (4, 5, "CardinalNumber")])
+
+    def test_parse_lattice(self):
+        """ a lattice can be parsed instead of the input string """
+        sent = "John saw 3 cars"
+        exp_trans = self.parser.trans_sent(sent)
+        lattice = self.parser.make_lattice(sent)
+        self.assertIs(self.parser.parse(lattice).lattice, lattice)
+        self.assertEqual(self.parser.trans_sent(lattice), exp_trans)
+        self.assertEqual(self.parser.trans_sent(lattice), exp_trans)
+
+    def test_empty_word(self):
+        """ an empty word has no synthetic rule """
+        self.assertEqual([Lattice.case(word) for word in ("", "the", "John", "NATO", "3", "-1")], [0, 0, 1, 2, 3, 3])
+        lattice = Lattice([], [], self.parser.trie)
+        self.assertEqual(lattice.append(""), [])
+        self.assertEqual(lattice.words, [""])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import sys, unittest, textwrap
+sys.path.append("../..")
+from GLRParser import Parser, ParseLimits
+
+class TestLimits(unittest.TestCase):
+    grammar = """
+        S -> NP VP : NP VP
+        S -> S PP : PP S {3}
+        NP -> i : ben
+        NP -> the man : adam
+        NP -> the house : ev
+        NP -> NP-1 PP : PP NP-1 {1}
+        PP -> in NP : NP -de
+        VP -> saw NP : NP -ı gördüm
+    """
+    sent = "i saw the man in the house in the house in the house"
+
+    def setUp(self):
+        self.parser = Parser()
+        self.parser.parse_grammar(text=textwrap.dedent(self.grammar))
+        self.parser.compile()
+        self.full = self.parser.trans_sent(self.sent)
+
+    def test_no_limit_hit(self):
+        limits = ParseLimits(max_edges=10000,max_alts=10000,time_limit=60)
+        result = self.parser.parse(self.sent,limits)
+        self.assertEqual(result.degraded, [])
+        self.assertEqual(self.parser.trans_sent(self.sent,limits=limits), self.full)
+        self.assertEqual(limits.hit, [])
+
+    def test_max_edges(self):
+        """ after max_edges, a node of the forest keeps only its cheapest alternatives, but the sentence is still parsed """
+        limits = ParseLimits(max_edges=20)
+        result = self.parser.parse(self.sent,limits)
+        self.assertEqual(result.degraded, ["max_edges"])
+        self.assertLess(result.count_trees(), self.parser.parse(self.sent).count_trees())
+        trans = self.parser.trans_sent(self.sent,limits=ParseLimits(max_edges=20))
+        self.assertTrue(trans)
+        self.assertLess(len(trans), len(self.full))
+
+    def test_max_alts(self):
+        limits = ParseLimits(max_alts=1)
+        trans = self.parser.trans_sent(self.sent,limits=limits)
+        self.assertEqual(limits.hit, ["max_alts"])
+        self.assertEqual(len(trans), 1)
+        self.assertEqual(trans[0][1], self.full[0][1]) # the cheapest translation is kept
+
+    def test_deadline(self):
+        limits = ParseLimits(time_limit=0)
+        trans = self.parser.trans_sent(self.sent,limits=limits)
+        self.assertEqual(limits.hit, ["deadline"])
+        self.assertEqual(len(trans), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -271,10 +271,10 @@ class TestParseSimple(unittest.TestCase):
         sent = "i saw the man in the house with the telescope"
 
         parser.compile()
-        parser.parse(sent)
+        result = parser.parse(sent)
 
         self.parser = parser
-        self.tree = parser.make_tree()
+        self.tree = parser.make_tree(result)
         self.maxDiff = None
 
     def test_format(self):
@@ -711,10 +711,10 @@ class TestParseSimpleEmpty(unittest.TestCase):
         sent = "i saw man in apt with tel"
 
         parser.compile()
-        parser.parse(sent)
+        result = parser.parse(sent)
 
         self.parser = parser
-        self.tree = parser.make_tree()
+        self.tree = parser.make_tree(result)
         self.maxDiff = None
 
     def test_format(self):
@@ -770,10 +770,10 @@ class TestParseMiddleEmpty(unittest.TestCase):
         sent = "c"
 
         parser.compile()
-        parser.parse(sent)
+        result = parser.parse(sent)
 
         self.parser = parser
-        self.tree = parser.make_tree()
+        self.tree = parser.make_tree(result)
         self.maxDiff = None
 
     def test_format(self):
@@ -797,8 +797,8 @@ def gen_TestParseSimple():
     sent = "i saw the man in the house with the telescope"
 
     parser.compile()
-    parser.parse(sent)
-    tree = parser.make_tree()
+    result = parser.parse(sent)
+    tree = parser.make_tree(result)
     print(tree.format())
     print(tree.str_format())
     print(tree.pformat())
@@ -812,8 +812,8 @@ def gen_TestParseSimpleEmpty():
     sent = "i saw man in apt with tel"
 
     parser.compile()
-    parser.parse(sent)
-    tree = parser.make_tree()
+    result = parser.parse(sent)
+    tree = parser.make_tree(result)
     print(tree.format())
     print(tree.str_format())
     print(tree.pformat())
@@ -827,8 +827,8 @@ def gen_TestParseMiddleEmpty():
     sent = "c"
 
     parser.compile()
-    parser.parse(sent)
-    tree = parser.make_tree()
+    result = parser.parse(sent)
+    tree = parser.make_tree(result)
     print(tree.format())
     print(tree.str_format())
     print(tree.pformat())
@@ -0,0 +1,94 @@
+import sys, unittest, textwrap, json, asyncio
+sys.path.append("../..")
+from GLRParser import Parser
+from GLRParser.server import TranslationServer, init_worker, translate_batch
+
+class TestServer(unittest.TestCase):
+    grammar = """
+        S -> NP VP : NP VP
+        NP -> i : ben
+        NP -> the man : adam
+        NP -> the house : ev
+        NP -> NP-1 PP : PP NP-1
+        PP -> in NP : NP -de
+        VP -> saw NP : NP -ı gördüm
+        VP -> VP PP : PP VP
+        VP -> slept : uyudum
+    """
+
+    def setUp(self):
+        self.parser = Parser()
+        self.parser.parse_grammar(text=textwrap.dedent(self.grammar))
+        self.parser.compile()
+
+    async def post(self,port,request,path="/translate",content_length=None):
+        """ sends a request, returns (status,response), content_length is the Content-Length header if given, "" for no header """
+        reader, writer = await asyncio.open_connection("127.0.0.1",port)
+        body = json.dumps(request).encode("utf-8")
+        if content_length is None:
+            content_length = str(len(body))
+        header = b"Content-Length: %s\r\n" % content_length.encode() if content_length else b""
+        writer.write(b"POST %s HTTP/1.1\r\nConnection: close\r\n%s\r\n" % (path.encode(),header) + body)
+        data = await reader.read()
+        writer.close()
+        head, _, body = data.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(body.decode("utf-8"))
+
+    def serve(self,requests,content_length=None,**params):
+        """ returns responses of a server to concurrent requests """
+        async def run():
+            translation_server = TranslationServer(self.parser,jobs=2,**params)
+            server = await translation_server.start("127.0.0.1",0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                return await asyncio.gather(*(self.post(port,request,content_length=content_length) for request in requests))
+            finally:
+                await translation_server.stop(server)
+        return asyncio.run(run())
+
+    def test_translate(self):
+        sents = ["i saw the man", "the man slept", "i saw the man in the house", "the man saw"] * 10
+        responses = self.serve([{"sent": sent} for sent in sents])
+        for sent,(status,response) in zip(sents,responses):
+            self.assertEqual(status, 200)
+            self.assertEqual(response["sent"], sent)
+            expected = self.parser.trans_sent(sent)
+            if type(expected) == str:
+                self.assertEqual(response["error"], expected)
+            else:
+                self.assertEqual(response["translations"], [list(item) for item in expected])
+
+    def test_ambiguity_budget(self):
+        sent = "i saw the man in the house in the house"
+        (status,limited),(status,unlimited) = self.serve([{"sent": sent, "max_trees": 2}, {"sent": sent}])
+        (status,server_limited), = self.serve([{"sent": sent, "max_trees": 100}],max_trees=2) # limited by the server
+        self.assertTrue(limited["error"].startswith("AmbiguityError"))
+        self.assertIn("translations", unlimited)
+        self.assertTrue(server_limited["error"].startswith("AmbiguityError"))
+
+    def test_timeout(self):
+        (status,response), = self.serve([{"sent": "i saw the man"}],timeout=0)
+        self.assertEqual(status, 504)
+        self.assertEqual(response["error"], "Timeout")
+
+    def test_degraded(self):
+        """ a worker degrades a translation after its time limit """
+        init_worker(self.parser)
+        sent = "i saw the man in the house in the house"
+        (trans,hit),(full,nohit) = translate_batch([(sent,None,0),(sent,None,60)])
+        self.assertEqual((len(trans),hit), (1,["deadline"]))
+        self.assertEqual((full,nohit), (self.parser.trans_sent(sent),[]))
+
+    def test_bad_request(self):
+        self.assertEqual([status for status,response in self.serve([{"text": "i slept"}])], [400])
+
+    def test_content_length(self):
+        """ a missing or invalid Content-Length is rejected with 400, a body larger than max_body with 413 """
+        for content_length in ("","abc","-1"):
+            with self.subTest(content_length=content_length):
+                self.assertEqual([status for status,response in self.serve([{"sent": "i slept"}],content_length)], [400])
+        self.assertEqual([status for status,response in self.serve([{"sent": "i slept"*10}],max_body=20)], [413])
+        self.assertEqual([status for status,response in self.serve([{"sent": "i slept"}],max_body=20)], [200])
+
+if __name__ == '__main__':
+    unittest.main()
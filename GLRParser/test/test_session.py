@@ -0,0 +1,118 @@
+import sys, unittest, textwrap, os
+sys.path.append("../..")
+from GLRParser import Parser, ParseError, ParseTracer
+
+def translations(parser,result):
+    """ returns sorted translations of a parse """
+    tree = parser.trans_tree(parser.unify_tree(parser.make_tree(result)))
+    return sorted(parser.post_processor(trans) for trans,cost in tree.enumx())
+
+class PositionTracer(ParseTracer):
+    """ collects positions which are reduced """
+    def begin(self,parser,result):
+        super().begin(parser,result)
+        self.positions = []
+
+    def position(self,pos,active,edges):
+        self.positions.append(pos)
+
+class TestSession(unittest.TestCase):
+    grammar = """
+        %auto_dict true
+        S -> NP VP : NP VP
+        NP -> i :
+        NP -> the man : adam
+        NP -> the man who came : gelen adam
+        NP -> NP-1 in NP-2 : NP-2 -deki NP-1
+        NP -> U : U
+        VP -> saw NP : NP -ı gördüm
+        VP -> slept : uyudum
+    """
+
+    def setUp(self):
+        self.parser = Parser()
+        self.parser.parse_grammar(text=textwrap.dedent(self.grammar))
+        self.parser.compile()
+
+    def feed(self,sent):
+        session = self.parser.session()
+        for word in sent.split():
+            session.feed(word)
+        return session
+
+    def test_same_as_parse(self):
+        for sent in ["i saw the man", "the man who came slept", "i saw the man in the man who came", "i saw John"]:
+            with self.subTest(sent=sent):
+                expected = translations(self.parser,self.parser.parse(sent))
+                self.assertEqual(translations(self.parser,self.feed(sent).finish()), expected)
+
+    def test_viable(self):
+        session = self.parser.session()
+        self.assertTrue(session.feed("the"))
+        self.assertTrue(session.feed("man"))
+        self.assertTrue(session.feed("who")) # partial dictionary match
+        self.assertFalse(session.act_states[session.pos])
+        self.assertTrue(session.feed("came"))
+        self.assertTrue(session.feed("slept"))
+        session.finish()
+        session = self.parser.session()
+        for word in "i saw the man".split():
+            self.assertTrue(session.feed(word))
+        self.assertFalse(session.feed("slept"))
+        self.assertFalse(session.feed("the"))
+        with self.assertRaises(ParseError):
+            session.finish()
+
+    def test_expected(self):
+        session = self.parser.session()
+        session.feed("i")
+        self.assertEqual(session.expected(), {"saw","in","VP"}) # slept is a dictionary entry of VP
+        session.feed("saw")
+        self.assertIn("NP", session.expected())
+        self.assertNotIn("saw", session.expected())
+
+    def test_incremental(self):
+        """ each word reduces only the new position """
+        tracer = self.parser.tracer = PositionTracer()
+        session = self.parser.session()
+        self.assertEqual(tracer.positions, [0])
+        for word in "i saw the man".split():
+            session.feed(word)
+            self.assertEqual(tracer.positions[-1], session.pos)
+        self.assertEqual(tracer.positions, [0,1,2,3,4])
+        result = session.finish()
+        self.assertEqual(tracer.positions, [0,1,2,3,4])
+        self.assertEqual(result.words, ["i","saw","the","man","$"])
+
+class TestSessionGrammar(unittest.TestCase):
+    grm_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grm")
+
+    def test_main(self):
+        """ feeding words of sample sentences gives the same translations as parsing them """
+        cwd = os.getcwd()
+        os.chdir(self.grm_dir) # included grammar files are relative to the grammar directory
+        try:
+            parser = Parser()
+            parser.parse_grammar("main.grm")
+            parser.compile()
+        finally:
+            os.chdir(cwd)
+        with open(os.path.join(self.grm_dir, "main.in.txt"), "r", encoding="utf-8") as fin:
+            sents = [line.split("@")[0].strip() for line in fin if line.strip() and not line.startswith("#")]
+        for sent in sents[:100]:
+            with self.subTest(sent=sent):
+                try:
+                    expected = translations(parser,parser.parse(sent))
+                except ParseError as pe:
+                    expected = str(pe)
+                lattice = parser.make_lattice(sent)
+                session = parser.session()
+                for word,punct in zip(lattice.orig_words[:-1],lattice.puncts):
+                    session.feed(word,punct)
+                try:
+                    self.assertEqual(translations(parser,session.finish(lattice.puncts[-1])), expected)
+                except ParseError as pe:
+                    self.assertEqual(str(pe), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import sys, unittest, textwrap
+sys.path.append("../..")
+from GLRParser import Parser, Tree
+
+def catalan(num):
+    result = 1
+    for idx in range(num):
+        result = result * 2 * (2*idx+1) // (idx+2)
+    return result
+
+class TestSPPF(unittest.TestCase):
+    grammar = """
+        S -> NP VP
+        S -> S PP
+        NP -> i
+        NP -> the man
+        NP -> the house
+        NP -> NP PP
+        NP -> NP and NP
+        PP -> in NP
+        PP -> with NP
+        VP -> saw NP
+    """
+
+    def setUp(self):
+        self.parser = Parser()
+        self.parser.parse_grammar(text=textwrap.dedent(self.grammar))
+        self.parser.compile()
+
+    def test_shared_nodes(self):
+        """ a symbol node is shared by all stack edges of the symbol over the same span, packed alternatives are not repeated """
+        parser = self.parser
+        result = parser.parse("i saw the man in the house with the man")
+        self.assertEqual(len(result.edges[0,"S",10]), 3) # S -> S PP (2 splits), S -> NP VP
+        for node,alts in result.edges.items():
+            self.assertEqual(len(alts), len({repr(alt) for alt in alts}), node)
+        self.assertEqual(result.count_trees(), 5)
+        self.assertEqual(len(parser.make_tree(result).left[0]), 3)
+
+    def test_shared_subtrees(self):
+        """ a node of the forest is made into a single list of alternatives, shared by all its parents """
+        parser = self.parser
+        result = parser.parse("i saw the man" + " in the house"*10)
+        tree = parser.make_tree(result)
+        shared = dict() # maps (head,start,end) to ids of alternative lists
+        todo = [tree]
+        for subtree in todo:
+            for item in subtree.left:
+                if type(item) == list:
+                    ids = shared.setdefault((item[0].head,item[0].start,item[0].end),set())
+                    if id(item) not in ids:
+                        ids.add(id(item))
+                        todo.extend(item)
+        self.assertTrue(all(len(ids) == 1 for ids in shared.values()))
+        self.assertEqual(shared.keys(), {(head,start,end) for start,head,end in result.edges if start != -1 and type(head) == str})
+
+    def test_shared_unification(self):
+        """ each shared sub-tree is unified once and equal feature dicts of the unified tree are the same (interned) object """
+        parser = Parser()
+        parser.parse_grammar(text=textwrap.dedent("""
+            S -> NP VP : NP VP
+            NP -> i : ben [num=sg]
+            NP -> the house : ev [num=sg]
+            NP -> the houses : evler [num=pl]
+            NP -> NP PP : PP NP
+            PP -> in NP() : NP() -de
+            VP -> saw NP(num=*onum) : NP() -ı gördüm
+            VP -> VP PP : PP VP
+        """))
+        parser.compile()
+        sent = "i saw the house" + " in the houses in the house"*3
+        tree = parser.make_tree(parser.parse(sent))
+        calls = []
+        unify_tree_int = parser.unify_tree_int
+        def count_calls(tree,*args):
+            calls.append(id(tree))
+            return unify_tree_int(tree,*args)
+        parser.unify_tree_int = count_calls
+        utree = parser.unify_tree(tree)
+        self.assertEqual(len(calls), len(set(calls)))
+        feats = dict() # maps contents of feature dicts to their ids
+        todo = [utree]
+        for subtree in todo:
+            feats.setdefault(tuple(sorted(subtree.feat.items())),set()).add(id(subtree.feat))
+            for item in subtree.left:
+                if type(item) == list:
+                    todo.extend(item)
+        self.assertTrue(all(len(ids) == 1 for ids in feats.values()))
+        del parser.unify_tree_int
+        self.assertEqual(parser.trans_sent(sent), parser.trans_sent(sent)) # rule features are not modified
+
+    def test_shared_translation(self):
+        """ each shared sub-tree is translated once for the same features, without modifying the unified tree """
+        parser = Parser()
+        parser.parse_grammar(text=textwrap.dedent("""
+            S -> NP VP : NP VP
+            S -> S PP : PP S {3}
+            NP -> i : ben
+            NP -> the man : adam
+            NP -> the house : ev
+            NP -> NP-1 PP : PP NP-1 {1}
+            PP -> in NP : NP -de
+            VP -> saw NP : NP -ı gördüm
+        """))
+        parser.compile()
+        result = parser.parse("i saw the man" + " in the house"*6)
+        utree = parser.unify_tree(parser.make_tree(result))
+        right = utree.pformatr()
+        calls = []
+        trans_node = parser.trans_node
+        def count_calls(tree,*args):
+            calls.append(id(tree))
+            return trans_node(tree,*args)
+        parser.trans_node = count_calls
+        ttree = parser.trans_tree(utree)
+        self.assertEqual(len(calls), len(set(calls)))
+        self.assertLess(len(calls), sum(len(alts) for alts in result.edges.values()))
+        self.assertEqual(utree.pformatr(), right)
+        del parser.trans_node
+        self.assertEqual(len(ttree.enum_forest()), len(set(ttree.enumx())))
+
+    def test_deep_tree(self):
+        """ a tree deeper than the recursion limit can be made """
+        parser = Parser()
+        parser.parse_grammar(text="S -> L\nL -> L x\nL -> x\n")
+        parser.compile()
+        tree = parser.make_tree(parser.parse("x "*(sys.getrecursionlimit()*2)))
+        depth = 0
+        while tree.left and type(tree.left[0]) == list:
+            tree = tree.left[0][0]
+            depth += 1
+        self.assertEqual(depth, sys.getrecursionlimit()*2+1)
+
+    def test_deep_kbest(self):
+        """ k-best translations of a translated forest deeper than the recursion limit can be extracted """
+        def chain(num):
+            alts = [Tree("L",None,right=["y"])]
+            for idx in range(num):
+                alts = [Tree("L",None,right=[alts,"y"]),Tree("L",None,right=[alts,"z"],cost=1)]
+            return Tree("S",None,right=[alts])
+        tree = chain(5)
+        self.assertEqual(tree.kbest(5), sorted(tree.enumx(),key=lambda item:item[1])[:5])
+        num = sys.getrecursionlimit()*2
+        trans = chain(num).kbest(3)
+        self.assertEqual([cost for sent,cost in trans], [num+1,num+2,num+2])
+        self.assertEqual(trans[0][0], " ".join(["y"]*(num+1)))
+        self.assertEqual(trans[1][0], "y z" + " y"*(num-1))
+
+    def test_tree_count(self):
+        """ number of derivations of n prepositional phrases is catalan(n+1) """
+        for num in range(1,5):
+            with self.subTest(num=num):
+                result = self.parser.parse("i saw the man" + " in the house"*num)
+                self.assertEqual(result.count_trees(), catalan(num+1))
+
+    def test_polynomial(self):
+        """ size of the forest is polynomial in sentence length, whereas number of derivations is exponential """
+        sent = "i saw the man" + " in the house and the man"*16
+        result = self.parser.parse(sent)
+        size = sum(len(alts) for alts in result.edges.values())
+        length = len(sent.split())
+        self.assertLess(size, length**2)
+        self.assertGreater(result.count_trees(), 10**16)
+
+class TestEpsilon(unittest.TestCase):
+    grammar = """
+        S -> Adv NP Adv VP Adv : Adv NP Adv VP Adv
+        Adv -> : 
+        Adv -> quickly : hızlıca
+        Adv -> Adv Adv : Adv Adv
+        NP -> i :
+        NP -> Det man : Det adam
+        Det -> :
+        Det -> the :
+        VP -> slept : uyudum
+    """
+
+    def setUp(self):
+        self.parser = Parser()
+        self.parser.parse_grammar(text=textwrap.dedent(self.grammar))
+        self.parser.compile()
+
+    def test_shared_epsilon(self):
+        """ empty derivations are the precomputed epsilon nodes, no empty subtrees are built while parsing """
+        parser = self.parser
+        result = parser.parse("the man quickly slept")
+        self.assertEqual([node for node in result.edges if node[0] == node[2] != -1], [])
+        self.assertIs(result.edges[-1,"Adv",-1], parser.epsilon[-1,"Adv",-1])
+        self.assertEqual(result.format_edge((-1,"Det",-1)), "Det() -> ")
+        self.assertEqual(sorted(parser.epsilon), [(-1,"Adv",-1),(-1,"Det",-1)])
+        self.assertEqual(parser.trans_sent("man slept")[0][0], "adam uyudum")
+
+    def test_empty_input(self):
+        parser = Parser()
+        parser.parse_grammar(text="S -> A B : B A\nA -> a : x\nA -> :\nB -> b : y\nB -> :\n")
+        parser.compile()
+        result = parser.parse("")
+        self.assertEqual(result.top_edge, (-1,"S",-1))
+        self.assertEqual(parser.make_tree(result).format(), "S(A() B())")
+        self.assertEqual(parser.trans_sent("b")[0][0], "y")
+
+if __name__ == '__main__':
+    unittest.main()
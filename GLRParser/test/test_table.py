@@ -0,0 +1,84 @@
+import sys, unittest, textwrap, tempfile, os, pickle
+sys.path.append("../..")
+from GLRParser import Parser
+
+class TestParseTable(unittest.TestCase):
+    grammar = """
+        S -> NP VP
+        S -> S PP
+        NP -> i
+        NP -> the man
+        NP -> the telescope
+        NP -> the house
+        NP -> NP PP
+        PP -> in NP
+        PP -> with NP
+        VP -> saw NP
+        VP -> saw
+        PPS ->
+    """
+    sent = "i saw the man in the house with the telescope"
+
+    def setUp(self):
+        parser = Parser()
+        parser.parse_grammar(text=textwrap.dedent(self.grammar))
+        parser.compile()
+        self.parser = parser
+
+    def test_dfa_view(self):
+        table = self.parser.table
+        items = dict(self.parser.dfa.items())
+        self.assertEqual(len(items), len(self.parser.dfa))
+        for (state,symbol),nstate in items.items():
+            self.assertEqual(table.goto(state,table.symbols.ids[symbol]), nstate)
+            self.assertEqual(self.parser.dfa[state,symbol], nstate)
+        for state in range(table.num_states):
+            for symbol in table.symbols.names:
+                self.assertEqual(table.goto_symbol(state,symbol), items.get((state,symbol),-1))
+        self.assertEqual(table.goto_symbol(0,"unknown"), -1)
+        self.assertNotIn((0,"unknown"), self.parser.dfa)
+
+    def test_unknown_state(self):
+        """ views keep dict semantics for states out of range """
+        num_states = self.parser.table.num_states
+        self.assertNotIn((num_states+99,"i"), self.parser.dfa)
+        self.assertNotIn((-1,"i"), self.parser.dfa)
+        self.assertEqual(self.parser.dfa.get((num_states,"i"),-1), -1)
+        self.assertIsNone(self.parser.reduce.get(num_states+99))
+        self.assertIsNone(self.parser.ereduce.get(num_states+99))
+        self.assertNotIn(num_states, self.parser.reduce)
+
+    def test_reduce_view(self):
+        table = self.parser.table
+        for state in range(table.num_states):
+            self.assertEqual(self.parser.reduce.get(state,set()), set(table.reductions(state)))
+            self.assertEqual(self.parser.ereduce.get(state,set()), set(table.ereductions(state)))
+
+    def test_save_load(self):
+        result = self.parser.parse(self.sent)
+        exp = self.parser.make_tree(result).format()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "test.grmc")
+            self.parser.save_grammar(fname)
+            parser = Parser()
+            parser.load_grammar(fname)
+        result = parser.parse(self.sent)
+        self.assertEqual(parser.make_tree(result).format(), exp)
+
+    def test_load_dict_tables(self):
+        """ grammars saved with dict tables (dfa, reduce, ereduce) are still loaded """
+        result = self.parser.parse(self.sent)
+        exp = self.parser.make_tree(result).format()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "test.grmc")
+            with open(fname,"wb") as fout:
+                for obj in (self.parser.rules, self.parser.trie, self.parser.post_processor.suff_dict,
+                    dict(self.parser.dfa), dict(self.parser.reduce), dict(self.parser.ereduce), self.parser.ruledict):
+                    pickle.dump(obj, fout)
+            parser = Parser()
+            parser.load_grammar(fname)
+        result = parser.parse(self.sent)
+        self.assertEqual(parser.make_tree(result).format(), exp)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys, unittest, textwrap
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append("../..")
+from GLRParser import Parser
+
+class TestThreads(unittest.TestCase):
+    grammar = """
+        S -> NP VP : NP VP
+        S -> S PP : PP S
+        NP -> i : ben
+        NP -> the man : adam
+        NP -> the house : ev
+        NP -> NP-1 PP : PP NP-1
+        PP -> in NP : NP -de
+        VP -> saw NP : NP -ı gördüm
+        VP -> slept : uyudum
+    """
+    sents = ["i saw the man", "the man slept", "i saw the man in the house", "the man in the house slept in the house", "i saw the house in the house"]
+
+    def setUp(self):
+        self.parser = Parser()
+        self.parser.parse_grammar(text=textwrap.dedent(self.grammar))
+        self.parser.compile()
+
+    def test_interleaved(self):
+        """ results of parses are independent of each other """
+        parser = self.parser
+        result1 = parser.parse(self.sents[2])
+        result2 = parser.parse(self.sents[1])
+        session = parser.session()
+        session.feed("i")
+        self.assertEqual(parser.make_tree(result1).format(), parser.make_tree(parser.parse(self.sents[2])).format())
+        self.assertEqual(parser.make_tree(result2).format(), parser.make_tree(parser.parse(self.sents[1])).format())
+        session.feed("slept")
+        self.assertEqual(parser.make_tree(session.finish()).format(), parser.make_tree(parser.parse("i slept")).format())
+
+    def test_threads(self):
+        """ a parser translates sentences in several threads as it does serially """
+        sents = self.sents * 20
+        expected = [self.parser.trans_sent(sent) for sent in sents]
+        with ThreadPoolExecutor(8) as pool:
+            self.assertEqual(list(pool.map(self.parser.trans_sent,sents)), expected)
+
+    def test_recompile(self):
+        """ a parse uses the compiled grammar current when it starts """
+        parser = self.parser
+        session = parser.session()
+        for word in "the man".split():
+            session.feed(word)
+        parser.add_rules("VP -> walked : yürüdüm")
+        session.feed("slept")
+        self.assertEqual(parser.make_tree(session.finish()).format(), "S(NP(the man) VP(slept))")
+        self.assertEqual(parser.trans_sent("the man walked")[0][0], "adam yürüdüm")
+
+    def test_remove_rules(self):
+        """ a parse started before rules are removed (and the rules are renumbered) uses the rules current when it starts """
+        parser = Parser()
+        parser.parse_grammar(text=textwrap.dedent(self.grammar) + "X -> x : x\nVP -> Adv slept Adv : Adv uyudum Adv\nAdv -> quickly : hızlıca\nAdv -> :\n")
+        parser.compile()
+        session = parser.session()
+        session.feed("i")
+        parser.remove_rules("X -> x : x")
+        session.feed("slept")
+        self.assertEqual(sorted(parser.trans_tree(parser.unify_tree(parser.make_tree(session.finish()))).enumx()), [("ben uyudum",3),("ben uyudum",5)])
+        self.assertEqual(parser.trans_sent("i slept")[0][0], "ben uyudum")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import sys, unittest, textwrap, logging
+sys.path.append("../..")
+from GLRParser import Parser, ParseTracer
+
+class StepTracer(ParseTracer):
+    """ collects parse steps instead of logging them """
+    def begin(self,parser,result):
+        super().begin(parser,result)
+        self.steps = []
+
+    def reduce(self,edge,ruleno,rulepos):
+        self.steps.append(("reduce",ruleno,rulepos))
+
+    def add_edge(self,edge,ptree):
+        self.steps.append(("edge",edge[1],edge[0],edge[2]))
+
+    def shift(self,edge,token):
+        self.steps.append(("shift",edge[2],edge[0],edge[3]))
+
+class TestTracer(unittest.TestCase):
+    grammar = """
+        S -> NP VP : NP VP
+        NP -> i :
+        NP -> the man : adam
+        NP -> NP-1 in NP-2 : NP-2 -deki NP-1
+        VP -> saw NP : NP -ı gördüm
+    """
+    sent = "i saw the man in the man"
+
+    def setUp(self):
+        self.parser = Parser()
+        self.parser.parse_grammar(text=textwrap.dedent(self.grammar))
+        self.parser.compile()
+
+    def test_steps(self):
+        tracer = self.parser.tracer = StepTracer()
+        result = self.parser.parse(self.sent)
+        self.assertIs(tracer.result, result)
+        self.assertIn(("shift","man",3,4), tracer.steps)
+        self.assertIn(("edge","NP",2,7), tracer.steps)
+        self.assertIn(("edge","S",0,7), tracer.steps)
+        self.assertEqual(
+            len([step for step in tracer.steps if step[0] == "edge"]),
+            sum(len(alts) for node,alts in result.edges.items() if type(node[1]) == str and type(alts[0][0]) == int))
+
+    def test_same_edges(self):
+        """ edges do not depend on tracing """
+        edges = dict(self.parser.parse(self.sent).edges)
+        self.parser.tracer = StepTracer()
+        self.assertEqual(dict(self.parser.parse(self.sent).edges), edges)
+
+    def test_debug_logging(self):
+        """ steps are logged by a default tracer if debug logging is enabled """
+        with self.assertLogs(level=logging.DEBUG) as logs:
+            self.parser.parse(self.sent)
+        self.assertTrue(any(record.startswith("DEBUG:root:appending edge") for record in logs.output))
+
+if __name__ == '__main__':
+    unittest.main()
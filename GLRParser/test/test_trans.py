@@ -98,10 +98,10 @@ class TestTrans(unittest.TestCase):
         
 
         parser.compile()
-        parser.parse(self.sent)
+        result = parser.parse(self.sent)
 
         self.parser = parser
-        self.tree = parser.make_tree()
+        self.tree = parser.make_tree(result)
         self.ttree = parser.trans_tree(self.tree)
         self.maxDiff = None
 
@@ -137,10 +137,10 @@ class TestTransUnify(unittest.TestCase):
         parser.parse_grammar(text=grammar)
 
         parser.compile()
-        parser.parse(self.sent)
+        result = parser.parse(self.sent)
 
         self.parser = parser
-        self.tree = parser.make_tree()
+        self.tree = parser.make_tree(result)
         self.ttree = parser.trans_tree(self.tree)
         self.maxDiff = None
 
@@ -152,8 +152,8 @@ def genTrans():
 
     parser.compile()
 
-    parser.parse(TestTrans.sent)
-    tree = parser.make_tree()
+    result = parser.parse(TestTrans.sent)
+    tree = parser.make_tree(result)
     ttree = parser.trans_tree(tree)
     print(ttree.formatr())
     print(ttree.pformatr())
@@ -172,8 +172,8 @@ def genTransUnify():
 
     parser.compile()
 
-    parser.parse(TestTransUnify.sent)
-    tree = parser.make_tree()
+    result = parser.parse(TestTransUnify.sent)
+    tree = parser.make_tree(result)
     utree = parser.unify_tree(tree)
     print(utree.pformat_ext())
     ttree = parser.trans_tree(utree)
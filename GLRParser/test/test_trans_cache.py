@@ -0,0 +1,74 @@
+import sys, unittest, textwrap, pickle
+sys.path.append("../..")
+from GLRParser import Parser, TransCache
+
+class TestTransCache(unittest.TestCase):
+    grammar = """
+        S -> NP(numb,pers) VP : NP VP(numb,pers)
+        NP -> i : ben [numb=sing,pers=1]
+        NP -> we : biz [numb=plur,pers=1]
+        NP -> he : o [numb=sing,pers=3]
+        VP -> sleep : V [pers=!3]
+        VP -> sleeps : V [numb=sing,pers=3]
+        VP -> dream : W
+        VP -> wake : X
+        V -> : uyurum [numb=sing,pers=1]
+        V -> : uyuruz [numb=plur,pers=1]
+        V -> : uyur [pers=3]
+        W -> : düş V
+        X -> : uyanırız [numb=plur]
+    """
+    cases = [("i sleep","ben uyurum"),("we sleep","biz uyuruz"),("he sleeps","o uyur"),("i dream","ben düş uyurum")]
+
+    def make_parser(self,feature_space=False):
+        parser = Parser(feature_space=feature_space)
+        parser.parse_grammar(text=textwrap.dedent(self.grammar))
+        parser.compile()
+        return parser
+
+    def test_hits(self):
+        """ generation trees of right-only non-terminals are cached across sentences, with the same translations """
+        for feature_space in (False,True):
+            with self.subTest(feature_space=feature_space):
+                parser = self.make_parser(feature_space)
+                for sent,trans in self.cases:
+                    self.assertEqual([item[0] for item in parser.trans_sent(sent)], [trans])
+                misses = parser.trans_cache.misses
+                self.assertEqual(parser.trans_cache.hits, 1) # V of "i dream" is generated as V of "i sleep"
+                for sent,trans in self.cases:
+                    self.assertEqual([item[0] for item in parser.trans_sent(sent)], [trans])
+                self.assertEqual(parser.trans_cache.misses, misses)
+
+    def test_error(self):
+        """ unification errors are cached as well """
+        parser = self.make_parser()
+        error = parser.trans_sent("i wake")
+        self.assertTrue(error.startswith("ParseError: "))
+        hits = parser.trans_cache.hits
+        self.assertEqual(parser.trans_sent("i wake"), error)
+        self.assertGreater(parser.trans_cache.hits, hits)
+
+    def test_lru(self):
+        """ least recently used entries are evicted, and the cache is cleared when the rules change """
+        parser = self.make_parser()
+        parser.trans_cache.max_size = 1
+        for sent,trans in self.cases:
+            self.assertEqual([item[0] for item in parser.trans_sent(sent)], [trans])
+        self.assertEqual(len(parser.trans_cache.entries), 1)
+        parser.add_rules("NP -> you : sen [numb=sing,pers=2]")
+        self.assertEqual(len(parser.trans_cache.entries), 0)
+
+    def test_key(self):
+        """ feature dicts with references to sub-trees are not cached """
+        self.assertIsNone(TransCache.key("V",{"head":[]},None))
+        self.assertEqual(TransCache.key("V",{"numb":"sing"},None), TransCache.key("V",{"numb":"sing"},None))
+
+    def test_pickle(self):
+        parser = self.make_parser()
+        parser.trans_sent("i sleep")
+        loaded = pickle.loads(pickle.dumps(parser.trans_cache))
+        self.assertEqual(len(loaded.entries), 0)
+        self.assertEqual(loaded.misses, parser.trans_cache.misses)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -85,8 +85,8 @@ class TestUnifyBinary(unittest.TestCase):
         for idx,(sent,out) in enumerate(self.cases):
             with self.subTest(idx=idx,sent=sent):
                 try:
-                    self.parser.parse(sent)
-                    tree = self.parser.make_tree()
+                    result = self.parser.parse(sent)
+                    tree = self.parser.make_tree(result)
                     tree2 = self.parser.unify_tree(tree)
                     out = tree2.pformat_ext()
                 except UnifyError as ue:
@@ -283,8 +283,8 @@ class TestUnify(unittest.TestCase):
         for idx,(sent,out) in enumerate(self.cases):
             with self.subTest(idx=idx,sent=sent):
                 try:
-                    self.parser.parse(sent)
-                    tree = self.parser.make_tree()
+                    result = self.parser.parse(sent)
+                    tree = self.parser.make_tree(result)
                     tree2 = self.parser.unify_tree(tree)
                     out = tree2.pformat_ext()
                 except UnifyError as ue:
@@ -303,8 +303,8 @@ def gen_TestUnify():
     for sent in sents:
         print(sent)
         try:
-            parser.parse(sent)
-            tree = parser.make_tree()
+            result = parser.parse(sent)
+            tree = parser.make_tree(result)
             tree2 = parser.unify_tree(tree)
             print(tree2.pformat_ext())
         except UnifyError as ue:
@@ -322,8 +322,8 @@ def gen_TestUnifyBinary():
     for sent in sents:
         print(sent)
         try:
-            parser.parse(sent)
-            tree = parser.make_tree()
+            result = parser.parse(sent)
+            tree = parser.make_tree(result)
             tree2 = parser.unify_tree(tree)
             print(tree2.pformat_ext())
         except UnifyError as ue:
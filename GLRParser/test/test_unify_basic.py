@@ -1,6 +1,7 @@
 import sys, unittest, textwrap
 sys.path.append("../..")
 from GLRParser import Parser, UnifyError
+from GLRParser.grammar import FParam
 
 class Param(dict):
     pass
@@ -136,6 +137,27 @@ class TestUnifyBasic(unittest.TestCase):
                    result = None
                self.assertEqual(result, exp_down)
 
+    def test_compiled_fparam(self):
+        """ parameters of a grammar are compiled into filters (FParam.up and FParam.down) giving the same results as a plain dict """
+        def unify(func,*args):
+            try:
+                return func(*args)
+            except UnifyError as ue:
+                return str(ue)
+        for dst,param,src,exp_up,exp_down in self.cases:
+            if param is None:
+                continue
+            with self.subTest(dst=dst,param=param,src=src):
+                checklist = {key:val for key,val in dst.items() if val[0] in '?!'}
+                _dst = {key:val for key,val in dst.items() if val[0] not in '?!'}
+                param_type = [key for key,val in param.items() if key in '+-' ]
+                fparam = FParam([(key,val) for key,val in param.items() if key not in '+-'])
+                fparam.param_type = param_type[0] if param_type else None
+                param = Param(fparam)
+                param.param_type = fparam.param_type
+                fparam.compile()
+                self.assertEqual(unify(Parser.unify_up,_dst,fparam,src), unify(Parser.unify_up,_dst,param,src))
+                self.assertEqual(unify(Parser.unify_down,_dst,fparam,src,checklist), unify(Parser.unify_down,_dst,param,src,checklist))
 
 if __name__== '__main__':
     unittest.main()
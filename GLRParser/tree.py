@@ -4,6 +4,7 @@
 
 This file define classes:
     Tree: node of a parse tree
+    KBest: lazy k-best extraction of translations
       
 """
 if len(__name__.split("."))>1: # called within a package
@@ -29,6 +30,8 @@ def uid(obj):
     return uid_cnt
 
 from io import StringIO
+from itertools import islice
+import heapq
 def str_items_cost(items):
     out = StringIO()
     print_items_cost(items, out)
@@ -145,23 +148,23 @@ class Tree:
             for item in self.left
         )
 
-    def dot_format_int(self,left=True):
-        """ return single-line formatted string representation of a tree """
+    def dot_format_int(self,left=True,words=empty_list):
+        """ return single-line formatted string representation of a tree, words of the input are shown as tooltips of NT nodes """
         return "\n".join(
             '{} [label="{}"]\n{} -> {}'.format(id(item),item,id(self),id(item)) if isinstance(item, str)
-            else "\n".join(alt.dot_format_int(left) for alt in item) + "\n"
+            else "\n".join(alt.dot_format_int(left,words) for alt in item) + "\n"
                 + "\n".join('{} [label="#{}",tooltip="{}"]\n{} -> {}'.format(
                         id(alt), alt.ruleno,str(alt.rule).replace('"','')+"\\n"+format_feat(alt.feat), id(item), id(alt)
                     ) for alt in item) + "\n"
-                + '{} [label="{}[{}:{}]",tooltip="{}"]\n{} -> {}'.format(id(item),item[0].head,item[0].start,item[0].end," ".join(Tree.words[item[0].start:item[0].end]),id(self),id(item))
+                + '{} [label="{}[{}:{}]",tooltip="{}"]\n{} -> {}'.format(id(item),item[0].head,item[0].start,item[0].end," ".join(words[item[0].start:item[0].end]),id(self),id(item))
             for item in (self.left if left else self.right)
         )
 
-    def dot_format(self):
-        return "digraph {{\n{}\n}}".format(self.dot_format_int())
+    def dot_format(self,words=empty_list):
+        return "digraph {{\n{}\n}}".format(self.dot_format_int(True,words))
 
-    def dot_formatr(self):
-        return "digraph {{\n{}\n}}".format(self.dot_format_int(False))
+    def dot_formatr(self,words=empty_list):
+        return "digraph {{\n{}\n}}".format(self.dot_format_int(False,words))
 
     def min_format(self):
         """ return single-line formatted string representation of a tree """
@@ -507,6 +510,56 @@ class Tree:
                         else:
                             yield first or rest, cost+fcost+1 # 1 for penalizing deep trees
 
+    def enum_best(tree):
+        """ a generator for enumerating translations in a parse forest WITH corresponding costs, cheapest first (see KBest)
+
+        yields the translations of enumx sorted (stably) by cost, a translation is only extracted when it is requested
+        """
+        kbest = KBest()
+        root = [tree]
+        j = 0
+        deriv = kbest.kth(root,0)
+        while deriv is not None:
+            yield kbest.string(root,j), deriv[0]
+            j += 1
+            deriv = kbest.kth(root,j)
+
+    def kbest(tree,k):
+        """ returns [(translation,cost)*] of the k cheapest translations in a parse forest, i.e. sorted enumx()[:k] without enumerating the rest """
+        return list(islice(tree.enum_best(),k))
+
+    def trans_forest(tree,memo=None):
+        """ returns [(tokens,cost)*] of the distinct translations of a tree, where tokens is a tuple of terminals
+
+        costs are as in enumx, and the pairs are in the order of their first occurrence in enumx. The pairs of a list of alternatives
+        are computed once and shared by all trees referring to it via memo (maps id of a list to its pairs), suffixes of the right side
+        are built once per tree instead of once per alternative at each position
+        """
+        if memo is None:
+            memo = dict()
+        suffixes = [((),tree.cost)]
+        for item in reversed(tree.right):
+            if isinstance(item, str):
+                suffixes = [((item,)+rest,cost) for rest,cost in suffixes]
+                continue
+            firsts = memo.get(id(item))
+            if firsts is None:
+                pairs = dict()
+                for alt in item:
+                    for pair in alt.trans_forest(memo):
+                        pairs[pair] = None
+                firsts = memo[id(item)] = list(pairs)
+            pairs = dict()
+            for rest,cost in suffixes:
+                for first,fcost in firsts:
+                    pairs[first+rest, cost+fcost+1] = None # 1 for penalizing deep trees
+            suffixes = list(pairs)
+        return suffixes
+
+    def enum_forest(tree):
+        """ returns [(translation,cost)*] of the distinct translations in a parse forest, i.e. enumx() without duplicates (see trans_forest) """
+        return [(" ".join(tokens),cost) for tokens,cost in tree.trans_forest()]
+
     #def enum_results(nodes):
     #    results = []
     #    stack = []
@@ -534,3 +587,126 @@ class Tree:
     #        results.append(out)
     #    return results
 
+class KBest:
+    """ Lazy k-best extraction of translations of a translated parse forest (Huang & Chiang, Algorithm 3)
+
+    a list of alternative trees is a node, a tree is a hyperedge to the lists in its right side, a derivation of a tree is a vector of
+    indices into the sorted derivations of its lists, so the j-th cheapest derivation of a node is found by expanding only the
+    neighbours of the derivations popped before, from a priority queue of candidates of the node
+
+    cost of a derivation is as in Tree.enumx: cost of the tree plus the costs of its sub-derivations plus 1 for each of them (for
+    penalizing deep trees). Derivations of the same cost are ordered as they are enumerated by enumx: by the index of the alternative,
+    then by the sub-derivations from the last item of the right side to the first, which is the key of a derivation
+
+    data:
+        nodes : maps id of a list of alternatives to (list,derivations,candidates,seen,sub-nodes,todo), where derivations are the sorted
+            derivations (cost,key,alternative index,vector) found so far, candidates a heap of derivations, seen the (index,vector)
+            pushed to it, sub-nodes the lists of alternatives in the right side of each alternative and todo the (index,vector)
+            to be pushed to candidates before the next derivation is popped
+        strings : maps (id of a list,j) to the translation of its j-th derivation
+    """
+    def __init__(self):
+        self.nodes = dict()
+        self.strings = dict()
+
+    def derivation(self,node,idx,vector):
+        """ internal: returns derivation of the alternative idx of a node with the sub-derivations in vector, None if one does not exist
+
+        the sub-derivations must be resolved (see resolve) before
+        """
+        cost = node[0][idx].cost
+        keys = []
+        for item,j in zip(node[4][idx],vector):
+            derivs = self.nodes[id(item)][1]
+            if j >= len(derivs):
+                return None
+            deriv = derivs[j]
+            cost += deriv[0] + 1 # 1 for penalizing deep trees
+            keys.append(deriv[1])
+        keys.reverse()
+        return cost, (idx,tuple(keys)), idx, vector
+
+    def resolved(self,alts,j):
+        """ internal: returns True if the j-th derivation of a list of alternatives is found, or it is known that there are less """
+        node = self.nodes.get(id(alts))
+        return node is not None and (j < len(node[1]) or not node[2] and not node[5])
+
+    def resolve(self,alts,j):
+        """ internal: finds derivations of a list of alternatives up to the j-th one, returns (list,j') of a sub-node whose j'-th
+        derivation must be resolved first, or None when done
+
+        derivations of the alternatives to be pushed to the candidates are kept in the todo list of the node, so that resolving
+        is continued where it is left after the sub-node is resolved
+        """
+        node = self.nodes.get(id(alts))
+        if node is None:
+            subnodes = [[item for item in tree.right if type(item) is not str] for tree in alts]
+            node = self.nodes[id(alts)] = (alts,[],[],set(),subnodes,[(idx,(0,)*len(items)) for idx,items in enumerate(subnodes)])
+        alts, derivs, candidates, seen, subnodes, todo = node
+        while len(derivs) <= j:
+            while todo:
+                idx, vector = todo[-1]
+                for item,k in zip(subnodes[idx],vector):
+                    if not self.resolved(item,k):
+                        return item, k
+                    if k >= len(self.nodes[id(item)][1]): # there is no such sub-derivation
+                        break
+                todo.pop()
+                deriv = self.derivation(node,idx,vector)
+                if deriv is not None:
+                    heapq.heappush(candidates,deriv)
+            if not candidates:
+                return None
+            derivs.append(heapq.heappop(candidates))
+            cost, key, idx, vector = derivs[-1]
+            for pos in range(len(vector)): # neighbours of the derivation are resolved only when the next one is requested
+                succ = vector[:pos] + (vector[pos]+1,) + vector[pos+1:]
+                if (idx,succ) not in seen:
+                    seen.add((idx,succ))
+                    todo.append((idx,succ))
+        return None
+
+    def kth(self,alts,j):
+        """ returns j-th cheapest derivation (cost,key,alternative index,vector) of a list of alternative trees, None if there are less
+
+        sub-nodes are resolved by an explicit stack (not recursively), so forests deeper than the recursion limit are supported
+        """
+        stack = [(alts,j)]
+        while stack:
+            request = self.resolve(*stack[-1])
+            if request is None:
+                stack.pop()
+            else:
+                stack.append(request)
+        derivs = self.nodes[id(alts)][1]
+        return derivs[j] if j < len(derivs) else None
+
+    def string(self,alts,j):
+        """ returns translation of the j-th derivation of a list of alternatives, joined as in Tree.enumx
+
+        translations of sub-derivations are made first by an explicit stack, as in kth
+        """
+        stack = [(alts,j)]
+        while stack:
+            alts, j = stack[-1]
+            if (id(alts),j) in self.strings:
+                stack.pop()
+                continue
+            node = self.nodes[id(alts)]
+            cost, key, idx, vector = node[1][j]
+            missing = [(item,k) for item,k in zip(node[4][idx],vector) if (id(item),k) not in self.strings]
+            if missing:
+                stack.extend(missing)
+                continue
+            pos = len(vector)
+            trans = ""
+            for item in reversed(alts[idx].right):
+                if isinstance(item, str):
+                    trans = item + " " + trans if trans else item
+                else:
+                    pos -= 1
+                    first = self.strings[id(item),vector[pos]]
+                    trans = first + " " + trans if first and trans else first or trans
+            self.strings[id(alts),j] = trans
+            stack.pop()
+        return self.strings[id(alts),j]
@@ -0,0 +1,35 @@
+""" measures grammar compile time (Parser.compile) of sample grammars
+
+usage: python bench_compile.py [-j workers] [package directory] [grammar file]*
+
+package directory is the directory containing GLRParser package (default ".."), so that a different version
+(e.g. a git worktree of an earlier commit) can be measured for before/after comparison
+-j workers compiles with a pool of worker processes, i.e. Parser.compile(workers=workers)
+"""
+import sys, os, time
+
+args = sys.argv[1:]
+workers = None
+if args[:1] == ["-j"]:
+    workers = int(args[1])
+    args = args[2:]
+package_dir = os.path.abspath(args[0] if args else "..")
+sys.path.insert(0,package_dir)
+
+from GLRParser import Parser
+
+grm_dir = os.path.join(package_dir,"GLRParser","grm")
+grammars = args[1:] or ["main.grm","german.grm","tenses.grm"]
+repeat = 5
+
+os.chdir(grm_dir) # included grammar files are relative to the grammar directory
+for fname in grammars:
+    best = None
+    for idx in range(repeat):
+        parser = Parser()
+        parser.parse_grammar(fname)
+        start = time.perf_counter()
+        parser.compile(workers=workers) if workers else parser.compile()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best,elapsed)
+    print("{:12} rules: {:6d} states: {:6d} compile: {:.4f}s".format(fname, len(parser.rules), len(set(parser.dfa.values()))+1, best))
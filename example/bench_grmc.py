@@ -0,0 +1,75 @@
+""" compares load times of a compiled grammar in binary format (.grmc) and older pickle stream formats
+
+usage: python bench_grmc.py [grammar file] [number of synthetic dictionary entries]
+"""
+import sys, os, time, pickle, tempfile
+sys.path.append("..")
+
+from GLRParser import Parser, ParseError
+
+def make_dict_grammar(fname,count):
+    """ returns text of a grammar including fname with count synthetic dictionary entries """
+    lines = ["%include {}".format(os.path.basename(fname)), "%auto_dict true"]
+    for idx in range(count):
+        lines.append("%form N word{},word{}s".format(idx,idx))
+        lines.append("$N -> $word{} : kelime{}".format(idx,idx))
+    return "\n".join(lines) + "\n"
+
+def save_legacy(parser,fname):
+    """ saves in the oldest pickle stream format, with dfa, reduce and ereduce as dicts """
+    with open(fname,"wb") as fout:
+        pickle.dump(list(parser.rules), fout)
+        pickle.dump(parser.trie, fout)
+        pickle.dump(parser.post_processor.suff_dict, fout)
+        pickle.dump(dict(parser.dfa), fout)
+        pickle.dump(dict(parser.reduce), fout)
+        pickle.dump(dict(parser.ereduce), fout)
+        pickle.dump(parser.ruledict, fout)
+
+def best_time(func,repeat=5):
+    best = None
+    for idx in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best,elapsed)
+    return best
+
+fname = sys.argv[1] if len(sys.argv) > 1 else "../GLRParser/grm/main.grm"
+count = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+os.chdir(os.path.dirname(os.path.abspath(fname))) # included grammar files are relative to the grammar directory
+parser = Parser()
+if count:
+    parser.parse_grammar(text=make_dict_grammar(fname,count))
+else:
+    parser.parse_grammar(os.path.basename(fname))
+start = time.perf_counter()
+parser.compile()
+print("compile: {:.3f}s, rules: {}, states: {}".format(time.perf_counter()-start, len(parser.rules), parser.table.num_states))
+
+sent = "the man i trusted with the car"
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    files = [
+        ("binary (grmc)", os.path.join(tmpdir,"grammar.grmc"), lambda fname:parser.save_grammar(fname), {}),
+        ("mapped (grmc)", os.path.join(tmpdir,"grammar.grmc"), None, {"mapped":True}),
+        ("pickle (v1)", os.path.join(tmpdir,"grammar.pkl"), lambda fname:parser.save_grammar(fname,version=1), {}),
+        ("legacy pickle", os.path.join(tmpdir,"legacy.pkl"), lambda fname:save_legacy(parser,fname), {}),
+    ]
+    for name,path,save,kwargs in files:
+        if save:
+            save(path)
+        def load():
+            loaded = Parser()
+            loaded.load_grammar(path,**kwargs)
+            return loaded
+        elapsed = best_time(load)
+        def load_and_parse():
+            loaded = load()
+            try:
+                loaded.parse(sent)
+            except ParseError:
+                pass
+        first = best_time(load_and_parse)
+        print("{:14} size: {:9d} load: {:.4f}s load+first parse: {:.4f}s".format(name, os.path.getsize(path), elapsed, first))
@@ -0,0 +1,38 @@
+""" measures parse time (Parser.parse) of all sentences in the input file of a grammar
+
+usage: python bench_parse.py [package directory] [grammar file] [input file]
+
+package directory is the directory containing GLRParser package (default ".."), so that a different version
+(e.g. a git worktree of an earlier commit) can be measured for before/after comparison
+default grammar is main.grm with input main.in.txt
+"""
+import sys, os, time, logging
+
+package_dir = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else "..")
+sys.path.insert(0,package_dir)
+
+from GLRParser import Parser, ParseError
+
+logging.getLogger().setLevel(logging.CRITICAL)
+grm_fname = sys.argv[2] if len(sys.argv) > 2 else "main.grm"
+in_fname = sys.argv[3] if len(sys.argv) > 3 else os.path.splitext(grm_fname)[0] + ".in.txt"
+repeat = 5
+
+os.chdir(os.path.join(package_dir,"GLRParser","grm")) # included grammar files are relative to the grammar directory
+parser = Parser()
+parser.parse_grammar(grm_fname)
+parser.compile()
+with open(in_fname,"r",encoding="utf-8") as fin:
+    sents = [line.split("@")[0].strip() for line in fin if line.strip() and not line.startswith("#")]
+
+best = None
+for idx in range(repeat):
+    start = time.perf_counter()
+    for sent in sents:
+        try:
+            parser.parse(sent)
+        except ParseError:
+            pass
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best,elapsed)
+print("{:12} sentences: {:5d} parse: {:.4f}s ({:.0f} sentences/s)".format(grm_fname, len(sents), best, len(sents)/best))
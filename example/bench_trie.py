@@ -0,0 +1,74 @@
+""" compares memory usage and lookup time of dictionary tries: Trie (nested dicts) and CompactTrie (double-array)
+
+usage: python bench_trie.py [grammar file] [number of synthetic dictionary entries]
+
+memory is the size of the trie structure allocated while it is built (rules in the trie are shared, so they are not counted)
+lookup searches the trie at every position of every sentence in <grammar>.in.txt, and of every dictionary key
+"""
+import sys, os, time, tracemalloc
+sys.path.append("..")
+
+from GLRParser import Parser, Trie, CompactTrie
+
+def make_dict_grammar(fname,count):
+    """ returns text of a grammar including fname with count synthetic dictionary entries """
+    lines = ["%include {}".format(os.path.basename(fname)), "%auto_dict true"]
+    for idx in range(count):
+        lines.append("%form N word{},word{}s".format(idx,idx))
+        lines.append("$N -> $word{} : kelime{}".format(idx,idx))
+        lines.append("N -> word{} of {} : kelime{}".format(idx,idx%100,idx))
+    return "\n".join(lines) + "\n"
+
+def measure(func):
+    """ returns (result,allocated bytes) of func() """
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result,size
+
+def best_time(func,repeat=5):
+    best = None
+    for idx in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best,elapsed)
+    return best
+
+fname = sys.argv[1] if len(sys.argv) > 1 else "../GLRParser/grm/main.grm"
+count = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+os.chdir(os.path.dirname(os.path.abspath(fname))) # included grammar files are relative to the grammar directory
+parser = Parser()
+if count:
+    parser.parse_grammar(text=make_dict_grammar(fname,count))
+else:
+    parser.parse_grammar(os.path.basename(fname))
+items = list(parser.trie.items())
+
+def build_trie():
+    trie = Trie()
+    for keyseq,val in items:
+        trie.add(keyseq,val)
+    return trie
+
+trie,trie_size = measure(build_trie)
+compact,compact_size = measure(lambda:CompactTrie.build(trie))
+
+keyseqs = [keyseq+["$"] for keyseq,val in items]
+in_fname = os.path.splitext(os.path.basename(fname))[0] + ".in.txt"
+if os.path.exists(in_fname):
+    with open(in_fname,"r",encoding="utf-8") as fin:
+        keyseqs.extend(line.split("@")[0].lower().split()+["$"] for line in fin if line.strip() and not line.startswith("#"))
+searches = [keyseq[pos:] for keyseq in keyseqs for pos in range(len(keyseq))]
+
+def lookup(trie):
+    search = trie.search
+    for keyseq in searches:
+        search(keyseq)
+
+assert all(trie.search(keyseq) == compact.search(keyseq) for keyseq in searches)
+print("entries: {}, nodes: {}, words: {}, searches: {}".format(len(items), len(compact.base), len(compact.words), len(searches)))
+for name,item,size in (("Trie",trie,trie_size),("CompactTrie",compact,compact_size)):
+    print("{:12} memory: {:10,d} bytes lookup: {:.4f}s".format(name, size, best_time(lambda:lookup(item))))
@@ -0,0 +1,54 @@
+""" measures feature unification time (Parser.unify_up and Parser.unify_down) over the grammars of the unification tests
+
+usage: python bench_unify.py [package directory] [-f]
+
+package directory is the directory containing GLRParser package (default ".."), so that a different version
+(e.g. a git worktree of an earlier commit) can be measured for before/after comparison
+the calls of unify_up and unify_down made while unifying and translating the test sentences are recorded, then replayed
+-f uses a FeatureSpace, i.e. feature structures are unified as bit sets
+"""
+import sys, os, time, logging
+
+package_dir = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else "..")
+feature_space = "-f" in sys.argv[2:]
+sys.path.insert(0,package_dir)
+
+from GLRParser import Parser, ParseError
+from GLRParser.test.test_unify import TestUnifyBinary, TestUnify
+
+logging.getLogger().setLevel(logging.CRITICAL)
+repeat = 5
+loops = 200
+
+calls = []
+unify_up, unify_down = Parser.unify_up, Parser.unify_down
+def record_up(*args):
+    calls.append((unify_up,args))
+    return unify_up(*args)
+def record_down(*args):
+    calls.append((unify_down,args))
+    return unify_down(*args)
+Parser.unify_up, Parser.unify_down = record_up, record_down
+for test in (TestUnifyBinary, TestUnify):
+    parser = Parser(feature_space=True) if feature_space else Parser()
+    parser.parse_grammar(text=test.grammar)
+    parser.compile()
+    for sent,out in test.cases:
+        try:
+            parser.trans_tree(parser.unify_tree(parser.make_tree(parser.parse(sent))))
+        except ParseError:
+            pass
+Parser.unify_up, Parser.unify_down = unify_up, unify_down
+
+best = None
+for idx in range(repeat):
+    start = time.perf_counter()
+    for loop in range(loops):
+        for func,args in calls:
+            try:
+                func(*args)
+            except ParseError:
+                pass
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best,elapsed)
+print("calls: {:6d} unify: {:.4f}s ({:.0f} calls/s)".format(len(calls)*loops, best, len(calls)*loops/best))
@@ -29,9 +29,9 @@ try:
     print(parser.format_rules())
 
     parser.compile() # constructs parsing tables
-    parser.parse(sent) # parse the sentence
+    result = parser.parse(sent) # parse the sentence
 
-    tree = parser.make_tree() # generates parse forest
+    tree = parser.make_tree(result) # generates parse forest
     ttree = parser.trans_tree(tree) # translate the parse forest
 
     print(ttree.pformatr()) # pretty-print the translated parse forest
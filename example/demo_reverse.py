@@ -16,15 +16,15 @@ rparser.compile()
 sents = ["i saw the man in the house with the telescope", "the man with the telescope saw the man in the house"]
 
 for sent in sents:
-    parser.parse(sent)
-    tree = parser.make_tree()
+    result = parser.parse(sent)
+    tree = parser.make_tree(result)
     ttree = parser.trans_tree(tree)
     trans = list(ttree.enum())
     print(sent)
     for rsent in trans:
         print("*",rsent)
-        rparser.parse(rsent)
-        rtree = rparser.make_tree()
+        rresult = rparser.parse(rsent)
+        rtree = rparser.make_tree(rresult)
         trtree = rparser.trans_tree(rtree)
         rtrans = list(trtree.enum())
         for rrsent in rtrans:
@@ -10,9 +10,9 @@ try:
     sent = "i saw the man in the house with the telescope" # sentence to parse
 
     parser.compile() # constructs parsing tables
-    parser.parse(sent) # parse the sentence
+    result = parser.parse(sent) # parse the sentence
 
-    tree = parser.make_tree() # generates parse forest
+    tree = parser.make_tree(result) # generates parse forest
     ttree = parser.trans_tree(tree) # translate the parse forest
 
     print(ttree.pformatr()) # pretty-print the translated parse forest
@@ -0,0 +1,55 @@
+""" generates load on a translation server (GLRParser.server) and reports latency percentiles
+
+usage: python load_server.py [port] [concurrency] [input file] [requests]
+
+sends sentences of the input file (default main.in.txt in grm directory) as translation requests over
+concurrency (default 16) connections, until the given number of requests (default: number of sentences) are sent
+"""
+import sys, os, time, json, asyncio
+
+port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+in_fname = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","GLRParser","grm","main.in.txt")
+with open(in_fname,"r",encoding="utf-8") as fin:
+    sents = [line.split("@")[0].strip() for line in fin if line.strip() and not line.startswith("#")]
+num_requests = int(sys.argv[4]) if len(sys.argv) > 4 else len(sents)
+
+async def request(reader,writer,sent):
+    """ sends a translation request over a kept-alive connection, returns the response """
+    body = json.dumps({"sent": sent}).encode("utf-8")
+    writer.write(b"POST /translate HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+    await writer.drain()
+    headers = dict()
+    status = await reader.readline()
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    return status.split()[1], json.loads(await reader.readexactly(int(headers["content-length"])))
+
+async def client(todo,latencies,errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1",port)
+    while todo:
+        sent = todo.pop()
+        start = time.perf_counter()
+        status, response = await request(reader,writer,sent)
+        latencies.append(time.perf_counter() - start)
+        if status != b"200" or "error" in response:
+            errors.append(status)
+    writer.close()
+
+async def run():
+    todo = [sents[idx % len(sents)] for idx in range(num_requests)]
+    todo.reverse()
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(todo,latencies,errors) for idx in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print("requests: {} errors: {} time: {:.2f}s ({:.0f} requests/s)".format(len(latencies), len(errors), elapsed, len(latencies)/elapsed))
+    for percentile in (50, 90, 99, 100):
+        print("p{}: {:.1f}ms".format(percentile, latencies[min(len(latencies)-1, len(latencies)*percentile//100)]*1000))
+
+asyncio.run(run())